@@ -0,0 +1,6 @@
+try:
+    from .celery import app as celery_app
+except ImportError:  # celery is only needed when CELERY_BROKER_URL is set
+    celery_app = None
+
+__all__ = ('celery_app',)
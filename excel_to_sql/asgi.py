@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'excel_to_sql.settings')
 
 application = get_asgi_application()
+
+# Imported once Django is set up; streams upload/stream POSTs to disk as they arrive
+from excel_user.streaming import StreamingUploadApp  # noqa: E402
+
+application = StreamingUploadApp(application)
@@ -0,0 +1,9 @@
+import os
+
+from celery import Celery
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'excel_to_sql.settings')
+
+app = Celery('excel_to_sql')
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks()
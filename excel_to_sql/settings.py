@@ -129,3 +129,85 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Excel/CSV import
+# 'auto' uses the columnar INSERT writer on supported backends and the ORM otherwise;
+# set to 'columnar' or 'orm' to force a path.
+EXCEL_IMPORT_WRITER = 'auto'
+
+# Uploads are stored here and imported by a background worker. EXCEL_IMPORT_RUNNER is
+# 'celery' (needs CELERY_BROKER_URL), 'thread' (in-process) or 'sync' (inside the request);
+# left empty it picks celery when a broker is configured and thread otherwise.
+EXCEL_IMPORT_UPLOAD_DIR = BASE_DIR / 'uploads'
+EXCEL_IMPORT_RUNNER = os.environ.get('EXCEL_IMPORT_RUNNER', '')
+
+# Under ASGI, POSTs to upload/stream are parsed as they arrive on this many threads and
+# written straight to EXCEL_IMPORT_UPLOAD_DIR; other requests go through Django unchanged
+EXCEL_UPLOAD_STREAM_THREADS = int(os.environ.get('EXCEL_UPLOAD_STREAM_THREADS', 8))
+
+# Celery, e.g. 'redis://localhost:6379/0' or 'sqla+sqlite:///celery.sqlite3' for a local broker
+CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL', '')
+CELERY_TASK_ACKS_LATE = True
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+
+# Processes used to preprocess chunks in parallel (1 = inline) and the maximum number of
+# chunks in flight between reader and writer (empty = 2 per worker)
+EXCEL_IMPORT_WORKERS = int(os.environ.get('EXCEL_IMPORT_WORKERS', 1))
+EXCEL_IMPORT_QUEUE_DEPTH = None
+
+# Files or sheets of a batch upload (several files, a zip or all sheets of a workbook)
+# read and preprocessed at once; their chunks are written by one shared writer
+EXCEL_IMPORT_BATCH_PARALLELISM = int(os.environ.get('EXCEL_IMPORT_BATCH_PARALLELISM', 2))
+
+# Resident memory budget for an import in MB (empty = fixed 50,000-row chunks); chunk size
+# shrinks when the worker and its preprocessing pool approach it
+EXCEL_IMPORT_MEMORY_LIMIT_MB = int(os.environ['EXCEL_IMPORT_MEMORY_LIMIT_MB']) if os.environ.get('EXCEL_IMPORT_MEMORY_LIMIT_MB') else None
+
+# What an import does with rows whose (ID, VoucherNo, ItemCOde, VoucherDate) is already
+# stored: 'update' them, 'skip' them or 'insert' only, failing the import on the unique
+# natural key. The upload form can override it.
+EXCEL_IMPORT_DEDUP = 'update'
+
+# Load each file into an unindexed stage table and move it into ExcelData in one
+# transaction at the end, instead of writing every chunk to the live table
+EXCEL_IMPORT_STAGED = os.environ.get('EXCEL_IMPORT_STAGED', '').lower() in ('1', 'true', 'yes')
+
+# CSVs whose header and first rows validate cleanly skip pandas and are bulk loaded into
+# a stage table (COPY on PostgreSQL, fast_executemany on SQL Server)
+EXCEL_IMPORT_FAST_LANE = os.environ.get('EXCEL_IMPORT_FAST_LANE', '1').lower() in ('1', 'true', 'yes')
+
+# Field a new delta import source is tracked by: voucher_date, created_date or sales_id.
+# Rows at or below the source's watermark are skipped, so a date watermark assumes each
+# export holds whole days: rows added later for the last day already loaded are missed
+EXCEL_IMPORT_DELTA_FIELD = 'voucher_date'
+
+# Cache for data view pages, counts and rollup queries. Keys include a generation counter
+# that every import bumps, so entries never time out; the backend's size bound evicts them
+# (LRU for locmem and for Redis with maxmemory-policy allkeys-lru). EXCEL_QUERY_CACHE_URL
+# selects Redis (redis://...) or a file cache directory; empty keeps a per-process locmem.
+EXCEL_QUERY_CACHE = 'excel_queries'
+EXCEL_QUERY_CACHE_URL = os.environ.get('EXCEL_QUERY_CACHE_URL', '')
+EXCEL_QUERY_CACHE_MAX_ENTRIES = 5000
+if EXCEL_QUERY_CACHE_URL.startswith(('redis://', 'rediss://')):
+    _query_cache = {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': EXCEL_QUERY_CACHE_URL}
+elif EXCEL_QUERY_CACHE_URL:
+    _query_cache = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': EXCEL_QUERY_CACHE_URL,
+        'OPTIONS': {'MAX_ENTRIES': EXCEL_QUERY_CACHE_MAX_ENTRIES},
+    }
+else:
+    _query_cache = {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'excel-queries',
+        'OPTIONS': {'MAX_ENTRIES': EXCEL_QUERY_CACHE_MAX_ENTRIES},
+    }
+CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    EXCEL_QUERY_CACHE: {**_query_cache, 'TIMEOUT': None},
+}
+
+# Serve import stage timings at /metrics in the Prometheus text format
+EXCEL_IMPORT_METRICS = os.environ.get('EXCEL_IMPORT_METRICS', '').lower() in ('1', 'true', 'yes')
+
+# Parquet files written by 'manage.py archive_partitions --to parquet', one per month
+EXCEL_ARCHIVE_DIR = Path(os.environ.get('EXCEL_ARCHIVE_DIR', BASE_DIR / 'archive'))
@@ -0,0 +1,25 @@
+"""
+Settings for the test suite: python manage.py test excel_user --settings=excel_to_sql.test_settings
+
+Runs against SQLite so the tests need no SQL Server instance.
+"""
+from .settings import *
+import tempfile
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'test.sqlite3',
+    }
+}
+
+# Stored uploads and moved files go to a scratch directory, not the project's
+EXCEL_IMPORT_UPLOAD_DIR = Path(tempfile.gettempdir()) / 'excel_user_test_uploads'
+EXCEL_IMPORT_STAGED = False
+
+# Replaced-value warnings are expected from the sample files
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'loggers': {'excel_user': {'level': 'ERROR'}},
+}
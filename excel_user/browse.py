@@ -0,0 +1,108 @@
+from django.db import connections
+from django.utils.dateparse import parse_date
+from .models import ExcelData, SalesFact
+from .querycache import cached_query
+import logging
+
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = 100
+
+# Columns view_data.html shows; rows are fetched as dicts of just these
+VIEW_FIELDS = [
+    'voucher_type', 'sales_id', 'state_name', 'zone', 'branch_name', 'route', 'party_name',
+    'category_name', 'payment_type', 'created_date', 'voucher_date', 'voucher_no', 'bill_type',
+    'salesman', 'taxable', 'cgst', 'sgst', 'igst', 'voucher_amt', 'discount', 'realisable_amount',
+    'receive_amt', 'difference', 'rmode', 'group_name', 'item_code', 'tax_perc', 'qty', 'free_qty',
+    'total_amt', 'free_amount', 'rate', 'disc_amount',
+]
+
+# Query parameter -> ExcelData field for exact-match filters (each backed by a (field, id) index)
+TEXT_FILTERS = {'branch': 'branch_name', 'zone': 'zone', 'salesman': 'salesman'}
+
+
+def clean_filters(params):
+    """Return the recognised, non-empty filter parameters from a GET QueryDict"""
+    filters = {}
+    for param in TEXT_FILTERS:
+        value = params.get(param, '').strip()
+        if value:
+            filters[param] = value
+    for param in ('date_from', 'date_to'):
+        try:
+            value = parse_date(params.get(param, ''))
+        except ValueError:
+            value = None
+        if value:
+            filters[param] = value.isoformat()
+    return filters
+
+
+def filtered_rows(filters, model=ExcelData):
+    """Apply the filters to the ExcelData view, or to SalesFact through its keys' text.
+
+    SalesFact skips the view's joins, for queries that read no text column.
+    """
+    queryset = model.objects.all()
+    lookup = '__value' if model is SalesFact else ''
+    for param, field in TEXT_FILTERS.items():
+        if param in filters:
+            queryset = queryset.filter(**{field + lookup: filters[param]})
+    if 'date_from' in filters:
+        queryset = queryset.filter(voucher_date__gte=filters['date_from'])
+    if 'date_to' in filters:
+        queryset = queryset.filter(voucher_date__lte=filters['date_to'])
+    return queryset
+
+
+def keyset_page(queryset, after=None, before=None, size=PAGE_SIZE):
+    """Return (rows, has_previous, has_next) for the page below id `after` or above id `before`.
+
+    Pages are newest first and seek on the primary key, so every page costs an index
+    range scan of `size` rows regardless of how deep it is.
+    """
+    columns = queryset.values('id', *VIEW_FIELDS)
+    if before is not None:
+        rows = list(columns.filter(id__gt=before).order_by('id')[:size + 1])
+        has_previous = len(rows) > size
+        rows = rows[:size][::-1]
+        has_next = True
+    else:
+        if after is not None:
+            columns = columns.filter(id__lt=after)
+        rows = list(columns.order_by('-id')[:size + 1])
+        has_next = len(rows) > size
+        rows = rows[:size]
+        has_previous = after is not None and bool(rows) and queryset.filter(id__gt=rows[0]['id']).exists()
+    return rows, has_previous, has_next
+
+
+def table_row_estimate(using='default'):
+    """Read the sales row count from the planner statistics where the backend keeps one"""
+    connection = connections[using]
+    table = SalesFact._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [table])
+        elif connection.vendor == 'microsoft':
+            cursor.execute(
+                "SELECT SUM(row_count) FROM sys.dm_db_partition_stats WHERE object_id = OBJECT_ID(%s) AND index_id IN (0, 1)",
+                [table],
+            )
+        else:
+            return None
+        row = cursor.fetchone()
+    # reltuples is -1 until the table is first analyzed
+    return row[0] if row and row[0] is not None and row[0] >= 0 else None
+
+
+def approximate_count(filters):
+    """Row count for the browser header, cached until the next import.
+
+    Unfiltered counts come from table statistics when available; filtered counts run an
+    index-backed COUNT(*) once per filter combination and data generation.
+    """
+    def count():
+        estimate = None if filters else table_row_estimate()
+        return estimate if estimate is not None else filtered_rows(filters, SalesFact).count()
+    return cached_query('count', filters, count)
@@ -0,0 +1,129 @@
+"""Delta imports: only the rows of a cumulative export newer than its source's watermark are loaded.
+
+Each source (an export feed named by the user) keeps an ImportWatermark: the highest
+VoucherDate, CreatedDate or ID loaded from it so far. A delta import drops the rows
+at or below the watermark with one vectorized comparison per chunk, before any value
+is converted or written, and a chunk whose highest value is at or below it is dropped
+whole. A finished import raises the watermark to the highest value it loaded.
+"""
+from django.conf import settings
+from django.db import transaction
+from .fastlane import NA_VALUES, value_converter
+from .models import ImportWatermark
+from .preprocess import InvalidValueReport, parse_dates
+from .schema import import_schema
+from datetime import date
+from decimal import InvalidOperation
+import logging
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+DELTA_FIELDS = [field for field, _ in ImportWatermark.FIELD_CHOICES]
+
+
+def start_delta(source, field=None):
+    """The delta settings of a new import of source: its field and the watermark to load above.
+
+    A source keeps the field it was first imported by; asking for another raises ValueError.
+    """
+    watermark = ImportWatermark.objects.filter(source=source).first()
+    if watermark:
+        if field and field != watermark.field:
+            raise ValueError(f"Source {source} is tracked by {watermark.field}, not {field}")
+        field, after = watermark.field, watermark.value
+    else:
+        field, after = field or getattr(settings, 'EXCEL_IMPORT_DELTA_FIELD', 'voucher_date'), None
+    if field not in DELTA_FIELDS:
+        raise ValueError(f"Delta imports track one of {', '.join(DELTA_FIELDS)}, not {field}")
+    return {'source': source, 'field': field, 'after': after, 'max': None, 'skipped': 0}
+
+
+class DeltaFilter:
+    """Selects the rows whose field is above a watermark (every row when there is none yet).
+
+    Dates compare by day, as they are stored. Once a watermark exists, rows without a
+    readable value are dropped too, since they can't be shown to be new. Values are
+    exchanged as text (ISO dates or integers) so they can be saved in JSON fields.
+    """
+
+    def __init__(self, field, after=None):
+        self.column = next(column for column in import_schema().columns if column.field == field)
+        self.is_date = self.column.kind == 'date'
+        self.after = self.parse(after) if after is not None else None
+
+    def parse(self, value):
+        return date.fromisoformat(value) if self.is_date else int(value)
+
+    def format(self, value):
+        return value.isoformat() if self.is_date else str(value)
+
+    def higher(self, first, second):
+        """The higher of two values as text; either may be None"""
+        if first is None or second is None:
+            return second if first is None else first
+        return max(first, second, key=self.parse)
+
+    def select(self, df, date_formats=None):
+        """Return (the rows of a DataFrame chunk above the watermark, rows dropped, highest value kept)"""
+        if self.is_date:
+            header = self.column.header
+            # Unparsable dates are reported by the conversion of the rows that are kept
+            values = parse_dates(df, header, InvalidValueReport(), {}, (date_formats or {}).get(header)).dt.normalize()
+            after = pd.Timestamp(self.after) if self.after is not None else None
+        else:
+            values = pd.to_numeric(df[self.column.header], errors='coerce')
+            after = self.after
+        top = values.max()
+        if pd.isna(top):
+            return (df, 0, None) if after is None else (df.iloc[:0], len(df), None)
+        top = top.date() if self.is_date else int(top)
+        if after is None:
+            return df, 0, self.format(top)
+        if top <= self.after:
+            return df.iloc[:0], len(df), None
+        keep = (values > after).to_numpy(dtype=bool, na_value=False)
+        return df[keep], int(len(df) - keep.sum()), self.format(top)
+
+    def select_rows(self, rows, header, start_row, date_formats=None):
+        """Fast lane: return (csv rows above the watermark, their file offsets, {'skipped', 'max'})"""
+        position = import_schema().positions(header)[import_schema().columns.index(self.column)]
+        convert = value_converter(self.column, date_formats or {})
+        kept, offsets, top = [], [], None
+        for offset, row in enumerate(rows, start_row):
+            if len(row) == len(header):  # A malformed row is kept for convert_rows to refuse
+                try:
+                    value = None if row[position] in NA_VALUES else convert(row[position])
+                except (ValueError, InvalidOperation):
+                    value = None
+                if value is None:
+                    if self.after is not None:
+                        continue
+                elif self.after is not None and value <= self.after:
+                    continue
+                elif top is None or value > top:
+                    top = value
+            kept.append(row)
+            offsets.append(offset)
+        skipped = len(rows) - len(kept)
+        return kept, offsets, {'skipped': skipped, 'max': self.format(top) if top is not None else None}
+
+
+def advance_watermark(delta, job=None):
+    """Raise a source's watermark to the highest value a finished delta import loaded"""
+    if not delta or delta.get('max') is None:
+        return None
+    compare = DeltaFilter(delta['field'])
+    with transaction.atomic():
+        watermark, created = ImportWatermark.objects.select_for_update().get_or_create(
+            source=delta['source'], defaults={'field': delta['field'], 'value': delta['max'], 'job': job},
+        )
+        if created:
+            logger.info(f"Started watermark of {delta['source']} at {delta['field']} {delta['max']}")
+        elif watermark.field != delta['field']:
+            logger.warning(f"Watermark of {delta['source']} tracks {watermark.field}, not {delta['field']}; left at {watermark.value}")
+        elif compare.parse(delta['max']) > compare.parse(watermark.value):
+            watermark.value, watermark.job = delta['max'], job
+            watermark.save(update_fields=['value', 'job', 'updated_at'])
+            logger.info(f"Advanced watermark of {delta['source']} to {delta['field']} {delta['max']}")
+    return watermark
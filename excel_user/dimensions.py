@@ -0,0 +1,89 @@
+from django.db import IntegrityError, connections, transaction
+from .models import DimensionValue, SalesFact
+from .schema import import_schema
+import logging
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+LOOKUP_BATCH = 500  # Values per IN list when reading new keys back
+
+
+def dimension_fields(model=SalesFact):
+    """Names of a fact model's interned fields"""
+    return [
+        field.name for field in model._meta.concrete_fields
+        if field.is_relation and field.related_model._meta.model_name == 'dimensionvalue'
+    ]
+
+
+class DimensionCache:
+    """The DimensionValue keys of one database, loaded once and extended as imports meet new values.
+
+    Keys are never renumbered or deleted, so a cached key stays valid; values another
+    import added meanwhile are picked up the first time this cache misses them.
+    """
+
+    def __init__(self, using='default'):
+        self.using = using
+        fields = dimension_fields()
+        self.keys = {field: {} for field in fields}
+        self.positions = [(position, column) for position, column in enumerate(import_schema().columns) if column.field in fields]
+        self.added = 0
+        for field, value, key in DimensionValue.objects.using(using).values_list('field', 'value', 'id').iterator(chunk_size=10000):
+            if field in self.keys:
+                self.keys[field][value] = key
+        logger.info(f"Loaded {sum(len(keys) for keys in self.keys.values())} dimension keys")
+
+    def add(self, field, values):
+        """Intern the values of a field that have no key yet"""
+        keys = self.keys[field]
+        new = list(dict.fromkeys(value for value in values if value not in keys))
+        if not new:
+            return
+        manager = DimensionValue.objects.using(self.using)
+        objects = [DimensionValue(field=field, value=value) for value in new]
+        if connections[self.using].features.supports_ignore_conflicts:
+            manager.bulk_create(objects, batch_size=1000, ignore_conflicts=True)
+        else:
+            try:
+                with transaction.atomic(using=self.using):
+                    manager.bulk_create(objects, batch_size=1000)
+            except IntegrityError:
+                pass  # Added by a concurrent import; the lookups below find them
+        for start in range(0, len(new), LOOKUP_BATCH):
+            # SQL Server's IN also returns stored spellings with other trailing spaces; each keeps its own key
+            keys.update(manager.filter(field=field, value__in=new[start:start + LOOKUP_BATCH]).values_list('value', 'id'))
+        missing = [value for value in new if value not in keys]
+        if missing:
+            raise IntegrityError(
+                f"{field} values {missing[:5]} were stored under another spelling; "
+                f"DimensionValue.value must compare exactly (see migration 0017)"
+            )
+        self.added += len(new)
+
+    def intern_frame(self, df):
+        """Return a preprocessed chunk with each dimension column replaced by its keys"""
+        df = df.copy(deep=False)
+        for _, column in self.positions:
+            if column.header not in df.columns:
+                continue
+            codes, uniques = pd.factorize(df[column.header])
+            values = [str(value) for value in uniques]
+            self.add(column.field, values)
+            keys = self.keys[column.field]
+            # Code -1 (missing) picks the trailing None
+            df[column.header] = np.array([keys[value] for value in values] + [None], dtype=object)[codes]
+        return df
+
+    def intern_rows(self, rows):
+        """Return fast-lane row tuples with each dimension value replaced by its key"""
+        if not rows:
+            return rows
+        columns = list(zip(*rows))
+        for position, column in self.positions:
+            values = columns[position]
+            self.add(column.field, {value for value in values if value is not None})
+            columns[position] = map(self.keys[column.field].get, values)
+        return list(zip(*columns))
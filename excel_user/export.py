@@ -0,0 +1,168 @@
+from .schema import import_schema
+from .writers import FIELD_MAP
+import csv
+import io
+import logging
+import time
+import zlib
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'csv.gz': ('application/gzip', 'csv.gz'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+
+FETCH_SIZE = 5000  # Rows per server-side cursor fetch
+ROW_GROUP_SIZE = 100000  # Rows per Parquet row group
+
+
+def export_batches(queryset, fetch_size=FETCH_SIZE):
+    """Yield lists of row tuples in FIELD_MAP order, read through a server-side cursor.
+
+    Rows come in (voucher_date, id) order, the clustered order of the partitioned table,
+    so a date-filtered export reads its months' partitions front to back without a sort.
+    """
+    fields = [field for _, field in FIELD_MAP]
+    rows = queryset.order_by('voucher_date', 'id').values_list(*fields).iterator(chunk_size=fetch_size)
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= fetch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def csv_stream(batches, compress=False):
+    """Encode row batches as CSV under the original Excel headers, optionally gzip-compressed"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # wbits=31 writes a gzip header and trailer around the deflate stream
+    compressor = zlib.compressobj(wbits=31) if compress else None
+
+    def drain():
+        data = buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+        return compressor.compress(data) if compressor else data
+
+    writer.writerow([header for header, _ in FIELD_MAP])
+    yield drain()
+    for batch in batches:
+        writer.writerows(batch)
+        yield drain()
+    if compressor:
+        yield compressor.flush()
+
+
+class _StreamSink:
+    """Write-only file object that hands written bytes back to a generator"""
+
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self):
+        data = b''.join(self.parts)
+        self.parts = []
+        return data
+
+
+def parquet_schema():
+    import pyarrow as pa
+
+    columns = []
+    for column in import_schema().columns:
+        if column.kind == 'decimal':
+            arrow_type = pa.decimal128(column.max_digits, column.decimal_places)
+        elif column.kind == 'integer':
+            arrow_type = pa.int64()
+        elif column.kind == 'date':
+            arrow_type = pa.date32()
+        else:
+            arrow_type = pa.string()
+        columns.append(pa.field(column.header, arrow_type))
+    return pa.schema(columns)
+
+
+def parquet_stream(batches, row_group_size=ROW_GROUP_SIZE):
+    """Encode row batches as Parquet, one row group per row_group_size rows.
+
+    Each fetched batch is converted to Arrow right away, so a pending row group is held
+    in columnar form rather than as Python row tuples.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = parquet_schema()
+    sink = _StreamSink()
+    writer = pq.ParquetWriter(pa.PythonFile(sink, mode='w'), schema, compression='snappy')
+    pending = []
+    pending_rows = 0
+
+    def write_group():
+        nonlocal pending_rows
+        writer.write_table(pa.Table.from_batches(pending, schema=schema), row_group_size=row_group_size)
+        pending.clear()
+        pending_rows = 0
+        return sink.take()
+
+    yield sink.take()
+    for batch in batches:
+        columns = zip(*batch)
+        pending.append(pa.RecordBatch.from_arrays(
+            [pa.array(column, type=field.type) for column, field in zip(columns, schema)], schema=schema,
+        ))
+        pending_rows += len(batch)
+        if pending_rows >= row_group_size:
+            yield write_group()
+    if pending:
+        yield write_group()
+    writer.close()
+    yield sink.take()
+
+
+def export_stream(queryset, export_format, started=None):
+    """Yield the encoded export of a queryset, logging time-to-first-byte and throughput"""
+    started = started or time.time()
+    rows = 0
+
+    def counted(batches):
+        nonlocal rows
+        for batch in batches:
+            rows += len(batch)
+            yield batch
+
+    batches = counted(export_batches(queryset))
+    if export_format == 'parquet':
+        parts = parquet_stream(batches)
+    else:
+        parts = csv_stream(batches, compress=export_format == 'csv.gz')
+    first = True
+    for part in parts:
+        if not part:
+            continue
+        if first:
+            logger.info(f"Export ({export_format}) first byte after {time.time() - started:.3f}s")
+            first = False
+        yield part
+    elapsed = time.time() - started
+    logger.info(f"Exported {rows} rows as {export_format} in {elapsed:.2f}s ({rows / elapsed if elapsed > 0 else 0:.0f} rows/sec)")
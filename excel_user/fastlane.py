@@ -0,0 +1,319 @@
+from django.db import connections
+from .preprocess import detect_date_format, timed
+from .readers import is_csv
+from .schema import import_schema
+from .staging import STAGE_ROW
+from .models import SalesFact
+from .writers import FIELD_MAP, UPSERT_VENDORS, insert_rows_columnar, quoted_columns, upsert_rows
+from contextlib import contextmanager
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation, ROUND_HALF_EVEN
+import csv
+import io
+import itertools
+import logging
+import time
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_ROWS = 2000  # Rows converted by the validation pass before a file is sent down the fast lane
+SQLITE_CACHE_KB = 65536  # Page cache while bulk loading into SQLite
+
+# Cells pandas reads as missing by default; the fast lane treats them the same way
+NA_VALUES = {
+    '', ' ', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null',
+}
+
+
+class NotClean(ValueError):
+    """A value the fast lane won't convert; the pandas path replaces and reports it instead"""
+
+    def __init__(self, row, column, value):
+        super().__init__(f"Row {row + 2}, {column}: {value!r}")
+        self.row = row
+        self.restart_row = row  # First row of the chunk to redo on the pandas path
+
+
+def value_converter(column, date_formats):
+    """The converter of one import column's csv text, from the kind of field it lands in"""
+    if column.kind == 'decimal':
+        return _decimal_converter(column.max_digits, column.decimal_places)
+    if column.kind == 'integer':
+        return _integer
+    if column.kind == 'date':
+        return _date_converter(date_formats[column.header])
+    return _text
+
+
+def _converters(date_formats):
+    """Build one converter per import column, in insert order"""
+    return [value_converter(column, date_formats) for column in import_schema().columns]
+
+
+def _text(value):
+    return None if value in NA_VALUES else value
+
+
+def _integer(value):
+    try:
+        return int(value)
+    except ValueError:
+        number = float(value)  # Raises for text; '5.0' is still a whole number
+        if not number.is_integer():
+            raise ValueError(value)
+        return int(number)
+
+
+def _decimal_converter(max_digits, decimal_places):
+    exponent = Decimal(1).scaleb(-decimal_places)
+    limit = Decimal(10) ** (max_digits - decimal_places)
+
+    def convert(value):
+        number = Decimal(value).quantize(exponent, rounding=ROUND_HALF_EVEN)
+        if not number.is_finite() or abs(number) >= limit:
+            raise ValueError(value)
+        return number
+    return convert
+
+
+def _date_converter(date_format):
+    if date_format == 'ISO8601':
+        def parse(value):
+            return datetime.fromisoformat(value).date()
+    else:
+        def parse(value):
+            return datetime.strptime(value, date_format).date()
+
+    def convert(value):
+        # Blank dates are stored as NULL by the pandas path too, without a report entry
+        return None if value in NA_VALUES else parse(value)
+    return convert
+
+
+def _open(path):
+    # utf-8-sig drops a byte order mark the way pandas does
+    return open(path, newline='', encoding='utf-8-sig')
+
+
+def _data_rows(reader):
+    # pandas skips empty lines without counting them as rows
+    return (row for row in reader if row)
+
+
+def probe(path, sample_rows=SAMPLE_ROWS):
+    """Return the date formats of a CSV that can take the fast lane, or None.
+
+    A file qualifies when its header matches every import column and the first
+    sample_rows rows convert without a blank or invalid number or an unparsable date.
+    """
+    if not is_csv(str(path)):
+        return None
+    with _open(path) as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        sample = list(itertools.islice(_data_rows(reader), sample_rows))
+    schema = import_schema()
+    positions = dict(zip(schema.headers, schema.positions(header)))
+    if None in positions.values() or not sample:
+        return None
+    date_formats = {}
+    for column in schema.of_kind('date'):
+        position = positions[column.header]
+        values = pd.Series([row[position] for row in sample if len(row) == len(header)], dtype=object)
+        date_formats[column.header] = detect_date_format(values)
+        if date_formats[column.header] is None:
+            return None
+    try:
+        convert_rows(sample, header, _converters(date_formats), 0)
+    except NotClean as e:
+        logger.info(f"Fast lane not used for {path}: {str(e)}")
+        return None
+    return date_formats
+
+
+def convert_rows(rows, header, converters, start_row, offsets=None):
+    """Convert csv rows into insert-ordered tuples ending with their file row offset.
+
+    offsets gives each row's offset when rows were filtered; otherwise they run on from start_row.
+    """
+    schema = import_schema()
+    positions = schema.positions(header)
+    width = len(header)
+    converted = []
+    for offset, row in zip(offsets, rows) if offsets is not None else enumerate(rows, start_row):
+        if len(row) != width:
+            raise NotClean(offset, 'row', f'{len(row)} fields')
+        values = []
+        for column, position, convert in zip(schema.headers, positions, converters):
+            try:
+                values.append(convert(row[position]))
+            except (ValueError, InvalidOperation):
+                raise NotClean(offset, column, row[position])
+        values.append(offset)
+        converted.append(tuple(values))
+    return converted
+
+
+def fast_chunks(path, chunk_size, date_formats, start_row=0, row_filter=None):
+    """Yield (start_row, rows, stats) chunks of converted row tuples, from the start_row-th data row.
+
+    Raises NotClean carrying the first row of the chunk that holds a value the fast lane
+    won't convert, so the caller can continue from there on the pandas path.
+    row_filter(rows, header, start_row) -> (rows, offsets, delta) drops rows before they
+    are converted; its delta counts land in the chunk's stats.
+    """
+    converters = _converters(date_formats)
+    with _open(path) as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        rows = itertools.islice(_data_rows(reader), start_row, None)
+        while True:
+            read_start = time.perf_counter()
+            batch = list(itertools.islice(rows, chunk_size))
+            if not batch:
+                return
+            stats = {'timings': {'read': time.perf_counter() - read_start}}
+            kept, offsets = batch, None
+            if row_filter:
+                with timed(stats['timings'], 'delta'):
+                    kept, offsets, stats['delta'] = row_filter(batch, header, start_row)
+            convert_start = time.perf_counter()
+            try:
+                converted = convert_rows(kept, header, converters, start_row, offsets)
+            except NotClean as e:
+                e.restart_row = start_row
+                raise
+            stats['timings']['fastlane.convert'] = time.perf_counter() - convert_start
+            yield start_row, converted, stats
+            start_row += len(batch)
+
+
+def row_days(rows):
+    """Distinct voucher dates of converted rows as ISO strings"""
+    position = [column.field for column in import_schema().columns].index('voucher_date')
+    return {row[position].isoformat() for row in rows if isinstance(row[position], date)}
+
+
+def _copy_text(value):
+    # COPY's text format: \N for NULL, with backslash, tab and line breaks escaped
+    if value is None:
+        return '\\N'
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+
+def bulk_load(rows, table, using='default', columns=None):
+    """Append converted rows to a stage table (or columns of another) through the backend's bulk interface.
+
+    PostgreSQL streams them with COPY FROM STDIN, SQL Server binds them as parameter
+    arrays (pyodbc fast_executemany) and SQLite runs one prepared INSERT over all rows.
+    """
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    columns = columns or quoted_columns(connection) + [quote(STAGE_ROW)]
+    target = f"{quote(table)} ({', '.join(columns)})"
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            raw_cursor = cursor.cursor
+            if hasattr(raw_cursor, 'copy'):
+                # psycopg 3
+                with raw_cursor.copy(f"COPY {target} FROM STDIN") as copy:
+                    for row in rows:
+                        copy.write_row(row)
+            else:
+                buffer = io.StringIO()
+                for row in rows:
+                    buffer.write('\t'.join(_copy_text(value) for value in row) + '\n')
+                buffer.seek(0)
+                raw_cursor.copy_expert(f"COPY {target} FROM STDIN", buffer)
+            return len(rows)
+        if connection.vendor == 'sqlite':
+            cursor.executemany(f"INSERT INTO {target} VALUES ({', '.join(['%s'] * len(columns))})", rows)
+            return len(rows)
+    return insert_rows_columnar(rows, using, table=quote(table), columns=columns)
+
+
+@contextmanager
+def tuned_for_load(using='default'):
+    """Relax SQLite's durability around a bulk-loaded chunk's transaction.
+
+    SQLite only backs local and test databases here; it refuses the change inside a
+    transaction, so nothing is tuned when the caller already holds one.
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite' or connection.in_atomic_block:
+        yield
+        return
+    with connection.cursor() as cursor:
+        previous = {}
+        for pragma, value in (('synchronous', 'OFF'), ('cache_size', -SQLITE_CACHE_KB)):
+            cursor.execute(f'PRAGMA {pragma}')
+            previous[pragma] = cursor.fetchone()[0]
+            cursor.execute(f'PRAGMA {pragma} = {value}')
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            for pragma, value in previous.items():
+                cursor.execute(f'PRAGMA {pragma} = {int(value)}')
+
+
+def stage_rows(rows, table, using='default'):
+    """Bulk-load a fast-lane chunk into the stage table and return timing stats like stage_chunk"""
+    start_time = time.time()
+    bulk_load(rows, table, using)
+    elapsed = time.time() - start_time
+    rows_per_sec = len(rows) / elapsed if elapsed > 0 else 0.0
+    logger.info(f"Bulk loaded {len(rows)} rows in {elapsed:.2f}s ({rows_per_sec:.0f} rows/sec)")
+    return {
+        'rows': len(rows), 'written': len(rows), 'method': 'fastlane', 'seconds': elapsed, 'rows_per_sec': rows_per_sec,
+        'timings': {'write': elapsed},
+    }
+
+
+def drop_repeated_keys(rows, mode):
+    """Keep one row per natural key within a fast-lane chunk, as drop_duplicate_keys does for a DataFrame"""
+    positions = [position for position, (_, field) in enumerate(FIELD_MAP) if field in SalesFact.NATURAL_KEY]
+    seen = set()
+    kept = []
+    # 'update' keeps a key's last row in the file, 'skip' its first
+    for row in reversed(rows) if mode == 'update' else rows:
+        key = tuple(row[position] for position in positions)
+        if None not in key:
+            if key in seen:
+                continue
+            seen.add(key)
+        kept.append(row)
+    if len(kept) < len(rows):
+        logger.info(f"Dropped {len(rows) - len(kept)} repeated voucher lines within the chunk")
+    return kept[::-1] if mode == 'update' else kept
+
+
+def write_rows(rows, using='default', dedup_mode='insert'):
+    """Write a fast-lane chunk straight to SalesFact and return timing stats like write_chunk.
+
+    Inserts are bulk loaded; 'update' and 'skip' go through the same set-based upsert as
+    the pandas path.
+    """
+    start_time = time.time()
+    connection = connections[using]
+    if dedup_mode != 'insert' and connection.vendor not in UPSERT_VENDORS:
+        logger.warning(f"Dedup mode '{dedup_mode}' is not supported on {connection.vendor}, inserting rows as-is")
+        dedup_mode = 'insert'
+    # Drop the file offset that ends each row tuple
+    values = [row[:-1] for row in (drop_repeated_keys(rows, dedup_mode) if dedup_mode != 'insert' else rows)]
+    build_seconds = time.time() - start_time
+    if dedup_mode != 'insert':
+        method = 'upsert'
+        written = upsert_rows(values, using=using, mode=dedup_mode)
+    else:
+        method = 'fastlane'
+        written = bulk_load(values, SalesFact._meta.db_table, using, columns=quoted_columns(connection))
+    elapsed = time.time() - start_time
+    rows_per_sec = len(rows) / elapsed if elapsed > 0 else 0.0
+    logger.info(f"Wrote {written} of {len(rows)} rows via {method} path in {elapsed:.2f}s ({rows_per_sec:.0f} rows/sec)")
+    return {
+        'rows': len(rows), 'written': written, 'method': method, 'seconds': elapsed, 'rows_per_sec': rows_per_sec,
+        'timings': {'build': build_seconds, 'write': elapsed - build_seconds},
+    }
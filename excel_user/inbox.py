@@ -0,0 +1,156 @@
+from .jobs import UPLOAD_TYPES, create_stored_batch, extract_archive, file_digest, run_import_job
+from .models import ImportJob
+from .validation import validate_file
+from pathlib import Path
+import logging
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+SETTLE_SECONDS = 10  # A dropped file must be unchanged this long before it is imported
+
+
+def is_importable(path):
+    return path.is_file() and path.name.lower().endswith(UPLOAD_TYPES) and not path.name.startswith(('.', '~$'))
+
+
+def unique_path(directory, name):
+    """A path for name in directory that doesn't overwrite an existing file"""
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / name
+    if path.exists():
+        path = directory / f"{path.stem}-{uuid.uuid4().hex[:8]}{path.suffix}"
+    return path
+
+
+class Inbox:
+    """A drop directory whose files are imported and then moved to a done or failed directory.
+
+    A file is claimed by moving it into processing/ once it has been unchanged for
+    settle seconds, so a half-written file isn't read and two watchers can't import the
+    same file. Files left in processing/ by an interrupted run are picked up again.
+    """
+
+    def __init__(self, path, done_dir=None, failed_dir=None):
+        self.path = Path(path).resolve()  # Jobs record absolute paths, which resume_files matches
+        self.processing = self.path / 'processing'
+        self.done = Path(done_dir) if done_dir else self.path / 'done'
+        self.failed = Path(failed_dir) if failed_dir else self.path / 'failed'
+        if not self.path.is_dir():
+            raise FileNotFoundError(f"Inbox {self.path} is not a directory")
+
+    def ready(self, settle=SETTLE_SECONDS):
+        now = time.time()
+        return sorted(path for path in self.path.iterdir() if is_importable(path) and now - path.stat().st_mtime >= settle)
+
+    def claim(self, paths):
+        claimed = []
+        for path in paths:
+            target = unique_path(self.processing, path.name)
+            try:
+                path.rename(target)
+            except FileNotFoundError:
+                continue  # Claimed by another watcher
+            claimed.append(target)
+        return claimed
+
+    def leftovers(self):
+        return sorted(path for path in self.processing.iterdir() if is_importable(path)) if self.processing.is_dir() else []
+
+    def settle(self, outcomes):
+        """Move each claimed file to the done or failed directory by its outcome"""
+        for outcome in outcomes:
+            target = unique_path(self.failed if outcome['status'] == ImportJob.STATUS_FAILED else self.done, outcome['path'].name)
+            outcome['path'].rename(target)
+            outcome['moved_to'] = target
+
+
+def file_outcomes(batch, paths):
+    """Status, rows and seconds of each file of a finished batch job.
+
+    A file failed when any of its parts (one per zip member or sheet) failed or it had
+    none, and was skipped when every part repeated an earlier import.
+    """
+    parts = list(batch.parts.order_by('pk'))
+    outcomes = []
+    for path in paths:
+        own = [part for part in parts if part.file_path == str(path) or part.file_name.startswith(f"{path.name}/")]
+        statuses = {part.status for part in own}
+        if not own or ImportJob.STATUS_FAILED in statuses:
+            status = ImportJob.STATUS_FAILED
+        elif statuses == {ImportJob.STATUS_SKIPPED}:
+            status = ImportJob.STATUS_SKIPPED
+        else:
+            status = ImportJob.STATUS_DONE
+        errors = [f"{part.source_name}: {part.error}" for part in own if part.status == ImportJob.STATUS_FAILED]
+        skipped = sum(part.delta['skipped'] for part in own if part.delta)
+        outcomes.append({
+            'path': path, 'status': status, 'job': batch.pk,
+            'rows': sum(part.rows_done for part in own) - skipped, 'skipped': skipped,
+            'seconds': sum(part.elapsed_seconds for part in own),
+            'error': '; '.join(errors) if own else 'No importable file in the archive',
+        })
+    return outcomes
+
+
+def failed_outcomes(paths, error):
+    return [{
+        'path': path, 'status': ImportJob.STATUS_FAILED, 'job': None, 'rows': 0, 'skipped': 0, 'seconds': 0.0, 'error': str(error),
+    } for path in paths]
+
+
+def import_files(paths, all_sheets=False, workers=None, parallelism=None, **job_fields):
+    """Import files in place as one batch job run in this process and return each file's outcome.
+
+    Up to parallelism files are read and preprocessed at once, through one writer, as
+    for a batch upload. Zips are unpacked into the upload directory and kept.
+    job_fields (dedup_mode, staged, chunk_size, delta) apply to every file.
+    """
+    paths = [Path(path).resolve() for path in paths]
+    try:
+        batch = create_stored_batch(
+            [(path.name, path, file_digest(path)) for path in paths], all_sheets, keep_archives=True, **job_fields,
+        )
+        batch = run_import_job(batch.pk, workers, parallelism)
+    except Exception as e:
+        logger.error(f"Could not import {', '.join(path.name for path in paths)}: {str(e)}", exc_info=True)
+        return failed_outcomes(paths, e)
+    return file_outcomes(batch, paths)
+
+
+def resume_files(paths, workers=None, parallelism=None):
+    """Resume the unfinished batch jobs whose parts read these files; returns (outcomes, files no job reads)"""
+    names = {str(path): path for path in paths}
+    batches = ImportJob.objects.filter(
+        is_batch=True, status__in=[ImportJob.STATUS_QUEUED, ImportJob.STATUS_RUNNING], parts__file_path__in=list(names),
+    ).distinct().order_by('pk')
+    outcomes = []
+    for batch in batches:
+        own = [names.pop(file_path) for file_path in set(batch.parts.values_list('file_path', flat=True)) if file_path in names]
+        logger.info(f"Resuming batch import job {batch.pk} of {', '.join(path.name for path in own)}")
+        try:
+            batch = run_import_job(batch.pk, workers, parallelism)
+        except Exception as e:
+            logger.error(f"Could not resume batch import job {batch.pk}: {str(e)}", exc_info=True)
+            outcomes.extend(failed_outcomes(own, e))
+            continue
+        outcomes.extend(file_outcomes(batch, own))
+    return outcomes, list(names.values())
+
+
+def validate_files(paths, chunk_size, sheet_name=None):
+    """Dry run: validate_file reports of each file, or of each member of a zip"""
+    reports = []
+    for path in map(Path, paths):
+        if not path.name.lower().endswith('.zip'):
+            reports.append(validate_file(path, chunk_size, sheet_name, path.name))
+            continue
+        members = extract_archive(path, path.name, keep_archive=True)
+        try:
+            for file_name, member_path, _ in members:
+                reports.append(validate_file(member_path, chunk_size, sheet_name, file_name))
+        finally:
+            for _, member_path, _ in members:
+                Path(member_path).unlink(missing_ok=True)
+    return reports
@@ -0,0 +1,354 @@
+from django.conf import settings
+from django.db import transaction
+from .preprocess import preprocessed_chunks, merge_stats, add_timings, timed, InvalidValueReport
+from .readers import read_chunks, read_header, MemoryBudget
+from .writers import write_chunk, writer_method
+from .staging import stage_table_name, stage_exists, create_stage, discard_stage, stage_chunk, validate_stage, swap_stage
+from .rollups import chunk_days, apply_chunk_rollups, rebuild_rollups
+from .querycache import bump_generation
+from .schema import import_schema
+from .dimensions import DimensionCache
+from .fastlane import NotClean, probe, fast_chunks, row_days, stage_rows, tuned_for_load, write_rows
+from .delta import DeltaFilter
+from contextlib import nullcontext
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import queue
+import threading
+import time
+import psutil
+import uuid
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 50000  # Increased for faster processing
+
+
+def missing_columns(file, sheet_name=None):
+    """Read the header of a path or file object and return import columns none of its headers match"""
+    return import_schema().missing(read_header(file, sheet_name))
+
+
+def timed_reads(chunks, read_seconds):
+    """Pass reader chunks through, recording the seconds each took to read by its start row"""
+    chunks = iter(chunks)
+    while True:
+        start = time.perf_counter()
+        item = next(chunks, None)
+        if item is None:
+            return
+        read_seconds[item[0]] = time.perf_counter() - start
+        yield item
+
+
+def round_timings(timings):
+    return {stage: round(seconds, 4) for stage, seconds in timings.items()}
+
+
+class FileImport:
+    """One file (or one sheet of a workbook) being imported into ExcelData chunk by chunk.
+
+    Each chunk's rows, rollups and the job's checkpoint commit in one transaction, so an
+    interrupted job resumes after its last committed row. Options not given come from
+    the job or the EXCEL_IMPORT_* settings. A staged import swaps a stage table in at
+    the end (excel_user.staging), a CSV the fast lane accepts skips pandas
+    (excel_user.fastlane) and a delta import drops rows at or below its source's
+    watermark (excel_user.delta).
+
+    chunks() touches no database and may run on another thread; write() and finish()
+    must run on the thread that owns the connection.
+    """
+
+    def __init__(self, path, job=None, chunk_size=CHUNK_SIZE, workers=None, queue_depth=None, dedup_mode=None, staged=None, sheet_name=None, fast_lane=None, delta=None):
+        if dedup_mode is None:
+            dedup_mode = job.dedup_mode if job else getattr(settings, 'EXCEL_IMPORT_DEDUP', 'update')
+        if staged is None:
+            staged = job.staged if job else getattr(settings, 'EXCEL_IMPORT_STAGED', False)
+        if workers is None:
+            workers = getattr(settings, 'EXCEL_IMPORT_WORKERS', 1)
+        if queue_depth is None:
+            queue_depth = getattr(settings, 'EXCEL_IMPORT_QUEUE_DEPTH', None)
+        if sheet_name is None and job:
+            sheet_name = job.sheet_name
+        if fast_lane is None:
+            fast_lane = getattr(settings, 'EXCEL_IMPORT_FAST_LANE', True)
+        if delta is None and job:
+            delta = job.delta
+        self.path = path
+        self.job = job
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.queue_depth = queue_depth
+        self.dedup_mode = dedup_mode
+        self.staged = staged
+        self.sheet_name = sheet_name
+        self.start_row = job.rows_done if job else 0
+        self.total_rows_processed = job.rows_done if job else 0
+        self.rows_this_run = 0
+        self.rows_written = 0  # Rows inserted or updated; less than rows read when lines are skipped
+        # Track replaced values; a resumed job continues the report saved with its checkpoints
+        self.report = InvalidValueReport.from_dict(job.invalid_report) if job and job.invalid_report else InvalidValueReport()
+        self.stats = {}  # Per-file counters from preprocessing, e.g. date parse paths
+        self.write_seconds = 0.0  # Time spent in the DB writer
+        self.lock_seconds = 0.0  # Longest transaction writing to ExcelData
+        self.rollup_days = set(job.rollup_days or []) if job else set()  # Dates to rebuild rollups for
+        self.timings = (job.timings if job else None) or {'stages': {}, 'chunks': []}
+        # A resumed job continues the delta counts saved with its checkpoints
+        self.delta = dict(delta) if delta else None
+        self.delta_filter = DeltaFilter(delta['field'], delta['after']) if delta else None
+        self.read_seconds = {}
+        self.dimensions = None  # DimensionCache, loaded with the first chunk
+        self.start_time = time.time()
+
+        # Memory usage tracking
+        self.process = psutil.Process()
+        logger.info(f"Initial memory usage: {self.process.memory_info().rss / 1024 / 1024:.2f} MB")
+        if self.start_row:
+            logger.info(f"Resuming import after {job.chunks_done} committed chunks ({self.start_row} rows)")
+
+        memory_limit_mb = getattr(settings, 'EXCEL_IMPORT_MEMORY_LIMIT_MB', None)
+        self.budget = MemoryBudget(memory_limit_mb, chunk_size) if memory_limit_mb else None
+
+        self.date_formats = probe(path) if fast_lane and path else None
+        if self.date_formats:
+            logger.info(f"{path} passed validation, importing through the fast lane")
+
+        self.stage = None
+        if staged:
+            self.stage = stage_table_name(job.pk if job else uuid.uuid4().hex[:12])
+            if not stage_exists(self.stage):
+                if self.start_row:
+                    # The stage is dropped in the same transaction that moved it into ExcelData
+                    logger.info(f"Stage table {self.stage} was already moved into ExcelData")
+                    self.stage = None
+                    self.path = None
+                else:
+                    create_stage(self.stage)
+        # Direct writes fold each chunk into the rollups; a staged file's rows reach SalesFact only at the swap
+        self.incremental_rollups = not self.stage
+        self.chunk_start = time.time()
+
+    def chunks(self):
+        """Yield (start_row, chunk, report, stats) for each chunk still to import.
+
+        Chunks are preprocessed DataFrames, or lists of converted row tuples on the fast lane.
+        """
+        if not self.path:
+            return
+        start_row = self.start_row
+        if self.date_formats:
+            try:
+                row_filter = partial(self.delta_filter.select_rows, date_formats=self.date_formats) if self.delta_filter else None
+                for start_row, rows, stats in fast_chunks(self.path, self.chunk_size, self.date_formats, start_row, row_filter):
+                    yield start_row, rows, InvalidValueReport(), stats
+                return
+            except NotClean as e:
+                logger.info(f"Leaving the fast lane at row {e.restart_row}: {str(e)}")
+                start_row = e.restart_row
+        chunks = timed_reads(read_chunks(self.path, self.chunk_size, start_row, self.budget, self.sheet_name), self.read_seconds)
+        row_filter = self.delta_filter.select if self.delta_filter else None
+        yield from preprocessed_chunks(chunks, self.workers, self.queue_depth, row_filter=row_filter)
+
+    def write(self, start_row, chunk, chunk_report, chunk_stats):
+        """Write one preprocessed chunk and checkpoint the job in a single transaction; returns the rows read"""
+        job, timings = self.job, self.timings
+        self.report.merge(chunk_report)
+        merge_stats(self.stats, chunk_stats)
+        chunk_timings = {'read': self.read_seconds.pop(start_row, 0.0)}
+        add_timings(chunk_timings, chunk_stats.get('timings', {}))
+        skipped = self.count_delta(chunk_stats.get('delta'))
+        if not len(chunk):
+            return self.skip(start_row, skipped, chunk_timings)
+        fast = isinstance(chunk, list)
+        with timed(chunk_timings, 'intern'):
+            # Outside the chunk's transaction: new values commit on their own and stay valid
+            if self.dimensions is None:
+                self.dimensions = DimensionCache()
+            interned = self.dimensions.intern_rows(chunk) if fast else self.dimensions.intern_frame(chunk)
+        transaction_start = time.time()
+        with tuned_for_load() if fast else nullcontext(), transaction.atomic():
+            with timed(chunk_timings, 'rollups'):
+                if self.incremental_rollups:
+                    # Before the write, while SalesFact still holds the lines an upsert replaces
+                    apply_chunk_rollups(chunk, interned, self.dedup_mode)
+                else:
+                    self.rollup_days |= row_days(chunk) if fast else chunk_days(chunk)
+            if self.stage:
+                written = stage_rows(interned, self.stage) if fast else stage_chunk(interned, self.stage)
+            else:
+                written = write_rows(interned, dedup_mode=self.dedup_mode) if fast else write_chunk(interned, dedup_mode=self.dedup_mode)
+                self.rows_written += written['written']
+                bump_generation()
+            add_timings(chunk_timings, written['timings'])
+            self.total_rows_processed += written['rows'] + skipped
+            self.rows_this_run += written['rows']
+            self.write_seconds += written['seconds']
+            if job:
+                # Saves the records of earlier chunks; this chunk's commit time is not known yet
+                with timed(chunk_timings, 'checkpoint'):
+                    job.checkpoint(
+                        written['rows'] + skipped, time.time() - self.chunk_start, self.report, self.rollup_days, timings, self.delta,
+                    )
+            logger.info(f"Successfully wrote {written['written']} of {written['rows']} rows in chunk, total processed: {self.total_rows_processed}")
+            logger.info(f"Memory usage: {self.process.memory_info().rss / 1024 / 1024:.2f} MB")
+            commit_start = time.perf_counter()
+        chunk_timings['commit'] = time.perf_counter() - commit_start
+        add_timings(timings['stages'], chunk_timings)
+        timings['chunks'].append({
+            'start_row': start_row, 'rows': written['rows'], **({'skipped': skipped} if self.delta else {}),
+            **round_timings(chunk_timings),
+        })
+        logger.info(f"Chunk timings: {round_timings(chunk_timings)}")
+        if not self.stage:
+            self.lock_seconds = max(self.lock_seconds, time.time() - transaction_start)
+        self.chunk_start = time.time()
+        return written['rows'] + skipped
+
+    def count_delta(self, chunk_delta):
+        """Add a chunk's rows dropped by the delta filter and its highest value to the file's; returns the rows dropped"""
+        if not chunk_delta:
+            return 0
+        self.delta['skipped'] += chunk_delta['skipped']
+        self.delta['max'] = self.delta_filter.higher(self.delta['max'], chunk_delta['max'])
+        return chunk_delta['skipped']
+
+    def skip(self, start_row, skipped, chunk_timings):
+        """Checkpoint a chunk the delta filter dropped whole; only the file position moves on"""
+        job, timings = self.job, self.timings
+        with transaction.atomic():
+            self.total_rows_processed += skipped
+            if job:
+                with timed(chunk_timings, 'checkpoint'):
+                    job.checkpoint(skipped, time.time() - self.chunk_start, self.report, self.rollup_days, timings, self.delta)
+        add_timings(timings['stages'], chunk_timings)
+        timings['chunks'].append({'start_row': start_row, 'rows': 0, 'skipped': skipped, **round_timings(chunk_timings)})
+        logger.info(f"Skipped {skipped} rows at or below the watermark, total processed: {self.total_rows_processed}")
+        self.chunk_start = time.time()
+        return skipped
+
+    def finish(self):
+        """Move a staged file into ExcelData, rebuild touched rollups and return the import's totals"""
+        job, timings = self.job, self.timings
+        final_start = time.time()
+        if self.stage:
+            try:
+                with timed(timings['stages'], 'validate'):
+                    validate_stage(self.stage, self.total_rows_processed - (self.delta['skipped'] if self.delta else 0), self.dedup_mode)
+                with timed(timings['stages'], 'swap'):
+                    self.rows_written, self.lock_seconds = swap_stage(self.stage, self.dedup_mode)
+            except Exception:
+                # A failed job isn't resumed, so the stage would only be left behind
+                discard_stage(self.stage)
+                raise
+        if self.rollup_days:
+            with timed(timings['stages'], 'rollups'):
+                rebuild_rollups(self.rollup_days)
+        timings['stages'] = round_timings(timings['stages'])
+        if job:
+            job.elapsed_seconds += time.time() - final_start
+            job.timings = timings
+            job.save(update_fields=['elapsed_seconds', 'timings', 'updated_at'])
+
+        # Log invalid values and performance
+        elapsed = time.time() - self.start_time
+        if self.report:
+            logger.warning(f"Replaced invalid values in {len(self.report.columns)} columns: {self.report.counts()}")
+        for col, paths in self.stats.get('date_paths', {}).items():
+            logger.info(f"Dates in {col}: {paths}")
+        logger.info(f"Total processing time: {elapsed:.2f} seconds")
+        if self.write_seconds > 0:
+            logger.info(f"Writer ({'staged' if self.staged else writer_method()}) throughput: {self.rows_this_run / self.write_seconds:.0f} rows/sec")
+        logger.info(f"Longest transaction on ExcelData: {self.lock_seconds:.2f} seconds")
+        logger.info(f"Seconds per stage: {timings['stages']}")
+
+        return {
+            'rows': self.total_rows_processed,
+            'rows_written': self.rows_written,
+            'seconds': elapsed,
+            'write_seconds': self.write_seconds,
+            'lock_seconds': self.lock_seconds,
+            'invalid_report': self.report,
+            'date_paths': self.stats.get('date_paths', {}),
+            'timings': timings,
+            'delta': self.delta,
+        }
+
+
+def run_import(path, job=None, chunk_size=CHUNK_SIZE, workers=None, queue_depth=None, dedup_mode=None, staged=None, sheet_name=None, fast_lane=None, delta=None):
+    """Import a stored upload (or one sheet of it) into ExcelData; see FileImport"""
+    source = FileImport(path, job, chunk_size, workers, queue_depth, dedup_mode, staged, sheet_name, fast_lane, delta)
+    for item in source.chunks():
+        source.write(*item)
+    return source.finish()
+
+
+_SOURCE_DONE = object()  # Queued by a reader after its source's last chunk
+
+
+def run_batch(sources, parallelism=None, on_chunk=None):
+    """Import several FileImports at once through this thread's single writer.
+
+    Up to `parallelism` sources (default EXCEL_IMPORT_BATCH_PARALLELISM) are read and
+    preprocessed concurrently on threads, handing finished chunks over a bounded queue;
+    this thread writes them in arrival order, so only one transaction writes to ExcelData
+    at a time. A source that fails stops on its own and the others carry on.
+    on_chunk(index, rows) is called after each committed chunk.
+    Returns one (result, error) pair per source, in input order.
+    """
+    if parallelism is None:
+        parallelism = getattr(settings, 'EXCEL_IMPORT_BATCH_PARALLELISM', 2)
+    parallelism = max(1, min(parallelism, len(sources) or 1))
+    ready = queue.Queue(maxsize=parallelism * 2)
+    stopped = [threading.Event() for _ in sources]
+    outcomes = [(None, None)] * len(sources)
+
+    def hand_over(index, item, error=None):
+        # Re-check the stop flag while the queue is full, so a failed source can't block
+        while not stopped[index].is_set():
+            try:
+                ready.put((index, item, error), timeout=0.5)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce(index):
+        try:
+            for item in sources[index].chunks():
+                if not hand_over(index, item):
+                    return
+            hand_over(index, _SOURCE_DONE)
+        except Exception as e:
+            hand_over(index, None, e)
+
+    with ThreadPoolExecutor(max_workers=parallelism, thread_name_prefix='import-reader') as pool:
+        for index in range(len(sources)):
+            pool.submit(produce, index)
+        remaining = len(sources)
+        try:
+            while remaining:
+                index, item, error = ready.get()
+                if stopped[index].is_set():
+                    continue
+                try:
+                    if error is not None:
+                        raise error
+                    if item is _SOURCE_DONE:
+                        outcomes[index] = (sources[index].finish(), None)
+                    else:
+                        rows = sources[index].write(*item)
+                        if on_chunk:
+                            on_chunk(index, rows)
+                        continue
+                except Exception as e:
+                    logger.error(f"Batch source {index} failed: {str(e)}", exc_info=True)
+                    outcomes[index] = (None, e)
+                stopped[index].set()
+                remaining -= 1
+        finally:
+            # Release readers still waiting on the queue if the writer stops early
+            for event in stopped:
+                event.set()
+    return outcomes
+
@@ -0,0 +1,368 @@
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+from datetime import timedelta
+from functools import partial
+from pathlib import Path
+from .ingest import run_import, run_batch, missing_columns, FileImport, CHUNK_SIZE
+from .readers import count_rows, sheet_names, is_csv
+from .staging import discard_stage, stage_table_name
+from .models import ImportJob
+from .delta import advance_watermark
+import hashlib
+import logging
+import threading
+import time
+import uuid
+import zipfile
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_TYPES = ('.xls', '.xlsx', '.csv', '.zip')
+MAX_UPLOAD_BYTES = 600 * 1024 * 1024
+ARCHIVE_MEMBER_TYPES = ('.csv', '.xlsx', '.xls')
+MAX_ARCHIVE_BYTES = 2 * 1024 * 1024 * 1024  # Uncompressed size limit of a zip upload
+
+
+def upload_dir():
+    path = Path(getattr(settings, 'EXCEL_IMPORT_UPLOAD_DIR', Path(settings.BASE_DIR) / 'uploads'))
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def store_upload(uploaded_file):
+    """Stream an uploaded file to the upload directory and return its path and SHA-256"""
+    path = upload_dir() / f"{uuid.uuid4().hex}_{Path(uploaded_file.name).name}"
+    digest = hashlib.sha256()
+    with open(path, 'wb') as f:
+        for block in uploaded_file.chunks():
+            digest.update(block)
+            f.write(block)
+    return path, digest.hexdigest()
+
+
+def file_digest(path):
+    """SHA-256 of a file already on disk, as store_upload computes it for uploads"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def create_job(file_name, path, content_hash, **job_fields):
+    """Create the import job of a stored upload unless a byte-identical file was already imported.
+
+    Returns (job, None), or (None, previous job) after deleting the redundant copy.
+    job_fields (dedup_mode, staged, profile) are set on the job.
+    """
+    previous = previous_import(content_hash)
+    if previous:
+        logger.info(f"File {file_name} matches already imported job {previous.pk}, skipping")
+        Path(path).unlink(missing_ok=True)
+        return None, previous
+    job = ImportJob.objects.create(
+        file_name=file_name, file_path=str(path), content_hash=content_hash, **{'chunk_size': CHUNK_SIZE, **job_fields},
+    )
+    return job, None
+
+
+def previous_import(content_hash, sheet_name=None):
+    """Return the finished job that already imported a file (or sheet) with this content, if any"""
+    return ImportJob.objects.filter(
+        content_hash=content_hash, sheet_name=sheet_name, status=ImportJob.STATUS_DONE,
+    ).order_by('-pk').first()
+
+
+def extract_archive(path, archive_name, keep_archive=False):
+    """Unpack the importable members of a stored zip upload next to it, then delete the zip unless keep_archive.
+
+    Returns (file_name, path, sha256) per member. Only member base names are used on
+    disk, so paths inside the archive can't escape the upload directory.
+    """
+    members = []
+    with zipfile.ZipFile(path) as archive:
+        infos = [
+            info for info in archive.infolist()
+            if not info.is_dir() and info.filename.lower().endswith(ARCHIVE_MEMBER_TYPES)
+            and not Path(info.filename).name.startswith(('.', '~$')) and '__MACOSX' not in info.filename
+        ]
+        if sum(info.file_size for info in infos) > MAX_ARCHIVE_BYTES:
+            raise ValueError(f"{archive_name} unpacks to more than {MAX_ARCHIVE_BYTES // (1024 * 1024)}MB")
+        for info in infos:
+            member_path = upload_dir() / f"{uuid.uuid4().hex}_{Path(info.filename).name}"
+            digest = hashlib.sha256()
+            with archive.open(info) as source, open(member_path, 'wb') as f:
+                for block in iter(lambda: source.read(1024 * 1024), b''):
+                    digest.update(block)
+                    f.write(block)
+            members.append((f"{archive_name}/{info.filename}", member_path, digest.hexdigest()))
+    if not keep_archive:
+        Path(path).unlink(missing_ok=True)
+    return members
+
+
+def create_batch(uploaded_files, all_sheets=False, profile=False, **job_fields):
+    """Store several uploads as one batch job; see create_stored_batch"""
+    stored = [(uploaded_file.name, *store_upload(uploaded_file)) for uploaded_file in uploaded_files]
+    return create_stored_batch(stored, all_sheets, profile, **job_fields)
+
+
+def create_stored_batch(stored, all_sheets=False, profile=False, keep_archives=False, **job_fields):
+    """Make uploads stored as (file_name, path, sha256) one batch job with a part per file or sheet.
+
+    Zips are unpacked (and deleted unless keep_archives), and with all_sheets each
+    workbook gets a part per sheet. Parts whose header lacks expected columns are failed
+    and parts already imported are skipped up front; the rest are queued. job_fields
+    (dedup_mode, staged, chunk_size) apply to every part; profile profiles the whole batch.
+    """
+    job_fields = {'chunk_size': CHUNK_SIZE, **job_fields}
+    sources = []
+    for file_name, path, content_hash in stored:
+        if file_name.lower().endswith('.zip'):
+            sources.extend(extract_archive(path, file_name, keep_archives))
+        else:
+            sources.append((file_name, path, content_hash))
+
+    batch = ImportJob.objects.create(
+        file_name=', '.join(file_name for file_name, _, _ in stored)[:255],
+        file_path='', is_batch=True, profile=profile, **job_fields,
+    )
+    seen = set()
+    for file_name, path, content_hash in sources:
+        sheets = sheet_names(path) if all_sheets and not is_csv(str(path)) else [None]
+        for sheet_name in sheets:
+            part = ImportJob(
+                batch=batch, file_name=file_name[:255], file_path=str(path), sheet_name=sheet_name,
+                content_hash=content_hash, **job_fields,
+            )
+            missing = missing_columns(path, sheet_name)
+            previous = previous_import(content_hash, sheet_name)
+            if missing:
+                part.status = ImportJob.STATUS_FAILED
+                part.error = f"Missing required columns: {', '.join(missing)}"
+            elif previous or (content_hash, sheet_name) in seen:
+                part.status = ImportJob.STATUS_SKIPPED
+                part.message = f"already imported as job {previous.pk}" if previous else "repeats another file of this batch"
+            seen.add((content_hash, sheet_name))
+            part.save()
+    logger.info(f"Created batch import job {batch.pk} with {batch.parts.count()} parts")
+    return batch
+
+
+def runner():
+    """Return how jobs are executed: 'celery', 'thread' (in-process) or 'sync'"""
+    default = 'celery' if getattr(settings, 'CELERY_BROKER_URL', '') else 'thread'
+    return getattr(settings, 'EXCEL_IMPORT_RUNNER', None) or default
+
+
+def enqueue_import(job, mode=None):
+    """Hand a queued job to the configured runner"""
+    mode = mode or runner()
+    logger.info(f"Dispatching import job {job.pk} via {mode} runner")
+    if mode == 'celery':
+        from .tasks import import_job_task
+        import_job_task.delay(job.pk)
+    elif mode == 'thread':
+        threading.Thread(target=_run_in_thread, args=(job.pk,), daemon=True).start()
+    else:
+        run_import_job(job.pk)
+
+
+def _run_in_thread(job_id):
+    # Worker threads get their own DB connections, which must be closed explicitly
+    close_old_connections()
+    try:
+        run_import_job(job_id)
+    finally:
+        close_old_connections()
+
+
+def run_import_job(job_id, workers=None, parallelism=None):
+    """Run (or resume) an import job to completion.
+
+    workers and parallelism override EXCEL_IMPORT_WORKERS and EXCEL_IMPORT_BATCH_PARALLELISM.
+    """
+    job = ImportJob.objects.get(pk=job_id)
+    if job.status == ImportJob.STATUS_DONE:
+        logger.info(f"Import job {job_id} already finished")
+        return job
+    if job.is_batch:
+        return run_batch_job(job, workers, parallelism)
+
+    job.status = ImportJob.STATUS_RUNNING
+    if job.total_rows is None:
+        job.total_rows = count_rows(job.file_path, job.sheet_name)
+    job.save(update_fields=['status', 'total_rows', 'updated_at'])
+
+    try:
+        run = partial(run_import, job.file_path, job=job, chunk_size=job.chunk_size, workers=workers)
+        result = run_profiled(job, run) if job.profile else run()
+    except Exception as e:
+        logger.error(f"Import job {job_id} failed after {job.chunks_done} chunks: {str(e)}", exc_info=True)
+        fail_job(job, e)
+        return job
+
+    finish_job(job, result)
+    return job
+
+
+def fail_job(job, error):
+    job.status = ImportJob.STATUS_FAILED
+    job.error = str(error)
+    job.save(update_fields=['status', 'error', 'updated_at'])
+    if job.staged:
+        # Failed jobs aren't resumed, so nothing would load the rest of the stage
+        discard_stage(stage_table_name(job.pk))
+
+
+def finish_job(job, result):
+    """Set a job's final status and summary message from its run_import result"""
+    if result['rows'] == 0:
+        job.status = ImportJob.STATUS_FAILED
+        job.error = 'No data was saved. Please check the file format or data validity.'
+    else:
+        delta = result.get('delta')
+        rows = result['rows'] - (delta['skipped'] if delta else 0)
+        job.status = ImportJob.STATUS_DONE
+        job.message = f"Successfully saved {rows} records in {job.elapsed_seconds:.2f} seconds."
+        if delta and delta['skipped']:
+            job.message += f" Skipped {delta['skipped']} rows at or below the {delta['source']} watermark ({delta['field']} {delta['after']})."
+        if result['rows_written'] < rows:
+            job.message += f" {rows - result['rows_written']} rows matched stored or repeated lines and were not inserted again."
+        if job.staged:
+            job.message += f" Moved into the live table in {result['lock_seconds']:.2f} seconds."
+        if result['invalid_report']:
+            replaced = sum(result['invalid_report'].counts().values())
+            job.message += f" Replaced {replaced} invalid values with 0."
+    job.save(update_fields=['status', 'message', 'error', 'updated_at'])
+    if job.status == ImportJob.STATUS_DONE:
+        advance_watermark(result.get('delta'), job)
+
+
+def run_batch_job(job, workers=None, parallelism=None):
+    """Run (or resume) the unfinished parts of a batch job and record their combined totals.
+
+    Parts are imported concurrently by run_batch, up to parallelism at a time; the batch
+    job's progress is the sum of its parts'. A failed part doesn't stop the others.
+    """
+    parts = list(job.parts.filter(status__in=[ImportJob.STATUS_QUEUED, ImportJob.STATUS_RUNNING]).order_by('pk'))
+    for part in parts:
+        part.status = ImportJob.STATUS_RUNNING
+        if part.total_rows is None:
+            part.total_rows = count_rows(part.file_path, part.sheet_name)
+        part.save(update_fields=['status', 'total_rows', 'updated_at'])
+    job.status = ImportJob.STATUS_RUNNING
+    job.total_rows = sum(part.total_rows or 0 for part in job.parts.all())
+    job.rows_done = sum(part.rows_done for part in job.parts.all())
+    job.save(update_fields=['status', 'total_rows', 'rows_done', 'updated_at'])
+
+    sources, running = [], []
+    for part in parts:
+        try:
+            sources.append(FileImport(part.file_path, job=part, chunk_size=part.chunk_size, workers=workers))
+            running.append(part)
+        except Exception as e:
+            logger.error(f"Could not start batch part {part.pk} ({part.source_name}): {str(e)}", exc_info=True)
+            fail_job(part, e)
+
+    start_time = time.time()
+    elapsed_before = job.elapsed_seconds
+
+    def on_chunk(index, rows):
+        job.rows_done += rows
+        job.chunks_done += 1
+        job.elapsed_seconds = elapsed_before + time.time() - start_time
+        job.save(update_fields=['rows_done', 'chunks_done', 'elapsed_seconds', 'updated_at'])
+
+    try:
+        run = partial(run_batch, sources, parallelism, on_chunk=on_chunk)
+        outcomes = run_profiled(job, run) if job.profile else run()
+    except Exception as e:
+        logger.error(f"Batch import job {job.pk} failed: {str(e)}", exc_info=True)
+        fail_job(job, e)
+        return job
+    for part, (result, error) in zip(running, outcomes):
+        if error is not None:
+            fail_job(part, error)
+        else:
+            finish_job(part, result)
+
+    parts = list(job.parts.order_by('pk'))
+    job.elapsed_seconds = elapsed_before + time.time() - start_time
+    job.rows_done = sum(part.rows_done for part in parts)
+    done = [part for part in parts if part.status == ImportJob.STATUS_DONE]
+    summary = '; '.join(f"{part.source_name}: {part_summary(part)}" for part in parts)
+    if done:
+        job.status = ImportJob.STATUS_DONE
+        job.message = (
+            f"Imported {len(done)} of {len(parts)} files/sheets, {job.rows_done} records "
+            f"in {job.elapsed_seconds:.2f} seconds. {summary}."
+        )
+    else:
+        job.status = ImportJob.STATUS_FAILED
+        job.error = f"No file or sheet of the batch was imported. {summary}."
+    job.save(update_fields=['status', 'message', 'error', 'rows_done', 'elapsed_seconds', 'updated_at'])
+    return job
+
+
+def part_summary(part):
+    if part.status == ImportJob.STATUS_DONE:
+        invalid = sum(part.invalid_counts.values())
+        skipped = part.delta['skipped'] if part.delta else 0
+        return (
+            f"{part.rows_done - skipped} rows" + (f", {skipped} at or below the watermark skipped" if skipped else '')
+            + (f", {invalid} invalid values replaced" if invalid else '')
+        )
+    if part.status == ImportJob.STATUS_SKIPPED:
+        return part.message
+    return f"failed ({part.error})"
+
+
+def run_profiled(job, run):
+    """Call run() under pyinstrument (HTML report) when installed, else cProfile (.prof).
+
+    Only this process is profiled; preprocessing on a worker pool shows up as waits.
+    """
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        Profiler = None
+
+    if Profiler:
+        profiler = Profiler()
+        path = upload_dir() / f"profile_{job.pk}.html"
+        profiler.start()
+    else:
+        import cProfile
+        profiler = cProfile.Profile()
+        path = upload_dir() / f"profile_{job.pk}.prof"
+        profiler.enable()
+    try:
+        return run()
+    finally:
+        if Profiler:
+            profiler.stop()
+            path.write_text(profiler.output_html(), encoding='utf-8')
+        else:
+            profiler.disable()
+            profiler.dump_stats(path)
+        job.profile_path = str(path)
+        job.save(update_fields=['profile_path', 'updated_at'])
+        logger.info(f"Saved profile of import job {job.pk} to {path}")
+
+
+def resume_stale_jobs(stale_after=timedelta(minutes=5), mode=None):
+    """Re-dispatch queued/running jobs whose worker stopped reporting progress"""
+    cutoff = timezone.now() - stale_after
+    # Parts of a batch are resumed through their batch job
+    jobs = ImportJob.objects.filter(
+        status__in=[ImportJob.STATUS_QUEUED, ImportJob.STATUS_RUNNING],
+        updated_at__lt=cutoff, batch__isnull=True,
+    )
+    resumed = []
+    for job in jobs:
+        logger.info(f"Resuming stale import job {job.pk} from row {job.rows_done}")
+        enqueue_import(job, mode)
+        resumed.append(job)
+    return resumed
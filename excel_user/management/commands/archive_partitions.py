@@ -0,0 +1,55 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from excel_user.partitions import ARCHIVE_DESTINATIONS, add_months, archive_month, month_start, months_before
+from pathlib import Path
+import importlib.util
+
+
+class Command(BaseCommand):
+    help = (
+        'Move ExcelData months older than a cutoff to the compressed ExcelDataArchive table or to '
+        'one Parquet file per month, emptying their partitions. The rollups keep the archived '
+        'lines\' totals, which are also stored in ArchivedDaily for later rollup rebuilds'
+    )
+
+    def add_arguments(self, parser):
+        cutoff = parser.add_mutually_exclusive_group(required=True)
+        cutoff.add_argument('--keep-months', type=int, help='Months to keep in ExcelData, counting the current one')
+        cutoff.add_argument('--before', help='Archive months before this one (YYYY-MM)')
+        parser.add_argument('--to', choices=ARCHIVE_DESTINATIONS, default='table')
+        parser.add_argument('--dir', help='Directory for Parquet files (default EXCEL_ARCHIVE_DIR)')
+        parser.add_argument('--dry-run', action='store_true', help='List the months and row counts without moving them')
+
+    def handle(self, *args, **options):
+        if options['keep_months'] is not None:
+            if options['keep_months'] < 1:
+                raise CommandError('--keep-months must be at least 1')
+            cutoff = add_months(month_start(timezone.localdate()), 1 - options['keep_months'])
+        else:
+            cutoff = parse_date(f"{options['before']}-01")
+            if cutoff is None:
+                raise CommandError(f"Invalid month: {options['before']}")
+
+        directory = None
+        if options['to'] == 'parquet':
+            if importlib.util.find_spec('pyarrow') is None:
+                raise CommandError('Parquet archives need the pyarrow package')
+            directory = Path(options['dir'] or settings.EXCEL_ARCHIVE_DIR)
+            directory.mkdir(parents=True, exist_ok=True)
+
+        months = months_before(cutoff)
+        if not months:
+            self.stdout.write(f"No ExcelData rows dated before {cutoff:%Y-%m}")
+            return
+        total = 0
+        for month, rows in months:
+            if options['dry_run']:
+                self.stdout.write(f"{month:%Y-%m}: {rows} rows")
+                continue
+            moved = archive_month(month, options['to'], directory)
+            total += moved
+            self.stdout.write(f"{month:%Y-%m}: moved {moved} rows to {options['to']}")
+        if not options['dry_run']:
+            self.stdout.write(f"Archived {total} rows from {len(months)} month(s)")
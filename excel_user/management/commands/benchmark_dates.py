@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+from datetime import datetime, timedelta
+from excel_user.preprocess import InvalidValueReport, convert_dates, detect_date_formats
+from excel_user.readers import read_chunks
+from excel_user.schema import import_schema
+import pandas as pd
+import time
+
+
+def legacy_convert(df, col):
+    # The conversion preprocess_chunk used before format detection, kept for comparison
+    df[col] = pd.to_datetime(df[col], dayfirst=True, errors='coerce').dt.date
+    mask = df[col].isna() & df[col].notna()
+    if mask.any():
+        df.loc[mask, col] = pd.to_numeric(df.loc[mask, col], errors='coerce').apply(
+            lambda x: (datetime(1899, 12, 30) + timedelta(days=int(x))).date() if pd.notna(x) else None
+        )
+
+
+class Command(BaseCommand):
+    help = 'Compare date column conversion time of the legacy and format-detecting parsers on a file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or Excel file laid out like the upload template')
+        parser.add_argument('--chunk-size', type=int, default=50000)
+
+    def handle(self, *args, **options):
+        chunks = [chunk for _, chunk in read_chunks(options['path'], options['chunk_size'])]
+        columns = [column.header for column in import_schema().of_kind('date') if column.header in chunks[0].columns]
+        rows = sum(len(chunk) for chunk in chunks)
+
+        start_time = time.time()
+        for chunk in chunks:
+            df = chunk[columns].copy()
+            for col in columns:
+                legacy_convert(df, col)
+        legacy_seconds = time.time() - start_time
+
+        start_time = time.time()
+        date_formats = detect_date_formats(chunks[0], columns)
+        stats = {}
+        for chunk in chunks:
+            df = chunk[columns].copy()
+            for col in columns:
+                convert_dates(df, col, InvalidValueReport(), stats, date_formats.get(col))
+        new_seconds = time.time() - start_time
+
+        self.stdout.write(f"{rows} rows, date columns {columns}")
+        self.stdout.write(f"legacy: {legacy_seconds:.3f}s ({rows / legacy_seconds:.0f} rows/sec)")
+        self.stdout.write(f"detected formats {date_formats}: {new_seconds:.3f}s ({rows / new_seconds:.0f} rows/sec)")
+        for col, paths in stats['date_paths'].items():
+            self.stdout.write(f"  {col}: {paths}")
@@ -0,0 +1,196 @@
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.utils import load_backend
+from django.http import QueryDict
+from django.test import RequestFactory
+from django.test.utils import override_settings
+from django.utils.datastructures import MultiValueDict
+from excel_user.models import ImportJob
+from excel_user.synthetic import DATE_FORMAT_CHOICES, generate_sales_file
+from excel_user.views import index
+from datetime import datetime
+from pathlib import Path
+import json
+import platform
+import subprocess
+import tempfile
+import threading
+import time
+import pandas as pd
+import psutil
+
+
+class PeakMemory(threading.Thread):
+    """Samples the RSS of this process and its children until stopped, keeping the maximum"""
+
+    def __init__(self, interval=0.05):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak = 0
+        self.stopped = threading.Event()
+        self.process = psutil.Process()
+
+    def sample(self):
+        total = 0
+        for process in [self.process] + self.process.children(recursive=True):
+            try:
+                total += process.memory_info().rss
+            except psutil.NoSuchProcess:
+                pass
+        self.peak = max(self.peak, total)
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.sample()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+        self.sample()
+        return self.peak / 1024 / 1024
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the upload view on synthetic sales files against a throwaway SQLite database, '
+        'reporting rows/sec, peak RSS and seconds per import stage, and saving the results as JSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000], help='Row counts to benchmark (10k to 5M)')
+        parser.add_argument('--formats', nargs='+', choices=['csv', 'xlsx'], default=['csv'])
+        parser.add_argument('--dirty-ratio', type=float, default=0.0, help='Share of numeric and date cells made unparsable')
+        parser.add_argument('--date-format', default='%d-%m-%Y', help=f"strftime format or one of {DATE_FORMAT_CHOICES[-2:]}")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--repeat', type=int, default=1, help='Runs per case; the fastest is reported')
+        parser.add_argument('--workers', type=int, default=1)
+        parser.add_argument('--dedup', choices=['update', 'skip', 'insert'], default='insert')
+        parser.add_argument('--staged', action='store_true')
+        parser.add_argument('--data-dir', help='Where generated files are kept and reused (default a temporary directory)')
+        parser.add_argument('--output', help='JSON results path (default benchmarks/import-<commit>-<time>.json)')
+        parser.add_argument('--compare', help='Earlier results JSON to print rows/sec changes against')
+
+    def handle(self, *args, **options):
+        if not 0 <= options['dirty_ratio'] < 1:
+            raise CommandError('--dirty-ratio must be in [0, 1)')
+        with tempfile.TemporaryDirectory(prefix='excel_benchmark_') as work_dir:
+            cases = self.run_cases(Path(work_dir), options)
+
+        commit = git_commit()
+        results = {
+            'commit': commit,
+            'started': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'parameters': {
+                key: options[key] for key in
+                ('dirty_ratio', 'date_format', 'seed', 'repeat', 'workers', 'dedup', 'staged')
+            },
+            'cases': cases,
+        }
+        output = Path(options['output'] or Path(settings.BASE_DIR) / 'benchmarks' / f"import-{commit or 'unknown'}-{datetime.now():%Y%m%d%H%M%S}.json")
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(results, indent=2))
+        self.stdout.write(f"Results saved to {output}")
+        if options['compare']:
+            self.compare(json.loads(Path(options['compare']).read_text()), results)
+
+    def run_cases(self, work_dir, options):
+        """Generate (or reuse) each requested file and import it, returning one result per case"""
+        data_dir = Path(options['data_dir']) if options['data_dir'] else work_dir / 'data'
+
+        cases = []
+        for file_format in options['formats']:
+            for rows in options['rows']:
+                path = data_dir / (
+                    f"sales_{rows}_dirty{options['dirty_ratio']:g}_{self.date_label(options['date_format'])}"
+                    f"_seed{options['seed']}.{file_format}"
+                )
+                if not path.exists():
+                    self.stdout.write(f"Generating {path.name}")
+                    try:
+                        generate_sales_file(path, rows, options['dirty_ratio'], options['date_format'], options['seed'])
+                    except ValueError as e:
+                        raise CommandError(str(e))
+                runs = [self.run_case(path, work_dir, options) for _ in range(options['repeat'])]
+                result = max(runs, key=lambda run: run['rows_per_sec'])
+                result.update({'format': file_format, 'rows': rows, 'file_mb': round(path.stat().st_size / 1024 / 1024, 1)})
+                cases.append(result)
+                self.stdout.write(
+                    f"{file_format} {rows} rows: {result['seconds']:.2f}s, {result['rows_per_sec']:.0f} rows/sec, "
+                    f"peak RSS {result['peak_rss_mb']:.0f} MB"
+                )
+                self.stdout.write(f"  stages: {result['stages']}")
+        return cases
+
+    @staticmethod
+    def date_label(date_format):
+        return ''.join(char for char in date_format if char.isalnum()) or 'date'
+
+    def run_case(self, path, work_dir, options):
+        """Import one file through views.index into a freshly migrated SQLite database"""
+        database = work_dir / f'benchmark_{time.time_ns()}.sqlite3'
+        original = connections['default']
+        backend = load_backend('django.db.backends.sqlite3')
+        connection = backend.DatabaseWrapper({**original.settings_dict, 'ENGINE': 'django.db.backends.sqlite3', 'NAME': str(database), 'OPTIONS': {}}, 'default')
+        connections['default'] = connection
+        try:
+            call_command('migrate', verbosity=0, database='default')
+            with override_settings(
+                EXCEL_IMPORT_RUNNER='sync', EXCEL_IMPORT_UPLOAD_DIR=str(work_dir / 'uploads'),
+                EXCEL_IMPORT_WORKERS=options['workers'], EXCEL_IMPORT_STAGED=options['staged'],
+                EXCEL_IMPORT_DEDUP=options['dedup'], ALLOWED_HOSTS=['*'],
+            ), open(path, 'rb') as f:
+                request = RequestFactory().post('/')
+                # The form is handed over already parsed, as Django's multipart handler would leave it
+                request._post = QueryDict(f"dedup_mode={options['dedup']}")
+                request._files = MultiValueDict({'excel_file': [UploadedFile(f, name=path.name, size=path.stat().st_size)]})
+                memory = PeakMemory()
+                memory.start()
+                start_time = time.perf_counter()
+                index(request)
+                seconds = time.perf_counter() - start_time
+                peak_rss_mb = memory.stop()
+            job = ImportJob.objects.order_by('-pk').first()
+            if job is None or job.status != ImportJob.STATUS_DONE:
+                raise CommandError(f"Import of {path.name} failed: {job.error if job else 'no job was created'}")
+            return {
+                'seconds': round(seconds, 3),
+                # The rest of the request is the header check, row count and upload copy
+                'import_seconds': round(job.elapsed_seconds, 3),
+                'chunk_size': job.chunk_size,
+                'rows_per_sec': round(job.rows_done / seconds, 1),
+                'peak_rss_mb': round(peak_rss_mb, 1),
+                'rows_imported': job.rows_done,
+                'invalid_values': sum(job.invalid_counts.values()),
+                'stages': job.timings.get('stages', {}),
+            }
+        finally:
+            connection.close()
+            connections['default'] = original
+            database.unlink(missing_ok=True)
+
+    def compare(self, baseline, results):
+        previous = {(case['format'], case['rows']): case for case in baseline.get('cases', [])}
+        self.stdout.write(f"Compared with {baseline.get('commit') or 'baseline'}:")
+        for case in results['cases']:
+            before = previous.get((case['format'], case['rows']))
+            if not before:
+                continue
+            change = (case['rows_per_sec'] / before['rows_per_sec'] - 1) * 100
+            self.stdout.write(
+                f"  {case['format']} {case['rows']} rows: {before['rows_per_sec']:.0f} -> {case['rows_per_sec']:.0f} rows/sec "
+                f"({change:+.1f}%), peak RSS {before['peak_rss_mb']:.0f} -> {case['peak_rss_mb']:.0f} MB"
+            )
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from excel_user.ingest import run_import, CHUNK_SIZE
+
+
+class Command(BaseCommand):
+    help = 'Compare load time and ExcelData lock time of direct, staged and fast-lane imports (rolled back afterwards)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or Excel file laid out like the upload template')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+        parser.add_argument('--dedup', choices=['update', 'skip', 'insert'], default='update')
+
+    def handle(self, *args, **options):
+        for name, staged, fast_lane in (('direct', False, False), ('staged', True, False), ('fast lane', False, True), ('staged fast lane', True, True)):
+            with transaction.atomic():
+                result = run_import(
+                    options['path'], chunk_size=options['chunk_size'], dedup_mode=options['dedup'], staged=staged, fast_lane=fast_lane,
+                )
+                transaction.set_rollback(True)
+            self.stdout.write(
+                f"{name}: {result['rows']} rows in {result['seconds']:.2f}s, "
+                f"load {result['write_seconds']:.2f}s, longest ExcelData transaction {result['lock_seconds']:.2f}s"
+            )
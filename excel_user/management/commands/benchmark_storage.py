@@ -0,0 +1,72 @@
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connection
+from django.db.models import Sum
+from excel_user.models import DimensionValue, ExcelData, SalesFact
+import time
+
+
+def object_sizes(tables):
+    """Bytes used by each table and its indexes, by object name, or None where the backend can't tell"""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            try:
+                cursor.execute(
+                    "SELECT name, SUM(pgsize) FROM dbstat WHERE name IN "
+                    "(SELECT name FROM sqlite_master WHERE tbl_name IN (%s)) GROUP BY name" % ', '.join(['%s'] * len(tables)),
+                    tables,
+                )
+            except DatabaseError:
+                return None  # SQLite built without the dbstat table
+        elif connection.vendor == 'postgresql':
+            cursor.execute(
+                "SELECT c.relname, pg_relation_size(c.oid) FROM pg_class c "
+                "LEFT JOIN pg_index i ON i.indexrelid = c.oid "
+                "WHERE c.oid IN (SELECT oid FROM pg_class WHERE relname = ANY(%s)) "
+                "OR i.indrelid IN (SELECT oid FROM pg_class WHERE relname = ANY(%s))",
+                [tables, tables],
+            )
+        elif connection.vendor == 'microsoft':
+            cursor.execute(
+                "SELECT COALESCE(i.name, OBJECT_NAME(s.object_id)), SUM(s.used_page_count) * 8192 "
+                "FROM sys.dm_db_partition_stats s JOIN sys.indexes i ON i.object_id = s.object_id AND i.index_id = s.index_id "
+                "WHERE s.object_id IN (%s) GROUP BY i.name, s.object_id" % ', '.join(['OBJECT_ID(%s)'] * len(tables)),
+                tables,
+            )
+        else:
+            return None
+        return dict(cursor.fetchall())
+
+
+class Command(BaseCommand):
+    help = (
+        'Report the size of the sales tables and their indexes and time typical scans of the '
+        'ExcelData view and of SalesFact\'s interned keys'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per query; the fastest is reported')
+
+    def handle(self, *args, **options):
+        sizes = object_sizes([SalesFact._meta.db_table, DimensionValue._meta.db_table])
+        if sizes is None:
+            self.stdout.write(f"Table sizes are not available on {connection.vendor}")
+        else:
+            for name, size in sorted(sizes.items(), key=lambda item: -item[1]):
+                self.stdout.write(f"{name}: {size / 1024 / 1024:.1f} MB")
+            self.stdout.write(f"total: {sum(sizes.values()) / 1024 / 1024:.1f} MB")
+
+        branch = SalesFact.objects.exclude(branch_name=None).values_list('branch_name__value', flat=True).first()
+        queries = {
+            'count rows': lambda: SalesFact.objects.count(),
+            'taxable by branch, view': lambda: list(ExcelData.objects.values('branch_name').annotate(total=Sum('taxable')).order_by()),
+            'taxable by branch, keys': lambda: list(SalesFact.objects.values('branch_name').annotate(total=Sum('taxable')).order_by()),
+            'full rows, view': lambda: sum(1 for _ in ExcelData.objects.values_list().iterator(chunk_size=10000)),
+            'one branch page, view': lambda: list(ExcelData.objects.filter(branch_name=branch).order_by('-id').values()[:100]),
+        }
+        for name, query in queries.items():
+            timings = []
+            for _ in range(options['repeat']):
+                start_time = time.perf_counter()
+                query()
+                timings.append(time.perf_counter() - start_time)
+            self.stdout.write(f"{name}: {min(timings):.3f}s")
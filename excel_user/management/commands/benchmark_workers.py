@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from excel_user.ingest import CHUNK_SIZE
+from excel_user.preprocess import preprocessed_chunks
+from excel_user.readers import read_chunks
+import time
+
+
+class Command(BaseCommand):
+    help = 'Report read + preprocess throughput of a file for several process-pool sizes (no DB writes)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or Excel file laid out like the upload template')
+        parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+        parser.add_argument('--queue-depth', type=int, default=None)
+
+    def handle(self, *args, **options):
+        for workers in options['workers']:
+            start_time = time.time()
+            rows = 0
+            chunks = read_chunks(options['path'], options['chunk_size'])
+            for _, chunk, _, _ in preprocessed_chunks(chunks, workers, options['queue_depth']):
+                rows += len(chunk)
+            elapsed = time.time() - start_time
+            self.stdout.write(f"{workers} worker(s): {rows} rows in {elapsed:.2f}s ({rows / elapsed:.0f} rows/sec)")
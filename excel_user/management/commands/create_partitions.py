@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from excel_user.partitions import MONTHS_AHEAD, create_partitions, is_partitioned
+
+
+class Command(BaseCommand):
+    help = 'Add the monthly sales partitions for the coming months (run monthly, e.g. from cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months-ahead', type=int, default=MONTHS_AHEAD, help='Months past the current one to keep partitions for')
+
+    def handle(self, *args, **options):
+        if options['months_ahead'] < 0:
+            raise CommandError('--months-ahead must not be negative')
+        if not is_partitioned():
+            self.stdout.write(f"Sales lines are not partitioned on {connection.vendor}; nothing to do")
+            return
+        months = create_partitions(options['months_ahead'])
+        if months:
+            self.stdout.write(f"Added partitions for {', '.join(f'{month:%Y-%m}' for month in months)}")
+        else:
+            self.stdout.write('Partitions already cover the coming months')
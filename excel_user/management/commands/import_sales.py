@@ -0,0 +1,157 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from excel_user.delta import DELTA_FIELDS, start_delta
+from excel_user.inbox import SETTLE_SECONDS, Inbox, import_files, resume_files, validate_files
+from excel_user.ingest import CHUNK_SIZE
+from excel_user.models import ImportJob
+from pathlib import Path
+import time
+
+
+class Command(BaseCommand):
+    help = (
+        'Import sales files without the browser: the given files, or with --watch every file dropped '
+        'into an inbox directory, moved to done/ or failed/ afterwards. Exits non-zero when a file fails.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*', help='CSV, xlsx, xls or zip files to import')
+        parser.add_argument('--watch', metavar='DIR', help='Poll this inbox directory for new files')
+        parser.add_argument('--once', action='store_true', help='With --watch, import what is in the inbox and exit')
+        parser.add_argument('--interval', type=float, default=30, help='Seconds between inbox polls')
+        parser.add_argument('--settle', type=float, default=SETTLE_SECONDS,
+                            help='Seconds a dropped file must be unchanged before it is imported')
+        parser.add_argument('--done-dir', help='Where imported files go (default DIR/done)')
+        parser.add_argument('--failed-dir', help='Where failed files go (default DIR/failed)')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='Rows per chunk')
+        parser.add_argument('--workers', type=int, help='Preprocessing processes per file (default EXCEL_IMPORT_WORKERS)')
+        parser.add_argument('--parallel', type=int,
+                            help='Files read at once, through one writer (default EXCEL_IMPORT_BATCH_PARALLELISM)')
+        parser.add_argument('--dedup', choices=[choice for choice, _ in ImportJob.DEDUP_CHOICES],
+                            help='What to do with rows already stored (default EXCEL_IMPORT_DEDUP)')
+        parser.add_argument('--staged', action='store_true', default=None, help='Load each file through a stage table')
+        parser.add_argument('--all-sheets', action='store_true', help='Import every sheet of a workbook')
+        parser.add_argument('--delta', metavar='SOURCE',
+                            help='Load only rows newer than the watermark of this export source, then advance it')
+        parser.add_argument('--delta-field', choices=DELTA_FIELDS,
+                            help='Field a new source is tracked by (default EXCEL_IMPORT_DELTA_FIELD)')
+        parser.add_argument('--dry-run', action='store_true', help='Validate the files without importing them')
+
+    def handle(self, *args, **options):
+        if options['watch'] and options['paths']:
+            raise CommandError('Give files to import or --watch DIR, not both')
+        if not options['watch'] and not options['paths']:
+            raise CommandError('Give files to import or --watch DIR')
+        if options['dry_run'] and options['watch']:
+            raise CommandError('--dry-run validates the given files and can\'t be combined with --watch')
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be at least 1')
+        if options['delta_field'] and not options['delta']:
+            raise CommandError('--delta-field needs --delta SOURCE')
+        self.options = options
+        self.job_fields = {
+            'chunk_size': options['chunk_size'],
+            'dedup_mode': options['dedup'] or getattr(settings, 'EXCEL_IMPORT_DEDUP', ImportJob.DEDUP_UPDATE),
+            'staged': options['staged'] if options['staged'] is not None else getattr(settings, 'EXCEL_IMPORT_STAGED', False),
+        }
+        self.outcomes = []
+        self.start_time = time.time()
+
+        if options['watch']:
+            self.watch()
+        else:
+            paths = [Path(path) for path in options['paths']]
+            missing = [str(path) for path in paths if not path.is_file()]
+            if missing:
+                raise CommandError(f"No such file: {', '.join(missing)}")
+            if options['dry_run']:
+                return self.dry_run(paths)
+            self.run(paths)
+
+        self.write_summary()
+        failed = [outcome for outcome in self.outcomes if outcome['status'] == ImportJob.STATUS_FAILED]
+        if failed:
+            raise CommandError(f"{len(failed)} file(s) failed to import")
+
+    def run(self, paths):
+        job_fields = dict(self.job_fields)
+        if self.options['delta']:
+            # Read for every run, so a watched inbox loads above the watermark its last file left
+            try:
+                job_fields['delta'] = start_delta(self.options['delta'], self.options['delta_field'])
+            except ValueError as e:
+                raise CommandError(str(e))
+        return self.record(import_files(
+            paths, self.options['all_sheets'], self.options['workers'], self.options['parallel'], **job_fields,
+        ))
+
+    def record(self, outcomes):
+        for outcome in outcomes:
+            self.write_outcome(outcome)
+        self.outcomes.extend(outcomes)
+        return outcomes
+
+    def watch(self):
+        inbox = Inbox(self.options['watch'], self.options['done_dir'], self.options['failed_dir'])
+        self.stdout.write(f"Watching {inbox.path} every {self.options['interval']:g}s")
+        try:
+            leftovers = inbox.leftovers()
+            if leftovers:
+                self.stdout.write(f"Picking up {len(leftovers)} file(s) left in {inbox.processing}")
+                outcomes, new = resume_files(leftovers, self.options['workers'], self.options['parallel'])
+                inbox.settle(self.record(outcomes))
+                if new:
+                    inbox.settle(self.run(new))
+            while True:
+                claimed = inbox.claim(inbox.ready(self.options['settle']))
+                if claimed:
+                    self.stdout.write(f"Importing {len(claimed)} new file(s)")
+                    inbox.settle(self.run(claimed))
+                if self.options['once']:
+                    break
+                time.sleep(self.options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write('Stopped watching')
+
+    def dry_run(self, paths):
+        reports = validate_files(paths, self.options['chunk_size'])
+        for report in reports:
+            # Every value the import would replace, blank number cells included
+            problems = {column: entry['count'] for column, entry in report['invalid_report'].items()}
+            line = f"{report['file_name']}: {report['rows']} rows, validated in {report['seconds']:.2f}s"
+            if report['missing_columns']:
+                line += f", missing columns {', '.join(report['missing_columns'])}"
+            if problems:
+                line += f", values replaced {problems}"
+            failures = {column: entry['count'] for column, entry in report['load_failures'].items()}
+            if failures:
+                line += f", values too large to store {failures}"
+            self.stdout.write(self.style.SUCCESS(line) if report['ok'] else self.style.ERROR(line))
+        failed = [report['file_name'] for report in reports if not report['ok']]
+        if failed:
+            raise CommandError(f"{len(failed)} file(s) would not import cleanly; see manage.py validate_file for details")
+
+    def write_outcome(self, outcome):
+        rate = outcome['rows'] / outcome['seconds'] if outcome['seconds'] else 0
+        line = f"{outcome['path'].name}: {outcome['status']}, {outcome['rows']} rows in {outcome['seconds']:.1f}s ({rate:.0f} rows/sec)"
+        if outcome['skipped']:
+            line += f", {outcome['skipped']} at or below the watermark skipped"
+        if outcome['job']:
+            line += f", job {outcome['job']}"
+        if outcome['status'] == ImportJob.STATUS_FAILED:
+            self.stdout.write(self.style.ERROR(f"{line}: {outcome['error']}"))
+        else:
+            self.stdout.write(line)
+
+    def write_summary(self):
+        elapsed = time.time() - self.start_time
+        rows = sum(outcome['rows'] for outcome in self.outcomes)
+        counts = {
+            status: sum(1 for outcome in self.outcomes if outcome['status'] == status)
+            for status in (ImportJob.STATUS_DONE, ImportJob.STATUS_SKIPPED, ImportJob.STATUS_FAILED)
+        }
+        self.stdout.write(
+            f"Imported {rows} rows from {len(self.outcomes)} file(s) in {elapsed:.1f}s "
+            f"({rows / elapsed if elapsed else 0:.0f} rows/sec): "
+            + ', '.join(f"{count} {status}" for status, count in counts.items())
+        )
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+from excel_user.models import ArchivedDaily, SalesFact
+from excel_user.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute the daily and monthly sales rollups for a voucher date range from the sales lines '
+        'and the totals of lines moved out by archive_partitions'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='date_from', help='First voucher date (YYYY-MM-DD), default the earliest')
+        parser.add_argument('--to', dest='date_to', help='Last voucher date (YYYY-MM-DD), default the latest')
+
+    def handle(self, *args, **options):
+        days = SalesFact.objects.filter(voucher_date__isnull=False)
+        archived = ArchivedDaily.objects.all()
+        for option, lookup in (('date_from', 'gte'), ('date_to', 'lte')):
+            if options[option]:
+                value = parse_date(options[option])
+                if value is None:
+                    raise CommandError(f"Invalid date: {options[option]}")
+                days = days.filter(**{f'voucher_date__{lookup}': value})
+                archived = archived.filter(**{f'day__{lookup}': value})
+        days = {day.isoformat() for day in days.values_list('voucher_date', flat=True).distinct()}
+        days = sorted(days | {day.isoformat() for day in archived.values_list('day', flat=True).distinct()})
+        rebuild_rollups(days)
+        self.stdout.write(f"Rebuilt rollups for {len(days)} day(s)")
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from datetime import timedelta
+from excel_user.jobs import resume_stale_jobs, runner
+
+
+class Command(BaseCommand):
+    help = 'Re-dispatch import jobs whose worker died, resuming from the last committed chunk'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stale-minutes', type=int, default=5,
+                            help='Minutes without progress before a job is considered abandoned')
+
+    def handle(self, *args, **options):
+        # In-process threads would die with this command, so run them inline instead
+        mode = 'sync' if runner() == 'thread' else None
+        jobs = resume_stale_jobs(timedelta(minutes=options['stale_minutes']), mode)
+        self.stdout.write(f"Resumed {len(jobs)} import job(s)")
@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand, CommandError
+from excel_user.ingest import CHUNK_SIZE
+from excel_user.validation import validate_file
+import json
+
+
+class Command(BaseCommand):
+    help = (
+        'Dry run: read sales files as an import would and report blank, invalid and oversized values, '
+        'value ranges and distinct counts per column, without writing to the database'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', help='CSV, xlsx or xls files')
+        parser.add_argument('--sheet', help='Workbook sheet to read, default the first')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='Rows read per chunk')
+        parser.add_argument('--json', action='store_true', help='Print the full reports as JSON')
+
+    def handle(self, *args, **options):
+        reports = [validate_file(path, options['chunk_size'], options['sheet']) for path in options['paths']]
+        if options['json']:
+            self.stdout.write(json.dumps(reports, indent=2))
+        else:
+            for report in reports:
+                self.write_report(report)
+        failed = [report['file_name'] for report in reports if not report['ok']]
+        if failed:
+            raise CommandError(f"{len(failed)} file(s) would not import cleanly: {', '.join(failed)}")
+
+    def write_report(self, report):
+        estimate = report['estimated_import_seconds']
+        self.stdout.write(
+            f"{report['file_name']}: {report['rows']} rows read in {report['seconds']:.2f}s, "
+            f"import estimated at {f'{estimate:.0f}s' if estimate is not None else 'unknown (no finished imports yet)'}"
+        )
+        if report['missing_columns']:
+            self.stdout.write(self.style.ERROR(f"  Missing columns: {', '.join(report['missing_columns'])}"))
+        if report['unknown_columns']:
+            self.stdout.write(f"  Ignored columns: {', '.join(report['unknown_columns'])}")
+        self.stdout.write(f"  {'column':<24} {'kind':<8} {'nulls':>8} {'invalid':>8} {'overflow':>8} {'distinct':>9}  range")
+        for column, entry in report['columns'].items():
+            distinct = f"{entry['distinct']}{'+' if entry['distinct_truncated'] else ''}"
+            value_range = f"{entry['min']} .. {entry['max']}" if entry['min'] is not None else ''
+            line = (
+                f"  {column:<24} {entry['kind']:<8} {entry['nulls']:>8} {entry['invalid']:>8} "
+                f"{entry['overflow']:>8} {distinct:>9}  {value_range}"
+            )
+            flagged = column in report['invalid_report'] or column in report['load_failures']
+            self.stdout.write(self.style.WARNING(line) if flagged else line)
+        for column, entry in report['invalid_report'].items():
+            self.stdout.write(f"  {column}: {entry['count']} value(s) would be replaced, e.g. {self.samples(entry)}")
+        for column, entry in report['load_failures'].items():
+            self.stdout.write(self.style.ERROR(f"  {column}: {entry['count']} value(s) too large to store, e.g. {self.samples(entry)}"))
+        self.stdout.write(self.style.SUCCESS('  OK') if report['ok'] else self.style.ERROR('  Would not import cleanly'))
+
+    def samples(self, entry):
+        return ', '.join(f"row {row}: {'blank' if value is None else repr(value[:40])}" for row, value in entry['samples'][:3])
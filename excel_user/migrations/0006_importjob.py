@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-17 05:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('excel_user', '0005_alter_exceldata_free_qty'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file_name', models.CharField(max_length=255)),
+                ('file_path', models.CharField(max_length=500)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='queued', max_length=20)),
+                ('chunk_size', models.IntegerField(default=50000)),
+                ('chunks_done', models.IntegerField(default=0)),
+                ('rows_done', models.IntegerField(default=0)),
+                ('total_rows', models.IntegerField(blank=True, null=True)),
+                ('elapsed_seconds', models.FloatField(default=0.0)),
+                ('message', models.TextField(blank=True, null=True)),
+                ('error', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RemoveField(
+            model_name='exceldata',
+            name='grouping_item',
+        ),
+    ]
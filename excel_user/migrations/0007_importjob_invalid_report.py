@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 05:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('excel_user', '0006_importjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='invalid_report',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:06
+
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def delete_duplicate_lines(apps, schema_editor):
+    # Earlier re-uploads inserted the same voucher lines again; keep the first copy
+    ExcelData = apps.get_model('excel_user', 'ExcelData')
+    key = ['sales_id', 'voucher_no', 'item_code', 'voucher_date']
+    keyed = ExcelData.objects.using(schema_editor.connection.alias).filter(**{f'{field}__isnull': False for field in key})
+    first_ids = keyed.values(*key).annotate(first_id=Min('id')).values('first_id')
+    keyed.exclude(id__in=first_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('excel_user', '0007_importjob_invalid_report'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='dedup_mode',
+            field=models.CharField(choices=[('update', 'Update existing rows'), ('skip', 'Skip existing rows'), ('insert', 'Insert only, fail on existing rows')], default='update', max_length=10),
+        ),
+        migrations.RunPython(delete_duplicate_lines, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='exceldata',
+            constraint=models.UniqueConstraint(condition=models.Q(('item_code__isnull', False), ('sales_id__isnull', False), ('voucher_date__isnull', False), ('voucher_no__isnull', False)), fields=('sales_id', 'voucher_no', 'item_code', 'voucher_date'), name='exceldata_natural_key'),
+        ),
+    ]
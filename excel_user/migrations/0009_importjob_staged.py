@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('excel_user', '0008_exceldata_natural_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='staged',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('excel_user', '0009_importjob_staged'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='exceldata',
+            index=models.Index(fields=['voucher_date', 'id'], name='exceldata_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='exceldata',
+            index=models.Index(fields=['branch_name', 'id'], name='exceldata_branch_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='exceldata',
+            index=models.Index(fields=['zone', 'id'], name='exceldata_zone_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='exceldata',
+            index=models.Index(fields=['salesman', 'id'], name='exceldata_salesman_id_idx'),
+        ),
+    ]
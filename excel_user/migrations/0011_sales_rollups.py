@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('excel_user', '0010_exceldata_browse_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='rollup_days',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='SalesDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('branch_name', models.CharField(blank=True, default='', max_length=200)),
+                ('zone', models.CharField(blank=True, default='', max_length=200)),
+                ('division', models.CharField(blank=True, default='', max_length=200)),
+                ('district_dashboard', models.CharField(blank=True, default='', max_length=200)),
+                ('row_count', models.IntegerField(default=0)),
+                ('taxable', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('cgst', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('sgst', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('igst', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('voucher_amt', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('qty', models.BigIntegerField(default=0)),
+                ('free_qty', models.BigIntegerField(default=0)),
+                ('day', models.DateField()),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('day', 'branch_name', 'zone', 'division', 'district_dashboard'), name='salesdaily_grain')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SalesMonthly',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('branch_name', models.CharField(blank=True, default='', max_length=200)),
+                ('zone', models.CharField(blank=True, default='', max_length=200)),
+                ('division', models.CharField(blank=True, default='', max_length=200)),
+                ('district_dashboard', models.CharField(blank=True, default='', max_length=200)),
+                ('row_count', models.IntegerField(default=0)),
+                ('taxable', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('cgst', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('sgst', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('igst', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('voucher_amt', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('qty', models.BigIntegerField(default=0)),
+                ('free_qty', models.BigIntegerField(default=0)),
+                ('month', models.DateField()),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('month', 'branch_name', 'zone', 'division', 'district_dashboard'), name='salesmonthly_grain')],
+            },
+        ),
+    ]
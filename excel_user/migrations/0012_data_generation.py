@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:15
+
+from django.db import migrations, models
+
+
+def create_generation(apps, schema_editor):
+    DataGeneration = apps.get_model('excel_user', 'DataGeneration')
+    DataGeneration.objects.using(schema_editor.connection.alias).get_or_create(name='exceldata')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('excel_user', '0011_sales_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DataGeneration',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(create_generation, migrations.RunPython.noop),
+    ]
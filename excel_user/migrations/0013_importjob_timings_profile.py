@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('excel_user', '0012_data_generation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='profile',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='profile_path',
+            field=models.CharField(blank=True, max_length=500, null=True),
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='timings',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('excel_user', '0013_importjob_timings_profile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='batch',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='parts', to='excel_user.importjob'),
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='is_batch',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='sheet_name',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AlterField(
+            model_name='importjob',
+            name='status',
+            field=models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed'), ('skipped', 'Skipped')], default='queued', max_length=20),
+        ),
+    ]
@@ -0,0 +1,228 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('excel_user', '0014_importjob_batch'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='exceldata',
+            name='bill_type',
+            field=models.CharField(blank=True, max_length=200, null=True, verbose_name='Bill Type'),
+        ),
+        migrations.AlterField(
+            model_name='exceldata',
+            name='branch_name',
+            field=models.CharField(blank=True, max_length=200, null=True, verbose_name='Branch_name'),
+        ),
+        migrations.AlterField(
+            model_name='exceldata',
+            name='category_name',
+            field=models.CharField(blank=True, max_length=200, null=True, verbose_name='CategoryName'),
+        ),
+        migrations.AlterField(
+            model_name='exceldata',
+            name='cgst',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='CGST'),
+        ),
+        migrations.AlterField(
+            model_name='exceldata',
+            name='created_date',
+            field=models.DateField(blank=True, null=True, verbose_name='CreatedDate'),
+        ),
+        migrations.AlterField(
+            model_name='exceldata',
+            name='customer_name',
+            field=models.CharField(blank=True, max_length=200, null=True, verbose_name='Customer name'),
+        ),
+        migrations.AlterField(
+            model_name='exceldata',
+            name='difference',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Differance'),
+        ),
+        migrations.AlterField(
+            model_name='exceldata',
+            name='disc_amount',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='DiscAmount'),
+        ),
+        migrations.AlterField(
+            model_name='exceldata',
+            name='discount',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Discount'),
+        ),
+        migrations.AlterField(
+            model_name='exceldata',
+            name='district_dashboard',
+            field=models.CharField(blank=True, max_length=200, null=True, verbose_name='District for Dashboard'),
+        ),
+        migrations.AlterField(
+            model_name='exceldata',
+            name='district_milk',
+            field=models.CharField(blank=True, max_length=200, null=True, verbose_name='District for milk'),
+        ),
+        migrations.AlterField(
+            model_name='exceldata',
+            name='division',
+            field=models.CharField(blank=True, max_length=200, null=True, verbose_name='Division'),
+        ),
+        migrations.AlterField(
+            model_name='exceldata',
+            name='free_amount',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='FreeAmount'),
+        ),
+        migrations.AlterField(
+            model_name='exceldata',
+            name='free_qty',
+            field=models.IntegerField(blank=True, null=True, verbose_name='Freeqty'),
+        ),
+        migrations.AlterField(
+            model_name='exceldata',
+            name='group_name',
+            field=models.CharField(blank=True, max_length=200, null=True, verbose_name='GroupName'),
+        ),
+        migrations.AlterField(
+            model_name='exceldata',
+            name='helper_1',
+            field=models.CharField(blank=True, max_length=200, null=True, verbose_name='Helper 1'),
+        ),
+        migrations.AlterField(
+            model_name='exceldata',
+            name='igst',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='IGST'),
+        ),
+        migrations.AlterField(
+            model_name='exceldata',
+            name='item_code',
+            field=models.CharField(blank=True, max_length=200, null=True, verbose_name='ItemCOde'),
+        ),
+        migrations.AlterField(
+            model_name='exceldata',
+            name='kl_mt_outlets',
+            field=models.CharField(blank=True, max_length=200, null=True, verbose_name='KL MT OUTLETS'),
+        ),
+        migrations.AlterField(
+            model_name='exceldata',
+            name='new_category',
+            field=models.CharField(blank=True, max_length=200, null=True, verbose_name='Category'),
+        ),
+        migrations.AlterField(
+            model_name='exceldata',
+            name='new_sku',
+            field=models.CharField(blank=True, max_length=200, null=True, verbose_name='NEW SKU'),
+        ),
+        migrations.AlterField(
+            model_name='exceldata',
+            name='party_name',
+            field=models.CharField(blank=True, max_length=200, null=True, verbose_name='PartyName'),
+        ),
+        migrations.AlterField(
+            model_name='exceldata',
+            name='payment_type',
+            field=models.CharField(blank=True, max_length=200, null=True, verbose_name='PaymentType'),
+        ),
+        migrations.AlterField(
+            model_name='exceldata',
+            name='qty',
+            field=models.IntegerField(blank=True, null=True, verbose_name='qty'),
+        ),
+        migrations.AlterField(
+            model_name='exceldata',
+            name='rate',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Rate'),
+        ),
+        migrations.AlterField(
+            model_name='exceldata',
+            name='realisable_amount',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Realisable amount'),
+        ),
+        migrations.AlterField(
+            model_name='exceldata',
+            name='receive_amt',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='RecieveAMT'),
+        ),
+        migrations.AlterField(
+            model_name='exceldata',
+            name='rmode',
+            field=models.CharField(blank=True, max_length=200, null=True, verbose_name='RMODE'),
+        ),
+        migrations.AlterField(
+            model_name='exceldata',
+            name='route',
+            field=models.CharField(blank=True, max_length=200, null=True, verbose_name='Route'),
+        ),
+        migrations.AlterField(
+            model_name='exceldata',
+            name='sales_id',
+            field=models.IntegerField(blank=True, null=True, verbose_name='ID'),
+        ),
+        migrations.AlterField(
+            model_name='exceldata',
+            name='salesman',
+            field=models.CharField(blank=True, max_length=200, null=True, verbose_name='Salesman'),
+        ),
+        migrations.AlterField(
+            model_name='exceldata',
+            name='sgst',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='SGST'),
+        ),
+        migrations.AlterField(
+            model_name='exceldata',
+            name='state_name',
+            field=models.CharField(blank=True, max_length=200, null=True, verbose_name='state_name'),
+        ),
+        migrations.AlterField(
+            model_name='exceldata',
+            name='tax_perc',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True, verbose_name='TaxPerc'),
+        ),
+        migrations.AlterField(
+            model_name='exceldata',
+            name='taxable',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Taxable'),
+        ),
+        migrations.AlterField(
+            model_name='exceldata',
+            name='tn_mt_outlets',
+            field=models.CharField(blank=True, max_length=200, null=True, verbose_name='TN MT OUTLETS'),
+        ),
+        migrations.AlterField(
+            model_name='exceldata',
+            name='total_amt',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='TotalAmt'),
+        ),
+        migrations.AlterField(
+            model_name='exceldata',
+            name='voucher_amt',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='VoucherAMT'),
+        ),
+        migrations.AlterField(
+            model_name='exceldata',
+            name='voucher_date',
+            field=models.DateField(blank=True, null=True, verbose_name='VoucherDate'),
+        ),
+        migrations.AlterField(
+            model_name='exceldata',
+            name='voucher_no',
+            field=models.CharField(blank=True, max_length=200, null=True, verbose_name='VoucherNo'),
+        ),
+        migrations.AlterField(
+            model_name='exceldata',
+            name='voucher_type',
+            field=models.CharField(blank=True, max_length=200, null=True, verbose_name='Voucher Type'),
+        ),
+        migrations.AlterField(
+            model_name='exceldata',
+            name='zone',
+            field=models.CharField(blank=True, max_length=200, null=True, verbose_name='Zone'),
+        ),
+        migrations.AlterField(
+            model_name='exceldata',
+            name='zone_mt',
+            field=models.CharField(blank=True, max_length=200, null=True, verbose_name='ZONE FOR MT'),
+        ),
+    ]
@@ -0,0 +1,155 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:51
+
+from django.db import migrations, models
+from django.utils import timezone
+
+# RANGE RIGHT puts each boundary date in the partition it starts; rows without a
+# voucher date sort first and stay in partition 1.
+PARTITION_FUNCTION = 'pf_exceldata_month'
+PARTITION_SCHEME = 'ps_exceldata_month'
+CLUSTERED_INDEX = 'exceldata_month_cidx'
+MONTHS_AHEAD = 3
+
+
+def _primary_key_name(cursor, table):
+    cursor.execute("SELECT name FROM sys.key_constraints WHERE parent_object_id = OBJECT_ID(%s) AND type = 'PK'", [table])
+    return cursor.fetchone()[0]
+
+
+def _add_months(month, months):
+    index = month.year * 12 + month.month - 1 + months
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def partition_exceldata(apps, schema_editor):
+    """Move ExcelData onto a monthly partition scheme (SQL Server only).
+
+    The primary key becomes nonclustered and a clustered (voucher_date, id) index is
+    built on the scheme, so a voucher_date range scans only its months' partitions.
+    The other indexes stay unpartitioned: archiving copies and deletes a month rather
+    than switching its partition out, so nothing needs them aligned.
+    """
+    connection = schema_editor.connection
+    if connection.vendor != 'microsoft':
+        return
+    quote = connection.ops.quote_name
+    ExcelData = apps.get_model('excel_user', 'ExcelData')
+    table = ExcelData._meta.db_table
+    date_column = quote(ExcelData._meta.get_field('voucher_date').column)
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT MIN({date_column}) FROM {quote(table)}")
+        first = cursor.fetchone()[0]
+        last = _add_months(timezone.localdate().replace(day=1), MONTHS_AHEAD)
+        boundaries = [first.replace(day=1) if first else last]
+        while boundaries[-1] < last:
+            boundaries.append(_add_months(boundaries[-1], 1))
+        values = ', '.join(f"'{month.isoformat()}'" for month in boundaries)
+        cursor.execute(f"CREATE PARTITION FUNCTION {PARTITION_FUNCTION} (date) AS RANGE RIGHT FOR VALUES ({values})")
+        cursor.execute(f"CREATE PARTITION SCHEME {PARTITION_SCHEME} AS PARTITION {PARTITION_FUNCTION} ALL TO ([PRIMARY])")
+        primary_key = _primary_key_name(cursor, table)
+        cursor.execute(f"ALTER TABLE {quote(table)} DROP CONSTRAINT {quote(primary_key)}")
+        cursor.execute(f"ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(primary_key)} PRIMARY KEY NONCLUSTERED ({quote('id')})")
+        cursor.execute(
+            f"CREATE CLUSTERED INDEX {CLUSTERED_INDEX} ON {quote(table)} ({date_column}, {quote('id')}) "
+            f"ON {PARTITION_SCHEME}({date_column})"
+        )
+
+
+def unpartition_exceldata(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'microsoft':
+        return
+    quote = connection.ops.quote_name
+    table = apps.get_model('excel_user', 'ExcelData')._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP INDEX {CLUSTERED_INDEX} ON {quote(table)}")
+        primary_key = _primary_key_name(cursor, table)
+        cursor.execute(f"ALTER TABLE {quote(table)} DROP CONSTRAINT {quote(primary_key)}")
+        cursor.execute(f"ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(primary_key)} PRIMARY KEY CLUSTERED ({quote('id')})")
+        cursor.execute(f"DROP PARTITION SCHEME {PARTITION_SCHEME}")
+        cursor.execute(f"DROP PARTITION FUNCTION {PARTITION_FUNCTION}")
+
+
+def compress_archive(apps, schema_editor):
+    """Page-compress the archive table (SQL Server only)"""
+    connection = schema_editor.connection
+    if connection.vendor != 'microsoft':
+        return
+    table = apps.get_model('excel_user', 'ExcelDataArchive')._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(f"ALTER TABLE {connection.ops.quote_name(table)} REBUILD WITH (DATA_COMPRESSION = PAGE)")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('excel_user', '0015_exceldata_header_verbose_names'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExcelDataArchive',
+            fields=[
+                ('voucher_type', models.CharField(blank=True, max_length=200, null=True, verbose_name='Voucher Type')),
+                ('sales_id', models.IntegerField(blank=True, null=True, verbose_name='ID')),
+                ('state_name', models.CharField(blank=True, max_length=200, null=True, verbose_name='state_name')),
+                ('zone', models.CharField(blank=True, max_length=200, null=True, verbose_name='Zone')),
+                ('branch_name', models.CharField(blank=True, max_length=200, null=True, verbose_name='Branch_name')),
+                ('route', models.CharField(blank=True, max_length=200, null=True, verbose_name='Route')),
+                ('party_name', models.CharField(blank=True, max_length=200, null=True, verbose_name='PartyName')),
+                ('category_name', models.CharField(blank=True, max_length=200, null=True, verbose_name='CategoryName')),
+                ('payment_type', models.CharField(blank=True, max_length=200, null=True, verbose_name='PaymentType')),
+                ('created_date', models.DateField(blank=True, null=True, verbose_name='CreatedDate')),
+                ('voucher_date', models.DateField(blank=True, null=True, verbose_name='VoucherDate')),
+                ('voucher_no', models.CharField(blank=True, max_length=200, null=True, verbose_name='VoucherNo')),
+                ('bill_type', models.CharField(blank=True, max_length=200, null=True, verbose_name='Bill Type')),
+                ('salesman', models.CharField(blank=True, max_length=200, null=True, verbose_name='Salesman')),
+                ('taxable', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Taxable')),
+                ('cgst', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='CGST')),
+                ('sgst', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='SGST')),
+                ('igst', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='IGST')),
+                ('voucher_amt', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='VoucherAMT')),
+                ('discount', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Discount')),
+                ('realisable_amount', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Realisable amount')),
+                ('receive_amt', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='RecieveAMT')),
+                ('difference', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Differance')),
+                ('rmode', models.CharField(blank=True, max_length=200, null=True, verbose_name='RMODE')),
+                ('group_name', models.CharField(blank=True, max_length=200, null=True, verbose_name='GroupName')),
+                ('item_code', models.CharField(blank=True, max_length=200, null=True, verbose_name='ItemCOde')),
+                ('tax_perc', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True, verbose_name='TaxPerc')),
+                ('qty', models.IntegerField(blank=True, null=True, verbose_name='qty')),
+                ('free_qty', models.IntegerField(blank=True, null=True, verbose_name='Freeqty')),
+                ('total_amt', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='TotalAmt')),
+                ('free_amount', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='FreeAmount')),
+                ('rate', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Rate')),
+                ('disc_amount', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='DiscAmount')),
+                ('helper_1', models.CharField(blank=True, max_length=200, null=True, verbose_name='Helper 1')),
+                ('kl_mt_outlets', models.CharField(blank=True, max_length=200, null=True, verbose_name='KL MT OUTLETS')),
+                ('tn_mt_outlets', models.CharField(blank=True, max_length=200, null=True, verbose_name='TN MT OUTLETS')),
+                ('new_category', models.CharField(blank=True, max_length=200, null=True, verbose_name='Category')),
+                ('new_sku', models.CharField(blank=True, max_length=200, null=True, verbose_name='NEW SKU')),
+                ('division', models.CharField(blank=True, max_length=200, null=True, verbose_name='Division')),
+                ('customer_name', models.CharField(blank=True, max_length=200, null=True, verbose_name='Customer name')),
+                ('district_milk', models.CharField(blank=True, max_length=200, null=True, verbose_name='District for milk')),
+                ('district_dashboard', models.CharField(blank=True, max_length=200, null=True, verbose_name='District for Dashboard')),
+                ('zone_mt', models.CharField(blank=True, max_length=200, null=True, verbose_name='ZONE FOR MT')),
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['voucher_date'], name='exceldataarchive_date_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedMonth',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(unique=True)),
+                ('destination', models.CharField(max_length=10)),
+                ('rows', models.IntegerField(default=0)),
+                ('archived_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        # Both only change SQL Server tables; other backends keep ExcelData unpartitioned
+        migrations.RunPython(partition_exceldata, unpartition_exceldata),
+        migrations.RunPython(compress_archive, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,415 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:12
+
+import django.db.models.deletion
+from django.core.management.color import no_style
+from django.db import migrations, models
+from django.utils import timezone
+
+# SQL Server's default collations ignore case, and every collation ignores trailing spaces
+# in comparisons, so spellings differing only by those would share one key. There the
+# value column gets a binary collation and a persisted byte length joins the unique key,
+# so each exact string keeps its own key. SQLite and PostgreSQL already compare exactly.
+BINARY_COLLATION = 'Latin1_General_100_BIN2'
+VALUE_BYTES = 'value_bytes'
+VALUE_CONSTRAINT = 'dimensionvalue_field_value'
+
+# The monthly partition objects of migration 0016
+PARTITION_FUNCTION = 'pf_exceldata_month'
+PARTITION_SCHEME = 'ps_exceldata_month'
+CLUSTERED_INDEX = 'exceldata_month_cidx'
+
+
+def dimension_fields(model):
+    return [
+        field.name for field in model._meta.concrete_fields
+        if field.is_relation and field.related_model._meta.model_name == 'dimensionvalue'
+    ]
+
+
+def exact_values(connection, dimension):
+    """Make DimensionValue keep every exact string apart on SQL Server; other backends already do"""
+    if connection.vendor != 'microsoft':
+        return
+    quote = connection.ops.quote_name
+    table = quote(dimension._meta.db_table)
+    field, value = quote('field'), quote('value')
+    max_length = dimension._meta.get_field('value').max_length
+    with connection.cursor() as cursor:
+        cursor.execute(f"ALTER TABLE {table} DROP CONSTRAINT {quote(VALUE_CONSTRAINT)}")
+        cursor.execute(f"ALTER TABLE {table} ALTER COLUMN {value} nvarchar({max_length}) COLLATE {BINARY_COLLATION} NOT NULL")
+        cursor.execute(f"ALTER TABLE {table} ADD {quote(VALUE_BYTES)} AS DATALENGTH({value}) PERSISTED")
+        cursor.execute(f"ALTER TABLE {table} ADD CONSTRAINT {quote(VALUE_CONSTRAINT)} UNIQUE ({field}, {value}, {quote(VALUE_BYTES)})")
+
+
+def inexact_values(connection, dimension):
+    """Undo exact_values; fails while the table holds spellings the default collation merges"""
+    if connection.vendor != 'microsoft':
+        return
+    quote = connection.ops.quote_name
+    table = quote(dimension._meta.db_table)
+    field, value = quote('field'), quote('value')
+    max_length = dimension._meta.get_field('value').max_length
+    with connection.cursor() as cursor:
+        cursor.execute(f"ALTER TABLE {table} DROP CONSTRAINT {quote(VALUE_CONSTRAINT)}")
+        cursor.execute(f"ALTER TABLE {table} DROP COLUMN {quote(VALUE_BYTES)}")
+        cursor.execute(f"ALTER TABLE {table} ALTER COLUMN {value} nvarchar({max_length}) COLLATE DATABASE_DEFAULT NOT NULL")
+        cursor.execute(f"ALTER TABLE {table} ADD CONSTRAINT {quote(VALUE_CONSTRAINT)} UNIQUE ({field}, {value})")
+
+
+def _same_value(connection, alias, column):
+    """Join condition matching a dimension value to a text column exactly, as exact_values keys them"""
+    quote = connection.ops.quote_name
+    if connection.vendor != 'microsoft':
+        return f"{alias}.{quote('value')} = {column}"
+    return f"{alias}.{quote('value')} = {column} COLLATE {BINARY_COLLATION} AND {alias}.{quote(VALUE_BYTES)} = DATALENGTH({column})"
+
+
+def _text_columns(fact):
+    # A dimension field's text column is named like the field, e.g. zone for zone_id
+    dimensions = dimension_fields(fact)
+    return [(field, field.name if field.name in dimensions else field.column) for field in fact._meta.concrete_fields]
+
+
+def text_select(connection, fact, dimension):
+    """SELECT of the fact rows with every key joined back to its text, under the text column names.
+
+    Each join also matches the field, so a filter on a text value can seek the
+    (field, value) unique index and then the fact's key index.
+    """
+    quote = connection.ops.quote_name
+    dimensions = dimension_fields(fact)
+    columns, joins = [], []
+    for field, name in _text_columns(fact):
+        if field.name in dimensions:
+            alias = quote(f"d_{field.name}")
+            columns.append(f"{alias}.{quote('value')} AS {quote(name)}")
+            joins.append(
+                f"LEFT JOIN {quote(dimension._meta.db_table)} {alias} "
+                f"ON {alias}.{quote('field')} = '{field.name}' AND {alias}.{quote('id')} = f.{quote(field.column)}"
+            )
+        else:
+            columns.append(f"f.{quote(name)}")
+    return f"SELECT {', '.join(columns)} FROM {quote(fact._meta.db_table)} f {' '.join(joins)}"
+
+
+def _copy_rows(connection, target, columns, select):
+    """INSERT ... SELECT into a table under explicit ids, resetting its id sequence afterwards"""
+    quote = connection.ops.quote_name
+    table = quote(target._meta.db_table)
+    with connection.cursor() as cursor:
+        if connection.vendor == 'microsoft':
+            cursor.execute(f"SET IDENTITY_INSERT {table} ON")
+        cursor.execute(f"INSERT INTO {table} ({', '.join(quote(column) for column in columns)}) {select}")
+        if connection.vendor == 'microsoft':
+            cursor.execute(f"SET IDENTITY_INSERT {table} OFF")
+        for statement in connection.ops.sequence_reset_sql(no_style(), [target]):
+            cursor.execute(statement)
+
+
+def intern_table(connection, source, fact, dimension):
+    """Intern every text value of a table of sales lines and copy its rows into the fact table"""
+    quote = connection.ops.quote_name
+    dimensions = dimension_fields(fact)
+    table = quote(source._meta.db_table)
+    values = quote(dimension._meta.db_table)
+    with connection.cursor() as cursor:
+        for name in dimensions:
+            column = quote(source._meta.get_field(name).column)
+            if connection.vendor == 'microsoft':
+                # DISTINCT under the source's collation would keep one spelling of each value
+                distinct = f"SELECT DISTINCT {column} COLLATE {BINARY_COLLATION} AS v, DATALENGTH({column}) AS n FROM {table}"
+            else:
+                distinct = f"SELECT DISTINCT {column} AS v FROM {table}"
+            cursor.execute(
+                f"INSERT INTO {values} ({quote('field')}, {quote('value')}) "
+                f"SELECT '{name}', d.v FROM ({distinct} WHERE {column} IS NOT NULL) d"
+            )
+    columns, joins = [], []
+    for field in fact._meta.concrete_fields:
+        column = quote(source._meta.get_field(field.name).column)
+        if field.name in dimensions:
+            alias = quote(f"d_{field.name}")
+            columns.append(f"{alias}.{quote('id')}")
+            joins.append(
+                f"LEFT JOIN {values} {alias} ON {alias}.{quote('field')} = '{field.name}' AND {_same_value(connection, alias, f's.{column}')}"
+            )
+        else:
+            columns.append(f"s.{column}")
+    _copy_rows(
+        connection, fact, [field.column for field in fact._meta.concrete_fields],
+        f"SELECT {', '.join(columns)} FROM {table} s {' '.join(joins)}",
+    )
+
+
+def restore_table(connection, fact, dimension, target):
+    """Copy the fact rows back into a table of sales lines with their text values"""
+    _copy_rows(connection, target, [name for _, name in _text_columns(fact)], text_select(connection, fact, dimension))
+
+
+def create_view(connection, view, fact, dimension):
+    """Create the read-only text view of the fact table under the view model's table name"""
+    with connection.cursor() as cursor:
+        cursor.execute(f"CREATE VIEW {connection.ops.quote_name(view._meta.db_table)} AS {text_select(connection, fact, dimension)}")
+
+
+def drop_view(connection, view):
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP VIEW {connection.ops.quote_name(view._meta.db_table)}")
+
+
+def is_partitioned(connection):
+    if connection.vendor != 'microsoft':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM sys.partition_functions WHERE name = %s", [PARTITION_FUNCTION])
+        return cursor.fetchone() is not None
+
+
+def _primary_key_name(cursor, table):
+    cursor.execute("SELECT name FROM sys.key_constraints WHERE parent_object_id = OBJECT_ID(%s) AND type = 'PK'", [table])
+    return cursor.fetchone()[0]
+
+
+def _add_months(month, months):
+    index = month.year * 12 + month.month - 1 + months
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def partition_table(connection, model, months_ahead=3):
+    """Rebuild a table's clustered (voucher_date, id) index on a new monthly partition scheme, as 0016 does"""
+    quote = connection.ops.quote_name
+    table = model._meta.db_table
+    date_column = quote(model._meta.get_field('voucher_date').column)
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT MIN({date_column}) FROM {quote(table)}")
+        first = cursor.fetchone()[0]
+        last = _add_months(timezone.localdate().replace(day=1), months_ahead)
+        month = first.replace(day=1) if first else last
+        boundaries = [month]
+        while boundaries[-1] < last:
+            boundaries.append(_add_months(boundaries[-1], 1))
+        values = ', '.join(f"'{month.isoformat()}'" for month in boundaries)
+        cursor.execute(f"CREATE PARTITION FUNCTION {PARTITION_FUNCTION} (date) AS RANGE RIGHT FOR VALUES ({values})")
+        cursor.execute(f"CREATE PARTITION SCHEME {PARTITION_SCHEME} AS PARTITION {PARTITION_FUNCTION} ALL TO ([PRIMARY])")
+        primary_key = _primary_key_name(cursor, table)
+        cursor.execute(f"ALTER TABLE {quote(table)} DROP CONSTRAINT {quote(primary_key)}")
+        cursor.execute(f"ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(primary_key)} PRIMARY KEY NONCLUSTERED ({quote('id')})")
+        cursor.execute(
+            f"CREATE CLUSTERED INDEX {CLUSTERED_INDEX} ON {quote(table)} ({date_column}, {quote('id')}) "
+            f"ON {PARTITION_SCHEME}({date_column})"
+        )
+
+
+def unpartition_table(connection, model):
+    quote = connection.ops.quote_name
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP INDEX {CLUSTERED_INDEX} ON {quote(table)}")
+        primary_key = _primary_key_name(cursor, table)
+        cursor.execute(f"ALTER TABLE {quote(table)} DROP CONSTRAINT {quote(primary_key)}")
+        cursor.execute(f"ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(primary_key)} PRIMARY KEY CLUSTERED ({quote('id')})")
+    drop_partition_scheme(connection)
+
+
+def drop_partition_scheme(connection):
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP PARTITION SCHEME {PARTITION_SCHEME}")
+        cursor.execute(f"DROP PARTITION FUNCTION {PARTITION_FUNCTION}")
+
+
+def exact_dimension_values(apps, schema_editor):
+    exact_values(schema_editor.connection, apps.get_model('excel_user', 'DimensionValue'))
+
+
+def inexact_dimension_values(apps, schema_editor):
+    inexact_values(schema_editor.connection, apps.get_model('excel_user', 'DimensionValue'))
+
+
+def intern_exceldata(apps, schema_editor):
+    intern_table(
+        schema_editor.connection, apps.get_model('excel_user', 'ExcelData'),
+        apps.get_model('excel_user', 'SalesFact'), apps.get_model('excel_user', 'DimensionValue'),
+    )
+
+
+def restore_exceldata(apps, schema_editor):
+    connection = schema_editor.connection
+    ExcelData = apps.get_model('excel_user', 'ExcelData')
+    restore_table(connection, apps.get_model('excel_user', 'SalesFact'), apps.get_model('excel_user', 'DimensionValue'), ExcelData)
+    if connection.vendor == 'microsoft':
+        partition_table(connection, ExcelData)
+
+
+def partition_salesfact(apps, schema_editor):
+    # The scheme outlived the dropped ExcelData table; SalesFact is rebuilt on a fresh one
+    connection = schema_editor.connection
+    if is_partitioned(connection):
+        drop_partition_scheme(connection)
+        partition_table(connection, apps.get_model('excel_user', 'SalesFact'))
+
+
+def unpartition_salesfact(apps, schema_editor):
+    connection = schema_editor.connection
+    if is_partitioned(connection):
+        unpartition_table(connection, apps.get_model('excel_user', 'SalesFact'))
+
+
+def create_exceldata_view(apps, schema_editor):
+    create_view(
+        schema_editor.connection, apps.get_model('excel_user', 'ExcelData'),
+        apps.get_model('excel_user', 'SalesFact'), apps.get_model('excel_user', 'DimensionValue'),
+    )
+
+
+def drop_exceldata_view(apps, schema_editor):
+    drop_view(schema_editor.connection, apps.get_model('excel_user', 'ExcelData'))
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('excel_user', '0016_exceldata_partitions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DimensionValue',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('field', models.CharField(max_length=50)),
+                ('value', models.CharField(max_length=200)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('field', 'value'), name='dimensionvalue_field_value')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SalesFact',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sales_id', models.IntegerField(blank=True, null=True, verbose_name='ID')),
+                ('created_date', models.DateField(blank=True, null=True, verbose_name='CreatedDate')),
+                ('voucher_date', models.DateField(blank=True, null=True, verbose_name='VoucherDate')),
+                ('voucher_no', models.CharField(blank=True, max_length=200, null=True, verbose_name='VoucherNo')),
+                ('taxable', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Taxable')),
+                ('cgst', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='CGST')),
+                ('sgst', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='SGST')),
+                ('igst', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='IGST')),
+                ('voucher_amt', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='VoucherAMT')),
+                ('discount', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Discount')),
+                ('realisable_amount', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Realisable amount')),
+                ('receive_amt', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='RecieveAMT')),
+                ('difference', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Differance')),
+                ('tax_perc', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True, verbose_name='TaxPerc')),
+                ('qty', models.IntegerField(blank=True, null=True, verbose_name='qty')),
+                ('free_qty', models.IntegerField(blank=True, null=True, verbose_name='Freeqty')),
+                ('total_amt', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='TotalAmt')),
+                ('free_amount', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='FreeAmount')),
+                ('rate', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Rate')),
+                ('disc_amount', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='DiscAmount')),
+                ('bill_type', models.ForeignKey(blank=True, db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='excel_user.dimensionvalue', verbose_name='Bill Type')),
+                ('branch_name', models.ForeignKey(blank=True, db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='excel_user.dimensionvalue', verbose_name='Branch_name')),
+                ('category_name', models.ForeignKey(blank=True, db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='excel_user.dimensionvalue', verbose_name='CategoryName')),
+                ('customer_name', models.ForeignKey(blank=True, db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='excel_user.dimensionvalue', verbose_name='Customer name')),
+                ('district_dashboard', models.ForeignKey(blank=True, db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='excel_user.dimensionvalue', verbose_name='District for Dashboard')),
+                ('district_milk', models.ForeignKey(blank=True, db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='excel_user.dimensionvalue', verbose_name='District for milk')),
+                ('division', models.ForeignKey(blank=True, db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='excel_user.dimensionvalue', verbose_name='Division')),
+                ('group_name', models.ForeignKey(blank=True, db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='excel_user.dimensionvalue', verbose_name='GroupName')),
+                ('helper_1', models.ForeignKey(blank=True, db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='excel_user.dimensionvalue', verbose_name='Helper 1')),
+                ('item_code', models.ForeignKey(blank=True, db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='excel_user.dimensionvalue', verbose_name='ItemCOde')),
+                ('kl_mt_outlets', models.ForeignKey(blank=True, db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='excel_user.dimensionvalue', verbose_name='KL MT OUTLETS')),
+                ('new_category', models.ForeignKey(blank=True, db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='excel_user.dimensionvalue', verbose_name='Category')),
+                ('new_sku', models.ForeignKey(blank=True, db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='excel_user.dimensionvalue', verbose_name='NEW SKU')),
+                ('party_name', models.ForeignKey(blank=True, db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='excel_user.dimensionvalue', verbose_name='PartyName')),
+                ('payment_type', models.ForeignKey(blank=True, db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='excel_user.dimensionvalue', verbose_name='PaymentType')),
+                ('rmode', models.ForeignKey(blank=True, db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='excel_user.dimensionvalue', verbose_name='RMODE')),
+                ('route', models.ForeignKey(blank=True, db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='excel_user.dimensionvalue', verbose_name='Route')),
+                ('salesman', models.ForeignKey(blank=True, db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='excel_user.dimensionvalue', verbose_name='Salesman')),
+                ('state_name', models.ForeignKey(blank=True, db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='excel_user.dimensionvalue', verbose_name='state_name')),
+                ('tn_mt_outlets', models.ForeignKey(blank=True, db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='excel_user.dimensionvalue', verbose_name='TN MT OUTLETS')),
+                ('voucher_type', models.ForeignKey(blank=True, db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='excel_user.dimensionvalue', verbose_name='Voucher Type')),
+                ('zone', models.ForeignKey(blank=True, db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='excel_user.dimensionvalue', verbose_name='Zone')),
+                ('zone_mt', models.ForeignKey(blank=True, db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='excel_user.dimensionvalue', verbose_name='ZONE FOR MT')),
+            ],
+        ),
+        # SQL Server only: values differing by case or trailing spaces keep separate keys
+        migrations.RunPython(exact_dimension_values, inexact_dimension_values),
+        # Indexes are built after the copy rather than maintained row by row during it
+        migrations.RunPython(intern_exceldata, restore_exceldata),
+        migrations.AddConstraint(
+            model_name='salesfact',
+            constraint=models.UniqueConstraint(condition=models.Q(('item_code__isnull', False), ('sales_id__isnull', False), ('voucher_date__isnull', False), ('voucher_no__isnull', False)), fields=('sales_id', 'voucher_no', 'item_code', 'voucher_date'), name='salesfact_natural_key'),
+        ),
+        migrations.AddIndex(
+            model_name='salesfact',
+            index=models.Index(fields=['voucher_date', 'id'], name='salesfact_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='salesfact',
+            index=models.Index(fields=['branch_name', 'id'], name='salesfact_branch_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='salesfact',
+            index=models.Index(fields=['zone', 'id'], name='salesfact_zone_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='salesfact',
+            index=models.Index(fields=['salesman', 'id'], name='salesfact_salesman_id_idx'),
+        ),
+        migrations.DeleteModel(
+            name='ExcelData',
+        ),
+        migrations.RunPython(partition_salesfact, unpartition_salesfact),
+        migrations.CreateModel(
+            name='ExcelData',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('voucher_type', models.CharField(blank=True, max_length=200, null=True, verbose_name='Voucher Type')),
+                ('sales_id', models.IntegerField(blank=True, null=True, verbose_name='ID')),
+                ('state_name', models.CharField(blank=True, max_length=200, null=True, verbose_name='state_name')),
+                ('zone', models.CharField(blank=True, max_length=200, null=True, verbose_name='Zone')),
+                ('branch_name', models.CharField(blank=True, max_length=200, null=True, verbose_name='Branch_name')),
+                ('route', models.CharField(blank=True, max_length=200, null=True, verbose_name='Route')),
+                ('party_name', models.CharField(blank=True, max_length=200, null=True, verbose_name='PartyName')),
+                ('category_name', models.CharField(blank=True, max_length=200, null=True, verbose_name='CategoryName')),
+                ('payment_type', models.CharField(blank=True, max_length=200, null=True, verbose_name='PaymentType')),
+                ('created_date', models.DateField(blank=True, null=True, verbose_name='CreatedDate')),
+                ('voucher_date', models.DateField(blank=True, null=True, verbose_name='VoucherDate')),
+                ('voucher_no', models.CharField(blank=True, max_length=200, null=True, verbose_name='VoucherNo')),
+                ('bill_type', models.CharField(blank=True, max_length=200, null=True, verbose_name='Bill Type')),
+                ('salesman', models.CharField(blank=True, max_length=200, null=True, verbose_name='Salesman')),
+                ('taxable', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Taxable')),
+                ('cgst', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='CGST')),
+                ('sgst', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='SGST')),
+                ('igst', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='IGST')),
+                ('voucher_amt', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='VoucherAMT')),
+                ('discount', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Discount')),
+                ('realisable_amount', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Realisable amount')),
+                ('receive_amt', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='RecieveAMT')),
+                ('difference', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Differance')),
+                ('rmode', models.CharField(blank=True, max_length=200, null=True, verbose_name='RMODE')),
+                ('group_name', models.CharField(blank=True, max_length=200, null=True, verbose_name='GroupName')),
+                ('item_code', models.CharField(blank=True, max_length=200, null=True, verbose_name='ItemCOde')),
+                ('tax_perc', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True, verbose_name='TaxPerc')),
+                ('qty', models.IntegerField(blank=True, null=True, verbose_name='qty')),
+                ('free_qty', models.IntegerField(blank=True, null=True, verbose_name='Freeqty')),
+                ('total_amt', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='TotalAmt')),
+                ('free_amount', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='FreeAmount')),
+                ('rate', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Rate')),
+                ('disc_amount', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='DiscAmount')),
+                ('helper_1', models.CharField(blank=True, max_length=200, null=True, verbose_name='Helper 1')),
+                ('kl_mt_outlets', models.CharField(blank=True, max_length=200, null=True, verbose_name='KL MT OUTLETS')),
+                ('tn_mt_outlets', models.CharField(blank=True, max_length=200, null=True, verbose_name='TN MT OUTLETS')),
+                ('new_category', models.CharField(blank=True, max_length=200, null=True, verbose_name='Category')),
+                ('new_sku', models.CharField(blank=True, max_length=200, null=True, verbose_name='NEW SKU')),
+                ('division', models.CharField(blank=True, max_length=200, null=True, verbose_name='Division')),
+                ('customer_name', models.CharField(blank=True, max_length=200, null=True, verbose_name='Customer name')),
+                ('district_milk', models.CharField(blank=True, max_length=200, null=True, verbose_name='District for milk')),
+                ('district_dashboard', models.CharField(blank=True, max_length=200, null=True, verbose_name='District for Dashboard')),
+                ('zone_mt', models.CharField(blank=True, max_length=200, null=True, verbose_name='ZONE FOR MT')),
+            ],
+            options={
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(create_exceldata_view, drop_exceldata_view),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('excel_user', '0017_salesfact_dimensions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='delta',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='ImportWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=100, unique=True)),
+                ('field', models.CharField(choices=[('voucher_date', 'VoucherDate'), ('created_date', 'CreatedDate'), ('sales_id', 'ID')], max_length=20)),
+                ('value', models.CharField(max_length=50)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('job', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='excel_user.importjob')),
+            ],
+        ),
+    ]
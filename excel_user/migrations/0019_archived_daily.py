@@ -0,0 +1,75 @@
+# Generated by Django 5.2.18 on 2026-10-17 08:58
+
+from django.db import migrations, models
+from django.db.models import Count, Sum, Value
+from django.db.models.functions import Coalesce
+
+DIMENSIONS = ['branch_name', 'zone', 'division', 'district_dashboard']
+TOTALS = ['row_count', 'taxable', 'cgst', 'sgst', 'igst', 'voucher_amt', 'qty', 'free_qty']
+
+
+def keep_archived_totals(apps, schema_editor):
+    """Seed ArchivedDaily for months archived before it existed.
+
+    Their daily rollups still hold the archived lines' totals, plus those of any lines
+    imported into the month since, which are in SalesFact and are taken back out.
+    """
+    ArchivedMonth = apps.get_model('excel_user', 'ArchivedMonth')
+    ArchivedDaily = apps.get_model('excel_user', 'ArchivedDaily')
+    SalesDaily = apps.get_model('excel_user', 'SalesDaily')
+    SalesFact = apps.get_model('excel_user', 'SalesFact')
+    using = schema_editor.connection.alias
+    for month in ArchivedMonth.objects.using(using).values_list('month', flat=True):
+        end = month.replace(year=month.year + month.month // 12, month=month.month % 12 + 1)
+        totals = {
+            (rollup.day, *(getattr(rollup, field) for field in DIMENSIONS)): {field: getattr(rollup, field) for field in TOTALS}
+            for rollup in SalesDaily.objects.using(using).filter(day__gte=month, day__lt=end)
+        }
+        groups = (
+            SalesFact.objects.using(using).filter(voucher_date__gte=month, voucher_date__lt=end)
+            .values('voucher_date', **{f'rollup_{field}': Coalesce(f'{field}__value', Value('')) for field in DIMENSIONS})
+            .annotate(total_row_count=Count('id'), **{f'total_{field}': Sum(field, default=0) for field in TOTALS[1:]})
+            .order_by()
+        )
+        for group in groups:
+            key = (group['voucher_date'], *(group[f'rollup_{field}'] for field in DIMENSIONS))
+            if key in totals:
+                for field in TOTALS:
+                    totals[key][field] -= group[f'total_{field}']
+        ArchivedDaily.objects.using(using).bulk_create([
+            ArchivedDaily(day=key[0], **dict(zip(DIMENSIONS, key[1:])), **values)
+            for key, values in totals.items() if values['row_count'] > 0
+        ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('excel_user', '0018_import_watermark'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('branch_name', models.CharField(blank=True, default='', max_length=200)),
+                ('zone', models.CharField(blank=True, default='', max_length=200)),
+                ('division', models.CharField(blank=True, default='', max_length=200)),
+                ('district_dashboard', models.CharField(blank=True, default='', max_length=200)),
+                ('row_count', models.IntegerField(default=0)),
+                ('taxable', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('cgst', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('sgst', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('igst', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('voucher_amt', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('qty', models.BigIntegerField(default=0)),
+                ('free_qty', models.BigIntegerField(default=0)),
+                ('day', models.DateField()),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('day', 'branch_name', 'zone', 'division', 'district_dashboard'), name='archiveddaily_grain')],
+            },
+        ),
+        migrations.RunPython(keep_archived_totals, migrations.RunPython.noop),
+    ]
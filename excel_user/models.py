@@ -1,51 +1,333 @@
 from django.db import models
 
 # Create your models here.
-class ExcelData(models.Model):
-    voucher_type = models.CharField(max_length=200, null=True, blank=True)
-    sales_id = models.IntegerField(null=True, blank=True)
-    state_name = models.CharField(max_length=200, null=True, blank=True)
-    zone = models.CharField(max_length=200, null=True, blank=True)
-    branch_name = models.CharField(max_length=200, null=True, blank=True)
-    route = models.CharField(max_length=200, null=True, blank=True)
-    party_name = models.CharField(max_length=200, null=True, blank=True)
-    category_name = models.CharField(max_length=200, null=True, blank=True)
-    payment_type = models.CharField(max_length=200, null=True, blank=True)
-    created_date = models.DateField(null=True, blank=True)
-    voucher_date = models.DateField(null=True, blank=True)
-    voucher_no = models.CharField(max_length=200, null=True, blank=True)
-    bill_type = models.CharField(max_length=200, null=True, blank=True)
-    salesman = models.CharField(max_length=200, null=True, blank=True)
-    taxable = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
-    cgst = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
-    sgst = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
-    igst = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
-    voucher_amt = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
-    discount = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
-    realisable_amount = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
-    receive_amt = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
-    difference = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
-    rmode = models.CharField(max_length=200, null=True, blank=True)
-    group_name = models.CharField(max_length=200, null=True, blank=True)
-    item_code = models.CharField(max_length=200, null=True, blank=True)
-    tax_perc = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
-    qty = models.IntegerField(null=True, blank=True)
-    free_qty = models.IntegerField(null=True, blank=True)
-    total_amt = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
-    free_amount = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
-    rate = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
-    disc_amount = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
-    helper_1 = models.CharField(max_length=200, null=True, blank=True)
-    kl_mt_outlets = models.CharField(max_length=200, null=True, blank=True)
-    tn_mt_outlets = models.CharField(max_length=200, null=True, blank=True)
-    new_category = models.CharField(max_length=200, null=True, blank=True)
-    new_sku = models.CharField(max_length=200, null=True, blank=True)
-    division = models.CharField(max_length=200, null=True, blank=True)
-    customer_name = models.CharField(max_length=200, null=True, blank=True)
-    district_milk = models.CharField(max_length=200, null=True, blank=True)
-    district_dashboard = models.CharField(max_length=200, null=True, blank=True)
-    zone_mt = models.CharField(max_length=200, null=True, blank=True)
+class SalesLine(models.Model):
+    """Columns of one sales export line; verbose_name is the header each field is imported from"""
+    voucher_type = models.CharField('Voucher Type', max_length=200, null=True, blank=True)
+    sales_id = models.IntegerField('ID', null=True, blank=True)
+    state_name = models.CharField('state_name', max_length=200, null=True, blank=True)
+    zone = models.CharField('Zone', max_length=200, null=True, blank=True)
+    branch_name = models.CharField('Branch_name', max_length=200, null=True, blank=True)
+    route = models.CharField('Route', max_length=200, null=True, blank=True)
+    party_name = models.CharField('PartyName', max_length=200, null=True, blank=True)
+    category_name = models.CharField('CategoryName', max_length=200, null=True, blank=True)
+    payment_type = models.CharField('PaymentType', max_length=200, null=True, blank=True)
+    created_date = models.DateField('CreatedDate', null=True, blank=True)
+    voucher_date = models.DateField('VoucherDate', null=True, blank=True)
+    voucher_no = models.CharField('VoucherNo', max_length=200, null=True, blank=True)
+    bill_type = models.CharField('Bill Type', max_length=200, null=True, blank=True)
+    salesman = models.CharField('Salesman', max_length=200, null=True, blank=True)
+    taxable = models.DecimalField('Taxable', max_digits=10, decimal_places=2, null=True, blank=True)
+    cgst = models.DecimalField('CGST', max_digits=10, decimal_places=2, null=True, blank=True)
+    sgst = models.DecimalField('SGST', max_digits=10, decimal_places=2, null=True, blank=True)
+    igst = models.DecimalField('IGST', max_digits=10, decimal_places=2, null=True, blank=True)
+    voucher_amt = models.DecimalField('VoucherAMT', max_digits=10, decimal_places=2, null=True, blank=True)
+    discount = models.DecimalField('Discount', max_digits=10, decimal_places=2, null=True, blank=True)
+    realisable_amount = models.DecimalField('Realisable amount', max_digits=10, decimal_places=2, null=True, blank=True)
+    receive_amt = models.DecimalField('RecieveAMT', max_digits=10, decimal_places=2, null=True, blank=True)
+    difference = models.DecimalField('Differance', max_digits=10, decimal_places=2, null=True, blank=True)
+    rmode = models.CharField('RMODE', max_length=200, null=True, blank=True)
+    group_name = models.CharField('GroupName', max_length=200, null=True, blank=True)
+    item_code = models.CharField('ItemCOde', max_length=200, null=True, blank=True)
+    tax_perc = models.DecimalField('TaxPerc', max_digits=5, decimal_places=2, null=True, blank=True)
+    qty = models.IntegerField('qty', null=True, blank=True)
+    free_qty = models.IntegerField('Freeqty', null=True, blank=True)
+    total_amt = models.DecimalField('TotalAmt', max_digits=10, decimal_places=2, null=True, blank=True)
+    free_amount = models.DecimalField('FreeAmount', max_digits=10, decimal_places=2, null=True, blank=True)
+    rate = models.DecimalField('Rate', max_digits=10, decimal_places=2, null=True, blank=True)
+    disc_amount = models.DecimalField('DiscAmount', max_digits=10, decimal_places=2, null=True, blank=True)
+    helper_1 = models.CharField('Helper 1', max_length=200, null=True, blank=True)
+    kl_mt_outlets = models.CharField('KL MT OUTLETS', max_length=200, null=True, blank=True)
+    tn_mt_outlets = models.CharField('TN MT OUTLETS', max_length=200, null=True, blank=True)
+    new_category = models.CharField('Category', max_length=200, null=True, blank=True)
+    new_sku = models.CharField('NEW SKU', max_length=200, null=True, blank=True)
+    division = models.CharField('Division', max_length=200, null=True, blank=True)
+    customer_name = models.CharField('Customer name', max_length=200, null=True, blank=True)
+    district_milk = models.CharField('District for milk', max_length=200, null=True, blank=True)
+    district_dashboard = models.CharField('District for Dashboard', max_length=200, null=True, blank=True)
+    zone_mt = models.CharField('ZONE FOR MT', max_length=200, null=True, blank=True)
+
+    # One sales line per voucher item; re-uploads are matched on this key
+    NATURAL_KEY = ['sales_id', 'voucher_no', 'item_code', 'voucher_date']
+
+    class Meta:
+        abstract = True
+
+
+class DimensionValue(models.Model):
+    """One distinct value of an interned SalesFact text column, keyed by a 4-byte integer"""
+    id = models.AutoField(primary_key=True)
+    field = models.CharField(max_length=50)  # The SalesFact field the value belongs to
+    value = models.CharField(max_length=200)  # Compared exactly; binary collation on SQL Server (migration 0017)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['field', 'value'], name='dimensionvalue_field_value'),
+        ]
+
+    def __str__(self):
+        return f"{self.field}: {self.value}"
+
+
+def dimension_key(header):
+    # No foreign key constraint or per-column index: imports intern every value before
+    # writing it, and the filters that need an index declare one in Meta
+    return models.ForeignKey(
+        DimensionValue, models.PROTECT, verbose_name=header, null=True, blank=True,
+        related_name='+', db_constraint=False, db_index=False,
+    )
+
+
+class SalesFact(SalesLine):
+    """The stored sales lines, with repetitive text columns interned as DimensionValue keys.
+
+    Imports write here; reads go through the ExcelData view, which joins the keys back
+    to their text.
+    """
+    voucher_type = dimension_key('Voucher Type')
+    state_name = dimension_key('state_name')
+    zone = dimension_key('Zone')
+    branch_name = dimension_key('Branch_name')
+    route = dimension_key('Route')
+    party_name = dimension_key('PartyName')
+    category_name = dimension_key('CategoryName')
+    payment_type = dimension_key('PaymentType')
+    bill_type = dimension_key('Bill Type')
+    salesman = dimension_key('Salesman')
+    rmode = dimension_key('RMODE')
+    group_name = dimension_key('GroupName')
+    item_code = dimension_key('ItemCOde')
+    helper_1 = dimension_key('Helper 1')
+    kl_mt_outlets = dimension_key('KL MT OUTLETS')
+    tn_mt_outlets = dimension_key('TN MT OUTLETS')
+    new_category = dimension_key('Category')
+    new_sku = dimension_key('NEW SKU')
+    division = dimension_key('Division')
+    customer_name = dimension_key('Customer name')
+    district_milk = dimension_key('District for milk')
+    district_dashboard = dimension_key('District for Dashboard')
+    zone_mt = dimension_key('ZONE FOR MT')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['sales_id', 'voucher_no', 'item_code', 'voucher_date'],
+                condition=models.Q(
+                    sales_id__isnull=False, voucher_no__isnull=False,
+                    item_code__isnull=False, voucher_date__isnull=False,
+                ),
+                name='salesfact_natural_key',
+            ),
+        ]
+        # Seek pagination in view_excel_data orders by id within each filter
+        indexes = [
+            models.Index(fields=['voucher_date', 'id'], name='salesfact_date_id_idx'),
+            models.Index(fields=['branch_name', 'id'], name='salesfact_branch_id_idx'),
+            models.Index(fields=['zone', 'id'], name='salesfact_zone_id_idx'),
+            models.Index(fields=['salesman', 'id'], name='salesfact_salesman_id_idx'),
+        ]
+
+
+
+class ExcelData(SalesLine):
+    """Read-only view of SalesFact with the interned columns joined back to their text"""
+
+    class Meta:
+        managed = False
 
     def __str__(self):
 
         db_table = 'ExcelData'
+
+
+class ExcelDataArchive(SalesLine):
+    """Sales lines moved out of ExcelData by archive_partitions, under their original ids"""
+    id = models.BigIntegerField(primary_key=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['voucher_date'], name='exceldataarchive_date_idx'),
+        ]
+
+
+class ArchivedMonth(models.Model):
+    """A voucher_date month archived out of ExcelData; its lines' totals are kept in ArchivedDaily"""
+    month = models.DateField(unique=True)  # Month start
+    destination = models.CharField(max_length=10)
+    rows = models.IntegerField(default=0)  # Lines moved, over every archive run of the month
+    archived_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.month:%Y-%m} archived to {self.destination}"
+
+
+class ImportJob(models.Model):
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_SKIPPED = 'skipped'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+        (STATUS_SKIPPED, 'Skipped'),
+    ]
+
+    DEDUP_UPDATE = 'update'
+    DEDUP_SKIP = 'skip'
+    DEDUP_INSERT = 'insert'
+    DEDUP_CHOICES = [
+        (DEDUP_UPDATE, 'Update existing rows'),
+        (DEDUP_SKIP, 'Skip existing rows'),
+        (DEDUP_INSERT, 'Insert only, fail on existing rows'),
+    ]
+
+    file_name = models.CharField(max_length=255)
+    file_path = models.CharField(max_length=500)
+    sheet_name = models.CharField(max_length=255, null=True, blank=True)  # None reads the first sheet
+    # A batch job imports its parts (one per file or sheet) and holds their combined totals
+    is_batch = models.BooleanField(default=False)
+    batch = models.ForeignKey('self', null=True, blank=True, related_name='parts', on_delete=models.CASCADE)
+    content_hash = models.CharField(max_length=64, null=True, blank=True, db_index=True)
+    dedup_mode = models.CharField(max_length=10, choices=DEDUP_CHOICES, default=DEDUP_UPDATE)
+    staged = models.BooleanField(default=False)
+    rollup_days = models.JSONField(null=True, blank=True)  # Voucher dates whose rollups need rebuilding
+    timings = models.JSONField(null=True, blank=True)  # Seconds per stage, in total and per chunk
+    # A delta import's source, field and starting watermark, with the highest value loaded and rows skipped
+    delta = models.JSONField(null=True, blank=True)
+    profile = models.BooleanField(default=False)
+    profile_path = models.CharField(max_length=500, null=True, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    chunk_size = models.IntegerField(default=50000)
+    chunks_done = models.IntegerField(default=0)
+    rows_done = models.IntegerField(default=0)
+    total_rows = models.IntegerField(null=True, blank=True)
+    elapsed_seconds = models.FloatField(default=0.0)
+    invalid_report = models.JSONField(null=True, blank=True)
+    message = models.TextField(null=True, blank=True)
+    error = models.TextField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.source_name} ({self.status})"
+
+    @property
+    def source_name(self):
+        return f"{self.file_name} [{self.sheet_name}]" if self.sheet_name else self.file_name
+
+    def checkpoint(self, rows, seconds, report=None, rollup_days=None, timings=None, delta=None):
+        """Record a committed chunk; call inside the chunk's transaction"""
+        self.chunks_done += 1
+        self.rows_done += rows
+        self.elapsed_seconds += seconds
+        if report:
+            self.invalid_report = report.to_dict()
+        if rollup_days:
+            self.rollup_days = sorted(rollup_days)
+        if timings:
+            self.timings = timings
+        if delta:
+            self.delta = delta
+        self.save(update_fields=[
+            'chunks_done', 'rows_done', 'elapsed_seconds', 'invalid_report', 'rollup_days', 'timings', 'delta', 'updated_at',
+        ])
+
+    @property
+    def invalid_counts(self):
+        return {column: entry['count'] for column, entry in (self.invalid_report or {}).items()}
+
+    @property
+    def rows_per_sec(self):
+        return self.rows_done / self.elapsed_seconds if self.elapsed_seconds > 0 else 0.0
+
+    @property
+    def eta_seconds(self):
+        if self.total_rows is None or not self.rows_per_sec:
+            return None
+        return max(self.total_rows - self.rows_done, 0) / self.rows_per_sec
+
+
+class SalesRollup(models.Model):
+    """Sales totals per grain period and dimension combination; blank dimensions are ''"""
+    branch_name = models.CharField(max_length=200, default='', blank=True)
+    zone = models.CharField(max_length=200, default='', blank=True)
+    division = models.CharField(max_length=200, default='', blank=True)
+    district_dashboard = models.CharField(max_length=200, default='', blank=True)
+    row_count = models.IntegerField(default=0)
+    taxable = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    cgst = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    sgst = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    igst = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    voucher_amt = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    qty = models.BigIntegerField(default=0)
+    free_qty = models.BigIntegerField(default=0)
+
+    DIMENSIONS = ['branch_name', 'zone', 'division', 'district_dashboard']
+    MEASURES = ['taxable', 'cgst', 'sgst', 'igst', 'voucher_amt', 'qty', 'free_qty']
+
+    class Meta:
+        abstract = True
+
+
+class SalesDaily(SalesRollup):
+    day = models.DateField()
+
+    PERIOD = 'day'
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'branch_name', 'zone', 'division', 'district_dashboard'], name='salesdaily_grain'),
+        ]
+
+
+class SalesMonthly(SalesRollup):
+    month = models.DateField()  # First day of the month
+
+    PERIOD = 'month'
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['month', 'branch_name', 'zone', 'division', 'district_dashboard'], name='salesmonthly_grain'),
+        ]
+
+
+class ArchivedDaily(SalesRollup):
+    """Daily totals of the sales lines archive_month moved out; rollup rebuilds add them to SalesFact's"""
+    day = models.DateField()
+
+    PERIOD = 'day'
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'branch_name', 'zone', 'division', 'district_dashboard'], name='archiveddaily_grain'),
+        ]
+
+
+class ImportWatermark(models.Model):
+    """Highest value of a field loaded from one export source; delta imports of it skip rows at or below it"""
+    FIELD_CHOICES = [
+        ('voucher_date', 'VoucherDate'),
+        ('created_date', 'CreatedDate'),
+        ('sales_id', 'ID'),
+    ]
+
+    source = models.CharField(max_length=100, unique=True)
+    field = models.CharField(max_length=20, choices=FIELD_CHOICES)
+    value = models.CharField(max_length=50)  # ISO date, or the integer ID as text
+    job = models.ForeignKey(ImportJob, null=True, blank=True, related_name='+', on_delete=models.SET_NULL)  # Last to advance it
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.source} {self.field} > {self.value}"
+
+
+class DataGeneration(models.Model):
+    """Counter bumped in every transaction that changes a table, used to key query caches"""
+    name = models.CharField(max_length=100, unique=True)
+    value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name} generation {self.value}"
@@ -0,0 +1,154 @@
+from django.db import connections, transaction
+from django.db.models import Count
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+from .export import export_batches, parquet_stream
+from .models import ArchivedMonth, ExcelData, ExcelDataArchive, SalesFact
+from .querycache import bump_generation
+from .rollups import archive_rollups
+from .writers import quoted_columns
+from datetime import date
+from pathlib import Path
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+# SQL Server objects that spread the sales lines (SalesFact) over one partition per voucher_date month,
+# created by migrations 0016 and 0017. RANGE RIGHT puts each boundary date in the
+# partition it starts; rows without a voucher date sort first and stay in partition 1.
+PARTITION_FUNCTION = 'pf_exceldata_month'
+PARTITION_SCHEME = 'ps_exceldata_month'
+MONTHS_AHEAD = 3  # Empty partitions kept ready past the current month
+
+ARCHIVE_DESTINATIONS = ['table', 'parquet']
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def add_months(month, months):
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_range(first, last):
+    """Month starts from first through last, both month starts"""
+    months = []
+    while first <= last:
+        months.append(first)
+        first = add_months(first, 1)
+    return months
+
+
+def is_partitioned(using='default'):
+    """Whether the sales lines sit on the monthly partition scheme; only SQL Server tables are partitioned"""
+    connection = connections[using]
+    if connection.vendor != 'microsoft':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM sys.partition_functions WHERE name = %s", [PARTITION_FUNCTION])
+        return cursor.fetchone() is not None
+
+
+def partition_boundaries(using='default'):
+    """The month starts dividing the sales partitions, oldest first"""
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            "SELECT CAST(v.value AS date) FROM sys.partition_range_values v "
+            "JOIN sys.partition_functions f ON f.function_id = v.function_id "
+            "WHERE f.name = %s ORDER BY v.boundary_id",
+            [PARTITION_FUNCTION],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def create_partitions(months_ahead=MONTHS_AHEAD, using='default', today=None):
+    """Add partitions through months_ahead months past the current one; returns the months added.
+
+    New boundaries split the last partition, which is empty unless rows dated after the
+    last boundary have been imported.
+    """
+    if not is_partitioned(using):
+        return []
+    connection = connections[using]
+    boundaries = partition_boundaries(using)
+    last = add_months(month_start(today or timezone.localdate()), months_ahead)
+    months = month_range(add_months(boundaries[-1], 1), last) if boundaries else [last]
+    with connection.cursor() as cursor:
+        for month in months:
+            cursor.execute(f"ALTER PARTITION SCHEME {PARTITION_SCHEME} NEXT USED [PRIMARY]")
+            cursor.execute(f"ALTER PARTITION FUNCTION {PARTITION_FUNCTION}() SPLIT RANGE ('{month.isoformat()}')")
+            logger.info(f"Added the sales partition for {month:%Y-%m}")
+    return months
+
+
+def months_before(cutoff, using='default'):
+    """(month, rows) of sales lines for each month with rows dated before the cutoff month start"""
+    return [
+        (group['month'], group['rows']) for group in
+        SalesFact.objects.using(using).filter(voucher_date__lt=cutoff)
+        .annotate(month=TruncMonth('voucher_date')).values('month')
+        .annotate(rows=Count('id')).order_by('month')
+    ]
+
+
+def write_parquet(queryset, path):
+    """Write a queryset's rows to a Parquet file, through a temporary name so no partial file is left"""
+    partial = path.with_name(path.name + '.partial')
+    with open(partial, 'wb') as f:
+        for part in parquet_stream(export_batches(queryset)):
+            f.write(part)
+        f.flush()
+        os.fsync(f.fileno())
+    partial.replace(path)
+    return path
+
+
+def archive_month(month, destination='table', directory=None, using='default'):
+    """Move one voucher_date month of sales lines out and return the number of rows moved.
+
+    Rows are read through the ExcelData view, so they leave with their text values:
+    they are copied to ExcelDataArchive with their ids, or written to
+    <directory>/exceldata-YYYY-MM.parquet, then deleted from SalesFact in the same
+    transaction, which also records the month as an ArchivedMonth. The rollups keep
+    their totals, and the lines' daily totals are added to ArchivedDaily so that
+    rebuild_rollups can still count them. On a partitioned table the emptied month's
+    partition is merged away afterwards.
+    """
+    start_time = time.time()
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    end = add_months(month, 1)
+    rows = ExcelData.objects.using(using).filter(voucher_date__gte=month, voucher_date__lt=end)
+    with transaction.atomic(using=using):
+        if destination == 'parquet':
+            path = write_parquet(rows, Path(directory) / f"exceldata-{month:%Y-%m}.parquet")
+            logger.info(f"Wrote {month:%Y-%m} to {path}")
+        else:
+            columns = ', '.join([quote('id')] + quoted_columns(connection, model=ExcelData))
+            date_column = quote(ExcelData._meta.get_field('voucher_date').column)
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"INSERT INTO {quote(ExcelDataArchive._meta.db_table)} ({columns}) "
+                    f"SELECT {columns} FROM {quote(ExcelData._meta.db_table)} "
+                    f"WHERE {date_column} >= %s AND {date_column} < %s",
+                    [month, end],
+                )
+        lines = SalesFact.objects.using(using).filter(voucher_date__gte=month, voucher_date__lt=end)
+        archive_rollups(lines, using)
+        moved, _ = lines.delete()
+        archived, created = ArchivedMonth.objects.using(using).get_or_create(
+            month=month, defaults={'destination': destination, 'rows': moved},
+        )
+        if not created:
+            archived.destination, archived.rows = destination, archived.rows + moved
+            archived.save(using=using, update_fields=['destination', 'rows', 'archived_at'])
+        bump_generation(using)
+    if is_partitioned(using) and month in partition_boundaries(using):
+        with connection.cursor() as cursor:
+            cursor.execute(f"ALTER PARTITION FUNCTION {PARTITION_FUNCTION}() MERGE RANGE ('{month.isoformat()}')")
+    logger.info(f"Archived {moved} sales lines of {month:%Y-%m} to {destination} in {time.time() - start_time:.2f}s")
+    return moved
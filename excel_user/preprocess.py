@@ -0,0 +1,453 @@
+# Kept free of Django imports so spawned pool workers can import it without app setup
+from .schema import import_schema
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+from contextlib import contextmanager
+import csv
+import io
+import itertools
+import multiprocessing
+import numpy as np
+import pandas as pd
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+SAMPLE_ROWS = 20  # Invalid values kept verbatim per column
+MAX_RANGES = 500  # Row intervals kept per column before the list is truncated
+BLANK_TEXT = ['nan', 'NaN', '', ' ']  # Text cells stored as NULL
+
+
+def row_ranges(rows, limit=None):
+    """Collapse sorted row numbers into [start, end] intervals"""
+    if len(rows) == 0:
+        return []
+    breaks = np.flatnonzero(np.diff(rows) != 1)
+    starts = np.concatenate(([rows[0]], rows[breaks + 1]))[:limit]
+    ends = np.concatenate((rows[breaks], [rows[-1]]))[:limit]
+    return [[int(start), int(end)] for start, end in zip(starts, ends)]
+
+
+class InvalidValueReport:
+    """Bounded per-column summary of values replaced during preprocessing.
+
+    Keeps a count, the first SAMPLE_ROWS (row, value) pairs and the affected rows as
+    compact intervals, so its size doesn't grow with the number of bad rows. Reports
+    from separate chunks are combined with merge() in file order.
+    """
+
+    def __init__(self, columns=None, sample_rows=SAMPLE_ROWS, max_ranges=MAX_RANGES):
+        self.columns = columns or {}
+        self.sample_rows = sample_rows
+        self.max_ranges = max_ranges
+
+    def __bool__(self):
+        return bool(self.columns)
+
+    def _entry(self, column):
+        return self.columns.setdefault(column, {'count': 0, 'samples': [], 'ranges': [], 'ranges_truncated': False})
+
+    def _extend_ranges(self, entry, ranges):
+        current = entry['ranges']
+        for start, end in ranges:
+            if current and current[-1][1] + 1 == start:
+                current[-1][1] = end
+            elif len(current) < self.max_ranges:
+                current.append([start, end])
+            else:
+                entry['ranges_truncated'] = True
+                break
+
+    def add(self, column, rows, values):
+        """Record invalid values of a column; rows are sorted file row numbers"""
+        entry = self._entry(column)
+        entry['count'] += len(rows)
+        room = self.sample_rows - len(entry['samples'])
+        if room > 0:
+            entry['samples'].extend(
+                [int(row), None if pd.isna(value) else str(value)]
+                for row, value in zip(rows[:room], values.iloc[:room])
+            )
+        self._extend_ranges(entry, row_ranges(rows, self.max_ranges + 1))
+
+    def merge(self, other):
+        for column, theirs in other.columns.items():
+            entry = self._entry(column)
+            entry['count'] += theirs['count']
+            entry['samples'].extend(theirs['samples'][:self.sample_rows - len(entry['samples'])])
+            self._extend_ranges(entry, theirs['ranges'])
+            entry['ranges_truncated'] = entry['ranges_truncated'] or theirs['ranges_truncated']
+        return self
+
+    def counts(self):
+        return {column: entry['count'] for column, entry in self.columns.items()}
+
+    def to_dict(self):
+        return self.columns
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(columns=data)
+
+    def to_csv(self):
+        """Render one line per column: count, row intervals and sample values"""
+        output = io.StringIO()
+        writer = csv.writer(output)
+        writer.writerow(['column', 'invalid_count', 'row_ranges', 'ranges_truncated', 'sample_rows', 'sample_values'])
+        for column, entry in self.columns.items():
+            writer.writerow([
+                column,
+                entry['count'],
+                '; '.join(str(start) if start == end else f'{start}-{end}' for start, end in entry['ranges']),
+                'yes' if entry['ranges_truncated'] else 'no',
+                '; '.join(str(row) for row, _ in entry['samples']),
+                '; '.join('' if value is None else value for _, value in entry['samples']),
+            ])
+        return output.getvalue()
+
+
+# Candidate formats tried against a sample of each date column, most common first
+DATE_FORMATS = [
+    '%d-%m-%Y', '%d/%m/%Y', '%d.%m.%Y', '%d-%m-%y', '%d/%m/%y', '%d-%b-%Y', '%d-%b-%y',
+    '%d-%m-%Y %H:%M:%S', '%d/%m/%Y %H:%M:%S', '%d-%m-%Y %H:%M', '%d/%m/%Y %H:%M', 'ISO8601',
+]
+DATE_SAMPLE_SIZE = 500
+DATE_FORMAT_MIN_MATCH = 0.9  # Share of the sample a format must parse to be chosen
+
+# Excel stores dates as days since 1899-12-30 (the 1900 leap-year bug is folded in)
+EXCEL_EPOCH = pd.Timestamp('1899-12-30')
+EXCEL_MAX_SERIAL = 2958465  # 9999-12-31
+
+
+def _date_strings(series):
+    """Non-blank text values of a column that aren't Excel serial numbers"""
+    if not (series.dtype == object or pd.api.types.is_string_dtype(series)):
+        return series.iloc[:0]
+    values = series.dropna()
+    values = values[values.map(lambda value: isinstance(value, str))].astype(str).str.strip()
+    values = values[values != '']
+    return values[pd.to_numeric(values, errors='coerce').isna()]
+
+
+def detect_date_format(series, sample_size=DATE_SAMPLE_SIZE):
+    """Return the candidate format that parses most of a sample of the column, or None"""
+    sample = _date_strings(series.head(sample_size * 4)).head(sample_size)
+    if sample.empty:
+        return None
+    best_format, best_ratio = None, 0.0
+    for fmt in DATE_FORMATS:
+        ratio = pd.to_datetime(sample, format=fmt, errors='coerce').notna().mean()
+        if ratio > best_ratio:
+            best_format, best_ratio = fmt, ratio
+        if ratio == 1.0:
+            break
+    return best_format if best_ratio >= DATE_FORMAT_MIN_MATCH else None
+
+
+def detect_date_formats(df, columns):
+    """Detect the format of each of the date columns once, from the file's first chunk"""
+    formats = {col: detect_date_format(df[col]) for col in columns if col in df.columns}
+    logger.info(f"Detected date formats: {formats}")
+    return formats
+
+
+def parse_dates(df, col, report, stats, date_format=None):
+    """Parse a date column with a fixed format and convert Excel serial numbers arithmetically.
+
+    Returns the datetime64 Series; values that don't parse are recorded and left NaT.
+    """
+    source = df[col]
+    paths = stats.setdefault('date_paths', {}).setdefault(col, {})
+
+    def count(path, n):
+        paths[path] = paths.get(path, 0) + int(n)
+
+    if pd.api.types.is_datetime64_any_dtype(source):
+        # Excel cells typed as dates arrive already parsed
+        parsed = source
+        count('native', parsed.notna().sum())
+    elif pd.api.types.is_numeric_dtype(source):
+        # An all-number column holds serials only; to_datetime would read them as epoch offsets
+        parsed = pd.Series(pd.NaT, index=source.index, dtype='datetime64[ns]')
+    elif date_format:
+        parsed = pd.to_datetime(source, format=date_format, errors='coerce')
+        count(f'format {date_format}', parsed.notna().sum())
+    else:
+        parsed = pd.to_datetime(source, dayfirst=True, errors='coerce')
+        count('inferred', parsed.notna().sum())
+
+    # Only cells the text parse left empty are checked for Excel serial numbers
+    unparsed = parsed.isna().to_numpy() & source.notna().to_numpy()
+    if unparsed.any():
+        numbers = pd.to_numeric(source[unparsed], errors='coerce')
+        serial = numbers.between(1, EXCEL_MAX_SERIAL).to_numpy(dtype=bool, na_value=False)
+        if serial.any():
+            days = np.floor(numbers[serial].to_numpy(dtype='float64'))
+            serial_mask = unparsed.copy()
+            serial_mask[unparsed] = serial
+            parsed = parsed.astype('datetime64[ns]')
+            parsed[serial_mask] = EXCEL_EPOCH + pd.to_timedelta(days, unit='D')
+            count('excel serial', serial.sum())
+            unparsed[serial_mask] = False
+
+    failed_mask = unparsed
+    if failed_mask.any():
+        # Whitespace-only cells are blanks, not failures; only the few unparsed cells are checked
+        failed_mask[failed_mask] = source[failed_mask].astype(str).str.strip().ne('').to_numpy()
+    if failed_mask.any():
+        rows = df.index.to_numpy()[failed_mask] + 2  # +2 for 1-based indexing and header
+        report.add(col, rows, source[failed_mask])
+        count('failed', failed_mask.sum())
+        logger.warning(f"Could not parse {len(rows)} dates in {col} (rows {rows[0]}-{rows[-1]})")
+    return parsed
+
+
+def convert_dates(df, col, report, stats, date_format=None):
+    df[col] = parse_dates(df, col, report, stats, date_format).dt.date
+
+
+def _text_units(text, max_digits, decimal_places):
+    """Read plain decimal text ([+-]digits[.digits]) as exact int64 units; returns (units, matched, oversized).
+
+    The digits are split at the point, the fraction is cut or zero-padded to
+    decimal_places and the digit string is read as an integer; the first digit cut off
+    rounds half to even (with any nonzero digit after it breaking the tie), as
+    Decimal.quantize does on the fast lane. Every step is a numpy string or array
+    operation over the whole column.
+    """
+    strings = np.strings
+    text = strings.strip(text)
+    unsigned = strings.lstrip(text, '+-')
+    negative = strings.startswith(text, '-')
+    whole, _, fraction = strings.partition(unsigned, '.')
+    whole = strings.lstrip(whole, '0')
+    ascii_text = (text.view(np.uint32).reshape(len(text), -1) < 128).all(axis=1)
+    matched = (
+        ascii_text & (strings.str_len(text) - strings.str_len(unsigned) <= 1)
+        & (strings.isdigit(whole) | (whole == '')) & (strings.isdigit(fraction) | (fraction == ''))
+        & ((strings.str_len(unsigned) > 0) & (unsigned != '.'))
+    )
+    oversized = matched & (strings.str_len(whole) > max_digits - decimal_places)
+    digits = strings.add(whole, strings.ljust(strings.slice(fraction, 0, decimal_places), decimal_places, '0'))
+    digits = strings.rjust(np.where(matched & ~oversized, digits, ''), max_digits, '0')
+    # Fixed-width ASCII digits: read them column by column instead of parsing each string
+    codes = digits.view(np.uint32).reshape(len(digits), max_digits)
+    units = np.zeros(len(digits), dtype=np.int64)
+    for position in range(max_digits):
+        units = units * 10 + (codes[:, position].astype(np.int64) - ord('0'))
+    cut = strings.slice(fraction, decimal_places, decimal_places + 1)
+    sticky = strings.str_len(strings.rstrip(strings.slice(fraction, decimal_places + 1, None), '0')) > 0
+    units += (cut > '5') | ((cut == '5') & (sticky | (units % 2 == 1)))
+    return np.where(negative, -units, units), matched, oversized
+
+
+def decimal_units(values, max_digits, decimal_places):
+    """Parse amounts to exact int64 whole units of the last decimal place (e.g. paise).
+
+    Text is read digit by digit (_text_units), so '0.015' is 2 paise, not the 1 a
+    float64 round trip gives. Numeric columns (Excel number cells, which are doubles to
+    begin with) and text only float parsing accepts, such as exponents, are scaled from
+    float64. Returns (units, parsed, invalid_mask): a value is invalid when it doesn't
+    parse or needs more than max_digits digits, and has 0 units.
+    """
+    limit = 10 ** max_digits
+    count = len(values)
+    numbers = np.full(count, np.nan)
+    if pd.api.types.is_numeric_dtype(values.dtype) or not count:
+        numbers = values.to_numpy(dtype='float64', na_value=np.nan)
+        units, matched, oversized = np.zeros(count, dtype=np.int64), np.zeros(count, dtype=bool), np.zeros(count, dtype=bool)
+    else:
+        text = values.astype(object).where(values.notna(), '').to_numpy(dtype=str)
+        units, matched, oversized = _text_units(text, max_digits, decimal_places)
+        rest = ~matched & (text != '')
+        if rest.any():
+            numbers[rest] = pd.to_numeric(pd.Series(text[rest]), errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+    with np.errstate(invalid='ignore'):
+        scaled = np.rint(numbers * 10 ** decimal_places)
+        fits = np.abs(scaled) < limit  # False for NaN
+    units = np.where(matched, units, np.where(fits, scaled, 0).astype(np.int64))
+    parsed = matched | ~np.isnan(numbers)
+    invalid_mask = oversized | (matched & (np.abs(units) >= limit)) | (~matched & ~fits)
+    units[invalid_mask] = 0
+    return units, parsed, invalid_mask
+
+
+def units_text(units, decimal_places):
+    """Fixed-point text of int64 whole units (e.g. 1250 paise -> '12.50') for drivers to bind exactly"""
+    units = np.asarray(units, dtype=np.int64)
+    magnitude = np.abs(units)
+    width = max(len(str(int(magnitude.max()))) if len(units) else 1, decimal_places + 1)
+    # A fixed-width row of digit codes per value, read back as one string each
+    codes = (magnitude[:, None] // 10 ** np.arange(width - 1, -1, -1, dtype=np.int64) % 10 + ord('0')).astype(np.uint32)
+    if decimal_places:
+        codes = np.insert(codes, width - decimal_places, ord('.'), axis=1)
+    text = np.strings.lstrip(np.ascontiguousarray(codes).view(f'<U{codes.shape[1]}')[:, 0], '0')
+    text = np.where(np.strings.startswith(text, '.') | (text == ''), np.strings.add('0', text), text)
+    return np.where(units < 0, np.strings.add('-', text), text).tolist()
+
+
+def convert_decimal(df, col, report, max_digits, decimal_places):
+    """Convert an amount column to exact int64 whole units of the last decimal place (e.g. paise).
+
+    No float or Decimal is built per value: writers bind the units as fixed-point text
+    (units_text). Values that don't parse or need more than max_digits digits are
+    recorded and replaced with 0.
+    """
+    units, _, invalid_mask = decimal_units(df[col], max_digits, decimal_places)
+    if invalid_mask.any():
+        rows = df.index.to_numpy()[invalid_mask] + 2  # +2 for 1-based indexing and header
+        report.add(col, rows, df[col][invalid_mask])
+        logger.warning(f"Replaced {len(rows)} invalid or oversized values in {col} (rows {rows[0]}-{rows[-1]})")
+    df[col] = pd.Series(units, index=df.index)
+
+
+def convert_numeric(df, col, report, downcast, fill_value):
+    """Coerce a column to numbers, recording values that don't parse (blank or not)"""
+    converted = pd.to_numeric(df[col], errors='coerce', downcast=downcast)
+    # A failed parse is exactly a missing result, so no string copy of the column is needed
+    invalid_mask = converted.isna().to_numpy()
+    if invalid_mask.any():
+        rows = df.index.to_numpy()[invalid_mask] + 2  # +2 for 1-based indexing and header
+        report.add(col, rows, df[col][invalid_mask])
+        logger.warning(f"Replaced {len(rows)} invalid values in {col} (rows {rows[0]}-{rows[-1]})")
+    df[col] = converted.fillna(fill_value)
+
+
+@contextmanager
+def timed(timings, stage):
+    """Add the wall time of the block to timings[stage]"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - start
+
+
+def preprocess_chunk(df, report, stats=None, date_formats=None, schema=None):
+    """Preprocess data types in bulk using pandas.
+
+    Columns are converted by the kind of field they land in, per the import schema;
+    amount columns hold int64 whole units of their last decimal place (convert_decimal);
+    date_formats maps date columns to the strptime format detected for the file;
+    stats collects per-chunk counters such as how each date value was parsed, and the
+    time spent on each column type under stats['timings'].
+    """
+    schema = schema or import_schema()
+    stats = {} if stats is None else stats
+    timings = stats.setdefault('timings', {})
+    # Convert amount columns to exact scaled integers and replace invalid values with 0
+    with timed(timings, 'preprocess.numeric'):
+        for column in schema.of_kind('decimal'):
+            if column.header in df.columns:
+                convert_decimal(df, column.header, report, column.max_digits, column.decimal_places)
+
+    # Convert integer columns and replace invalid values with 0
+    with timed(timings, 'preprocess.integer'):
+        for column in schema.of_kind('integer'):
+            if column.header in df.columns:
+                convert_numeric(df, column.header, report, 'integer', 0)
+
+    # Convert string columns
+    with timed(timings, 'preprocess.text'):
+        for column in schema.of_kind('text'):
+            col = column.header
+            if col in df.columns:
+                if isinstance(df[col].dtype, pd.CategoricalDtype):
+                    # Clean the distinct values once instead of every cell
+                    blanks = [value for value in df[col].cat.categories if str(value) in BLANK_TEXT]
+                    df[col] = df[col].cat.remove_categories(blanks)
+                else:
+                    df[col] = df[col].astype(str).replace(BLANK_TEXT, None)
+
+    # Convert date columns
+    with timed(timings, 'preprocess.dates'):
+        for column in schema.of_kind('date'):
+            if column.header in df.columns:
+                convert_dates(df, column.header, report, stats, (date_formats or {}).get(column.header))
+
+    return df
+
+
+def _preprocess_task(chunk, date_formats=None, schema=None):
+    report = InvalidValueReport()
+    stats = {}
+    return preprocess_chunk(chunk, report, stats, date_formats, schema), report, stats
+
+
+def merge_stats(total, stats):
+    """Add one chunk's counters into the running totals for the file"""
+    for col, paths in stats.get('date_paths', {}).items():
+        col_total = total.setdefault('date_paths', {}).setdefault(col, {})
+        for path, n in paths.items():
+            col_total[path] = col_total.get(path, 0) + n
+    add_timings(total.setdefault('timings', {}), stats.get('timings', {}))
+    return total
+
+
+def add_timings(total, timings):
+    for stage, seconds in timings.items():
+        total[stage] = total.get(stage, 0.0) + seconds
+    return total
+
+
+def selected_chunks(chunks, row_filter, date_formats, selections):
+    """Pass (start_row, DataFrame) chunks through row_filter, keeping what it dropped by start row"""
+    for start_row, chunk in chunks:
+        start = time.perf_counter()
+        chunk, skipped, top = row_filter(chunk, date_formats)
+        selections[start_row] = {'skipped': skipped, 'max': top, 'seconds': time.perf_counter() - start}
+        yield start_row, chunk
+
+
+def preprocessed_chunks(chunks, workers=1, queue_depth=None, schema=None, row_filter=None):
+    """Preprocess (start_row, DataFrame) chunks and yield (start_row, chunk, report, stats) in input order.
+
+    Date formats are detected once from the first chunk and reused for the whole file.
+    row_filter(chunk, date_formats) -> (chunk, rows dropped, highest value kept) selects
+    the rows of each chunk before conversion; its counts land in the chunk's stats as delta.
+    With workers > 1 the conversions run on a process pool. At most queue_depth chunks
+    (default 2 per worker) are in flight, which bounds memory while the caller writes.
+    Chunk indexes survive the round trip, so reported row numbers stay file-relative.
+    The import schema is compiled here and handed to the workers, which have no Django setup.
+    """
+    chunks = iter(chunks)
+    first = next(chunks, None)
+    if first is None:
+        return
+    schema = schema or import_schema()
+    date_formats = detect_date_formats(first[1], [column.header for column in schema.of_kind('date')])
+    chunks = itertools.chain([first], chunks)
+    selections = {}
+    if row_filter:
+        chunks = selected_chunks(chunks, row_filter, date_formats, selections)
+
+    def result(start_row, chunk, report, stats):
+        if start_row in selections:
+            selection = selections.pop(start_row)
+            stats.setdefault('timings', {})['delta'] = selection.pop('seconds')
+            stats['delta'] = selection
+        return start_row, chunk, report, stats
+
+    if workers > 1 and multiprocessing.current_process().daemon:
+        # Daemonic processes (e.g. Celery prefork children) may not start their own pool
+        logger.warning("Running inside a daemonic worker process; preprocessing chunks inline")
+        workers = 1
+
+    if workers <= 1:
+        for start_row, chunk in chunks:
+            yield result(start_row, *_preprocess_task(chunk, date_formats, schema))
+        return
+
+    queue_depth = max(queue_depth or workers * 2, 1)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for start_row, chunk in chunks:
+            pending.append((start_row, pool.submit(_preprocess_task, chunk, date_formats, schema)))
+            if len(pending) >= queue_depth:
+                start, future = pending.popleft()
+                yield result(start, *future.result())
+        while pending:
+            start, future = pending.popleft()
+            yield result(start, *future.result())
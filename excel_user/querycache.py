@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import F
+from .models import DataGeneration
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+# One generation covers ExcelData and the rollup tables derived from it
+GENERATION = 'exceldata'
+
+
+def query_cache():
+    return caches[getattr(settings, 'EXCEL_QUERY_CACHE', 'default')]
+
+
+def data_generation(using='default'):
+    return DataGeneration.objects.using(using).filter(name=GENERATION).values_list('value', flat=True).first() or 0
+
+
+def bump_generation(using='default'):
+    """Invalidate every cached query; call inside the transaction that changes the data"""
+    if not DataGeneration.objects.using(using).filter(name=GENERATION).update(value=F('value') + 1):
+        DataGeneration.objects.using(using).get_or_create(name=GENERATION, defaults={'value': 1})
+
+
+def cached_query(namespace, params, compute):
+    """Return compute() cached under the query parameters and the current data generation.
+
+    Entries have no timeout: a new generation makes the old keys unreachable and the
+    cache backend's size bound evicts them.
+    """
+    digest = hashlib.sha1(repr(sorted(params.items())).encode()).hexdigest()
+    key = f"excel:{namespace}:{data_generation()}:{digest}"
+    cache = query_cache()
+    result = cache.get(key)
+    if result is None:
+        result = compute()
+        cache.set(key, result, None)
+    else:
+        logger.debug(f"Query cache hit for {namespace}")
+    return result
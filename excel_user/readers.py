@@ -0,0 +1,236 @@
+from .schema import import_schema
+import pandas as pd
+from itertools import islice
+import logging
+import psutil
+
+logger = logging.getLogger(__name__)
+
+MIN_CHUNK_SIZE = 1000
+
+
+def read_dtypes(names, numeric_as_text=False):
+    """Build the reader dtype map for a file's header names from the import schema.
+
+    Amount columns are read as text, which preprocessing parses exactly into scaled
+    integers. Integer columns are read as float64 (they may be blank) unless
+    numeric_as_text is set, which is needed once a file turns out to hold non-numeric
+    values in them; preprocessing coerces and reports those either way.
+    """
+    schema = import_schema()
+    columns = {column.header: column for column in schema.columns}
+    dtypes = {}
+    for name, header in schema.resolve(names).items():
+        column = columns[header]
+        if column.kind == 'text':
+            dtypes[name] = 'category' if column.category else 'string'
+        elif column.kind == 'integer':
+            dtypes[name] = 'string' if numeric_as_text else 'float64'
+        else:
+            dtypes[name] = 'string'
+    return dtypes
+
+
+class MemoryBudget:
+    """Adapts the chunk size so the import's resident memory stays under a limit.
+
+    The RSS of this process and its children (preprocessing pool workers) is checked
+    before every chunk: the size is halved above 85% of the limit and grown back
+    towards max_chunk_size below 60%.
+    """
+
+    def __init__(self, limit_mb, max_chunk_size, min_chunk_size=MIN_CHUNK_SIZE):
+        self.limit_mb = limit_mb
+        self.max_chunk_size = max_chunk_size
+        self.min_chunk_size = min(min_chunk_size, max_chunk_size)
+        self.chunk_size = max_chunk_size
+        self.process = psutil.Process()
+
+    def rss_mb(self):
+        processes = [self.process] + self.process.children(recursive=True)
+        total = 0
+        for process in processes:
+            try:
+                total += process.memory_info().rss
+            except psutil.NoSuchProcess:
+                pass
+        return total / 1024 / 1024
+
+    def next_chunk_size(self):
+        rss = self.rss_mb()
+        if rss > self.limit_mb * 0.85 and self.chunk_size > self.min_chunk_size:
+            self.chunk_size = max(self.min_chunk_size, self.chunk_size // 2)
+            logger.warning(f"Memory usage {rss:.2f} MB near the {self.limit_mb} MB budget, chunk size lowered to {self.chunk_size}")
+        elif rss < self.limit_mb * 0.6 and self.chunk_size < self.max_chunk_size:
+            self.chunk_size = min(self.max_chunk_size, int(self.chunk_size * 1.5))
+        return self.chunk_size
+
+
+def is_csv(file_name):
+    return file_name.lower().endswith('.csv')
+
+
+def is_xlsx(file_name):
+    return file_name.lower().endswith('.xlsx')
+
+
+def _header_names(cells):
+    # Match pandas' naming for blank header cells
+    return [str(value) if value is not None else f'Unnamed: {i}' for i, value in enumerate(cells)]
+
+
+def _open_sheet(file, sheet_name=None):
+    from openpyxl import load_workbook
+    # read_only streams rows from the sheet XML instead of building the whole workbook
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    return workbook, workbook[sheet_name] if sheet_name is not None else workbook.worksheets[0]
+
+
+def sheet_names(file):
+    """Return the sheet names of a workbook path or file object, in workbook order"""
+    name = getattr(file, 'name', str(file))
+    if hasattr(file, 'seek'):
+        file.seek(0)
+    try:
+        if is_xlsx(name):
+            from openpyxl import load_workbook
+            workbook = load_workbook(file, read_only=True)
+            try:
+                return workbook.sheetnames
+            finally:
+                workbook.close()
+        return pd.ExcelFile(file).sheet_names
+    finally:
+        if hasattr(file, 'seek'):
+            file.seek(0)
+
+
+def read_header(file, sheet_name=None):
+    """Return the column names of a path or file object (first sheet by default) without parsing its data rows"""
+    name = getattr(file, 'name', str(file))
+    if hasattr(file, 'seek'):
+        file.seek(0)
+    try:
+        if is_csv(name):
+            return list(pd.read_csv(file, nrows=0).columns)
+        if is_xlsx(name):
+            workbook, sheet = _open_sheet(file, sheet_name)
+            try:
+                first_row = next(sheet.iter_rows(max_row=1, values_only=True), ())
+                return _header_names(first_row)
+            finally:
+                workbook.close()
+        return list(pd.read_excel(file, sheet_name=sheet_name or 0, nrows=0).columns)
+    finally:
+        if hasattr(file, 'seek'):
+            file.seek(0)
+
+
+def count_rows(path, sheet_name=None):
+    """Count data rows in a stored upload, used for progress and ETA"""
+    if is_csv(str(path)):
+        newlines = 0
+        last_byte = b'\n'
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                newlines += block.count(b'\n')
+                last_byte = block[-1:]
+        if last_byte != b'\n':
+            newlines += 1
+        return max(newlines - 1, 0)  # minus header
+    if is_xlsx(str(path)):
+        workbook, sheet = _open_sheet(path, sheet_name)
+        try:
+            # max_row comes from the sheet's <dimension> tag when the writer recorded one
+            if sheet.max_row is not None:
+                return max(sheet.max_row - 1, 0)
+            return sum(1 for _ in sheet.iter_rows(min_row=2, values_only=True))
+        finally:
+            workbook.close()
+    return pd.read_excel(path, sheet_name=sheet_name or 0, usecols=[0]).shape[0]
+
+
+def _next_size(chunk_size, budget):
+    return budget.next_chunk_size() if budget else chunk_size
+
+
+def iter_xlsx_chunks(path, chunk_size, start_row=0, budget=None, sheet_name=None):
+    """Stream an xlsx sheet once and yield (start_row, DataFrame) chunks under the canonical headers"""
+    workbook, sheet = _open_sheet(path, sheet_name)
+    try:
+        rows = sheet.iter_rows(values_only=True)
+        schema = import_schema()
+        header = schema.canonical_names(_header_names(next(rows, ())))
+        width = len(header)
+        categories = {column.header: 'category' for column in schema.columns if column.category and column.header in header}
+        # Fully blank rows (e.g. formatted but empty trailing rows) carry no data; the
+        # rest keep their position in the sheet so row numbers in reports stay correct
+        rows = (
+            (offset, row[:width]) for offset, row in enumerate(rows)
+            if any(value is not None for value in row)
+        )
+        if start_row:
+            rows = islice(rows, start_row, None)
+        while True:
+            batch = list(islice(rows, _next_size(chunk_size, budget)))
+            if not batch:
+                break
+            offsets, values = zip(*batch)
+            df = pd.DataFrame.from_records(list(values), columns=header).astype(categories)
+            df.index = pd.Index(offsets)
+            yield start_row, df
+            start_row += len(df)
+    finally:
+        workbook.close()
+
+
+def iter_csv_chunks(path, chunk_size, start_row=0, budget=None):
+    names = read_header(path)
+    columns = import_schema().canonical_names(names)
+    numeric_as_text = False
+    while True:
+        # Skipped data rows are dropped by the parser; the header (line 0) is kept
+        skiprows = range(1, start_row + 1) if start_row else None
+        with pd.read_csv(path, iterator=True, skiprows=skiprows, dtype=read_dtypes(names, numeric_as_text),
+                         dtype_backend='numpy_nullable') as reader:
+            while True:
+                try:
+                    chunk = reader.get_chunk(_next_size(chunk_size, budget))
+                except StopIteration:
+                    return
+                except ValueError as e:
+                    if numeric_as_text:
+                        raise
+                    # Reopen at the same row with numeric columns as text for the rest of the file
+                    logger.info(f"Non-numeric values in numeric columns after row {start_row}, reading them as text: {str(e)}")
+                    numeric_as_text = True
+                    break
+                # Keep the file's row offsets so invalid-value row numbers stay correct
+                chunk.index = pd.RangeIndex(start_row, start_row + len(chunk))
+                chunk.columns = columns
+                yield start_row, chunk
+                start_row += len(chunk)
+
+
+def iter_xls_chunks(path, chunk_size, start_row=0, budget=None, sheet_name=None):
+    # Legacy .xls has no streaming reader, so parse the sheet once and slice it
+    df = pd.read_excel(path, sheet_name=sheet_name or 0, dtype_backend='numpy_nullable')
+    df.columns = import_schema().canonical_names(df.columns)
+    while start_row < len(df):
+        size = _next_size(chunk_size, budget)
+        yield start_row, df.iloc[start_row:start_row + size]
+        start_row += size
+
+
+def read_chunks(path, chunk_size, start_row=0, budget=None, sheet_name=None):
+    """Yield (start_row, DataFrame) chunks of a stored upload from its start_row-th data row.
+
+    Columns are renamed to the canonical headers they match in the import schema.
+    With a MemoryBudget, each chunk's size is taken from the budget (at most chunk_size).
+    Workbooks are read from sheet_name, or their first sheet; CSVs ignore it.
+    """
+    if is_csv(str(path)):
+        return iter_csv_chunks(path, chunk_size, start_row, budget)
+    if is_xlsx(str(path)):
+        return iter_xlsx_chunks(path, chunk_size, start_row, budget, sheet_name)
+    return iter_xls_chunks(path, chunk_size, start_row, budget, sheet_name)
@@ -0,0 +1,297 @@
+from django.db import connections, transaction
+from django.db.models import Count, F, Sum, Value
+from django.db.models.functions import Coalesce, TruncMonth
+from .models import ArchivedDaily, SalesFact, SalesRollup, SalesDaily, SalesMonthly
+from .preprocess import units_text
+from .querycache import bump_generation
+from .schema import import_schema
+from .writers import FIELD_MAP, column_values
+from decimal import Decimal
+import pandas as pd
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Excel header -> rollup field, for group-bys over preprocessed chunks
+DIMENSION_HEADERS = {import_schema().header(field): field for field in SalesRollup.DIMENSIONS}
+MEASURE_HEADERS = {import_schema().header(field): field for field in SalesRollup.MEASURES}
+# Amount measure -> decimal places of the int64 units preprocessing leaves in its column
+MEASURE_PLACES = {
+    column.field: column.decimal_places for column in import_schema().of_kind('decimal') if column.field in SalesRollup.MEASURES
+}
+VOUCHER_DATE = import_schema().header('voucher_date')
+KEY_HEADERS = [import_schema().header(field) for field in SalesFact.NATURAL_KEY]
+
+GRAINS = {'daily': SalesDaily, 'monthly': SalesMonthly}
+
+
+def chunk_days(df):
+    """Return the distinct voucher dates of a preprocessed chunk as ISO strings"""
+    days = pd.to_datetime(df[VOUCHER_DATE], errors='coerce').dropna()
+    return set(days.dt.strftime('%Y-%m-%d').unique())
+
+
+def chunk_rollups(df):
+    """Group a preprocessed chunk into (daily, monthly) DataFrames of rollup deltas.
+
+    Rows without a voucher date are left out of the rollups. Amounts are summed as the
+    int64 units preprocessing converts them to, so the deltas are exact.
+    """
+    frame = pd.DataFrame({'day': pd.to_datetime(df[VOUCHER_DATE], errors='coerce')}, index=df.index)
+    for header, field in DIMENSION_HEADERS.items():
+        frame[field] = df[header].astype(object).where(df[header].notna(), '') if header in df.columns else ''
+    for header, field in MEASURE_HEADERS.items():
+        frame[field] = pd.to_numeric(df[header], errors='coerce').fillna(0) if header in df.columns else 0
+    frame = frame[frame['day'].notna()]
+    frame['row_count'] = 1
+
+    dimensions = list(DIMENSION_HEADERS.values())
+    measures = ['row_count'] + list(MEASURE_HEADERS.values())
+    daily = frame.groupby(['day'] + dimensions, sort=False)[measures].sum().reset_index()
+    # Months roll up from the (much smaller) daily groups
+    daily['month'] = daily['day'].dt.to_period('M').dt.to_timestamp()
+    monthly = daily.groupby(['month'] + dimensions, sort=False)[measures].sum().reset_index()
+    return daily.drop(columns='month'), monthly
+
+
+def add_rollups(model, frame, using='default'):
+    """Add grouped deltas to a rollup table, inserting new grain rows and summing into existing ones"""
+    if frame.empty:
+        return
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    grain = [model.PERIOD] + model.DIMENSIONS
+    measures = ['row_count'] + model.MEASURES
+    frame = frame.assign(**{model.PERIOD: frame[model.PERIOD].dt.date})
+    rows = list(zip(*[
+        units_text(frame[field].to_numpy(), MEASURE_PLACES[field]) if field in MEASURE_PLACES else column_values(frame, field)
+        for field in grain + measures
+    ]))
+
+    table = quote(model._meta.db_table)
+    grain_columns = [quote(model._meta.get_field(field).column) for field in grain]
+    measure_columns = [quote(model._meta.get_field(field).column) for field in measures]
+    columns = grain_columns + measure_columns
+    row_placeholder = '(' + ', '.join(['%s'] * len(columns)) + ')'
+
+    if connection.vendor not in ('sqlite', 'postgresql', 'microsoft'):
+        for row in rows:
+            values = {field: Decimal(value) if field in MEASURE_PLACES else value for field, value in zip(grain + measures, row)}
+            keys = {field: values.pop(field) for field in grain}
+            obj, created = model.objects.using(using).select_for_update().get_or_create(**keys, defaults=values)
+            if not created:
+                model.objects.using(using).filter(pk=obj.pk).update(**{field: F(field) + value for field, value in values.items()})
+        return
+
+    # SQL Server caps a statement at 2100 parameters
+    max_params = 2000 if connection.vendor == 'microsoft' else (connection.features.max_query_params or 65535)
+    batch_size = max(1, min(1000, max_params // len(columns)))
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            values_sql = ', '.join([row_placeholder] * len(batch))
+            if connection.vendor == 'microsoft':
+                sql = (
+                    f"MERGE {table} WITH (HOLDLOCK) AS target USING (VALUES {values_sql}) AS source ({', '.join(columns)}) "
+                    f"ON {' AND '.join(f'target.{column} = source.{column}' for column in grain_columns)} "
+                    f"WHEN MATCHED THEN UPDATE SET {', '.join(f'target.{column} = target.{column} + source.{column}' for column in measure_columns)} "
+                    f"WHEN NOT MATCHED THEN INSERT ({', '.join(columns)}) VALUES ({', '.join(f'source.{column}' for column in columns)});"
+                )
+            else:
+                sql = (
+                    f"INSERT INTO {table} ({', '.join(columns)}) VALUES {values_sql} "
+                    f"ON CONFLICT ({', '.join(grain_columns)}) DO UPDATE SET "
+                    + ', '.join(f"{column} = {table}.{column} + excluded.{column}" for column in measure_columns)
+                )
+            cursor.execute(sql, [value for row in batch for value in row])
+
+
+def rows_frame(rows):
+    """The columns chunk_rollups reads, from fast-lane row tuples, with amounts as int64 units"""
+    columns = list(zip(*rows))
+    positions = {header: position for position, (header, _) in enumerate(FIELD_MAP)}
+    frame = pd.DataFrame({header: columns[positions[header]] for header in [VOUCHER_DATE, *DIMENSION_HEADERS, *MEASURE_HEADERS]})
+    for header, field in MEASURE_HEADERS.items():
+        if field in MEASURE_PLACES:
+            frame[header] = [int(value.scaleb(MEASURE_PLACES[field])) if value is not None else 0 for value in frame[header]]
+    return frame
+
+
+def key_frame(interned):
+    """The natural key columns of an interned chunk (DataFrame or fast-lane rows), as SalesFact stores them"""
+    if isinstance(interned, list):
+        columns = list(zip(*interned))
+        positions = {header: position for position, (header, _) in enumerate(FIELD_MAP)}
+        return pd.DataFrame({header: columns[positions[header]] for header in KEY_HEADERS})
+    return pd.DataFrame({header: interned[header] if header in interned.columns else None for header in KEY_HEADERS}, index=interned.index)
+
+
+def stored_lines(keys, using='default', batch_size=500):
+    """Return (key tuples, chunk_rollups frame) of the stored lines matching keyed chunk rows"""
+    days = {day for day in keys[VOUCHER_DATE]}
+    sales_ids = sorted({int(sales_id) for sales_id in keys[import_schema().header('sales_id')]})
+    fields = {import_schema().header(field): field for field in SalesFact.NATURAL_KEY}
+    # Only the grouped keys are joined to their text, as in rebuild_rollups
+    dimensions = {f'rollup_{field}': Coalesce(f'{field}__value', Value('')) for field in SalesRollup.DIMENSIONS}
+    lines = []
+    for start in range(0, len(sales_ids), batch_size):
+        lines += SalesFact.objects.using(using).filter(
+            voucher_date__in=days, sales_id__in=sales_ids[start:start + batch_size],
+        ).values(*fields.values(), *SalesRollup.MEASURES, **dimensions)
+    wanted = set(keys.itertuples(index=False, name=None))
+    matched = [line for line in lines if tuple(line[fields[header]] for header in KEY_HEADERS) in wanted]
+    frame = pd.DataFrame({
+        VOUCHER_DATE: [line['voucher_date'] for line in matched],
+        **{header: [line[f'rollup_{field}'] for line in matched] for header, field in DIMENSION_HEADERS.items()},
+        **{
+            header: [int(Decimal(line[field] or 0).scaleb(MEASURE_PLACES[field])) if field in MEASURE_PLACES else line[field] or 0 for line in matched]
+            for header, field in MEASURE_HEADERS.items()
+        },
+    })
+    return {tuple(line[fields[header]] for header in KEY_HEADERS) for line in matched}, frame
+
+
+def apply_chunk_rollups(df, interned, dedup_mode='insert', using='default'):
+    """Fold a chunk about to be written to SalesFact into the daily and monthly rollups.
+
+    df holds the chunk's text (a preprocessed DataFrame or fast-lane rows), interned the
+    same rows as written. Upserts keep one row per natural key as the writers do: 'update'
+    subtracts the stored lines it overwrites, and 'skip' leaves out rows already stored.
+    Runs in the chunk's transaction, before the write replaces the stored values.
+    """
+    frame = rows_frame(df) if isinstance(df, list) else df
+    replaced = None  # Stored lines the chunk overwrites
+    if dedup_mode != 'insert':
+        keys = key_frame(interned).set_axis(frame.index)
+        keyed = keys.notna().all(axis=1)
+        repeated = keys.duplicated(keep='last' if dedup_mode == 'update' else 'first') & keyed
+        frame, keys, keyed = frame[~repeated], keys[~repeated], keyed[~repeated]
+        stored_keys, stored = stored_lines(keys[keyed], using) if keyed.any() else (set(), None)
+        if dedup_mode == 'skip':
+            frame = frame[[key not in stored_keys for key in keys.itertuples(index=False, name=None)]]
+        elif stored_keys:
+            replaced = stored
+    daily, monthly = chunk_rollups(frame)
+    if replaced is not None:
+        replaced_daily, replaced_monthly = chunk_rollups(replaced)
+        daily, monthly = subtract_rollups(daily, replaced_daily, 'day'), subtract_rollups(monthly, replaced_monthly, 'month')
+    add_rollups(SalesDaily, daily, using)
+    add_rollups(SalesMonthly, monthly, using)
+    if replaced is not None:
+        # Groups whose every line was overwritten by a line of another group
+        for model, groups in ((SalesDaily, daily), (SalesMonthly, monthly)):
+            periods = groups[model.PERIOD].dt.date.unique().tolist()
+            model.objects.using(using).filter(**{f'{model.PERIOD}__in': periods}, row_count=0).delete()
+    logger.info(f"Added {len(daily)} daily and {len(monthly)} monthly rollup groups")
+
+
+def subtract_rollups(added, removed, period):
+    """Net grouped deltas: added minus removed, one row per group"""
+    measures = ['row_count'] + list(MEASURE_HEADERS.values())
+    removed = removed.assign(**{measure: -removed[measure] for measure in measures})
+    net = pd.concat([added, removed], ignore_index=True)
+    return net.groupby([period] + list(DIMENSION_HEADERS.values()), sort=False)[measures].sum().reset_index()
+
+
+def daily_groups(lines):
+    """Group a SalesFact queryset by voucher date and rollup dimensions into rollup totals"""
+    # Only the grouped keys are joined to their text, not every column the ExcelData view joins
+    dimensions = {f'rollup_{field}': Coalesce(f'{field}__value', Value('')) for field in SalesRollup.DIMENSIONS}
+    totals = {f'total_{field}': Sum(field, default=0) for field in SalesRollup.MEASURES}
+    return lines.values('voucher_date', **dimensions).annotate(rollup_row_count=Count('id'), **totals).order_by()
+
+
+def archive_rollups(lines, using='default'):
+    """Add the daily totals of sales lines about to be archived to ArchivedDaily"""
+    groups = list(daily_groups(lines))
+    frame = pd.DataFrame({
+        'day': pd.to_datetime([group['voucher_date'] for group in groups]),
+        **{field: [group[f'rollup_{field}'] for group in groups] for field in SalesRollup.DIMENSIONS},
+        'row_count': [group['rollup_row_count'] for group in groups],
+        **{
+            field: [int(Decimal(group[f'total_{field}']).scaleb(MEASURE_PLACES[field])) if field in MEASURE_PLACES else group[f'total_{field}'] for group in groups]
+            for field in SalesRollup.MEASURES
+        },
+    })
+    add_rollups(ArchivedDaily, frame, using)
+
+
+def rebuild_rollups(days, using='default', batch_size=500):
+    """Recompute the daily rollups of the given voucher dates, then the months they fall in.
+
+    A day's rollups are the totals of its lines in SalesFact plus those archive_month
+    moved out (ArchivedDaily). Used after staged imports, whose rows reach SalesFact in
+    one swap rather than chunk by chunk.
+    """
+    days = sorted(set(days))
+    if not days:
+        return
+    with transaction.atomic(using=using):
+        for start in range(0, len(days), batch_size):
+            batch = days[start:start + batch_size]
+            SalesDaily.objects.using(using).filter(day__in=batch).delete()
+            rollups = {}
+            for group in daily_groups(SalesFact.objects.using(using).filter(voucher_date__in=batch)):
+                rollup = _rollup_object(SalesDaily, group['voucher_date'], group)
+                rollups[_grain(rollup)] = rollup
+            for archived in ArchivedDaily.objects.using(using).filter(day__in=batch):
+                rollup = rollups.setdefault(_grain(archived), SalesDaily(day=archived.day, **{field: getattr(archived, field) for field in SalesRollup.DIMENSIONS}))
+                for field in ['row_count'] + SalesRollup.MEASURES:
+                    setattr(rollup, field, getattr(rollup, field) + getattr(archived, field))
+            SalesDaily.objects.using(using).bulk_create(list(rollups.values()), batch_size=1000)
+
+        # Months spanned by the rebuilt days are re-summed from the daily table
+        first_month, last_month = days[0][:7] + '-01', days[-1][:7] + '-01'
+        SalesMonthly.objects.using(using).filter(month__gte=first_month, month__lte=last_month).delete()
+        groups = (
+            SalesDaily.objects.using(using).filter(day__gte=first_month)
+            .annotate(rollup_month=TruncMonth('day')).filter(rollup_month__lte=last_month)
+            .values('rollup_month', **{f'rollup_{field}': F(field) for field in SalesRollup.DIMENSIONS})
+            .annotate(rollup_row_count=Sum('row_count'), **{f'total_{field}': Sum(field) for field in SalesRollup.MEASURES})
+            .order_by()
+        )
+        SalesMonthly.objects.using(using).bulk_create(
+            [_rollup_object(SalesMonthly, group['rollup_month'], group) for group in groups], batch_size=1000,
+        )
+        bump_generation(using)
+    logger.info(f"Rebuilt rollups for {len(days)} days from {days[0]} to {days[-1]}")
+
+
+def _grain(rollup):
+    return (rollup.day, *(getattr(rollup, field) for field in SalesRollup.DIMENSIONS))
+
+
+def _rollup_object(model, period, group):
+    return model(
+        **{model.PERIOD: period, 'row_count': group['rollup_row_count']},
+        **{field: group[f'rollup_{field}'] for field in model.DIMENSIONS},
+        **{field: group[f'total_{field}'] for field in model.MEASURES},
+    )
+
+
+def query_rollups(grain, filters, group_by):
+    """Sum a rollup table over the filters, grouped by 'period' and/or dimension fields"""
+    model = GRAINS[grain]
+    queryset = model.objects.all()
+    if 'date_from' in filters:
+        queryset = queryset.filter(**{f'{model.PERIOD}__gte': filters['date_from']})
+    if 'date_to' in filters:
+        queryset = queryset.filter(**{f'{model.PERIOD}__lte': filters['date_to']})
+    for field in model.DIMENSIONS:
+        if field in filters:
+            queryset = queryset.filter(**{field: filters[field]})
+    fields = [model.PERIOD if field == 'period' else field for field in group_by]
+    groups = (
+        queryset.values(*fields)
+        .annotate(total_row_count=Sum('row_count'), **{f'total_{field}': Sum(field) for field in model.MEASURES})
+        .order_by(*fields)
+    )
+    rows = []
+    for group in groups:
+        row = {('period' if field == model.PERIOD else field): group[field] for field in fields}
+        row['row_count'] = group['total_row_count']
+        for field in model.MEASURES:
+            value = group[f'total_{field}'] or 0
+            row[field] = float(value) if isinstance(value, Decimal) else value
+        rows.append(row)
+    return rows
@@ -0,0 +1,126 @@
+# Kept free of Django imports at module level so the compiled schema can be pickled to
+# spawned preprocessing workers
+from dataclasses import dataclass
+from functools import lru_cache
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+KINDS = ('text', 'integer', 'decimal', 'date')
+
+# Other spellings of a header seen in sales exports, by ExcelData field. Case, spacing
+# and underscores are ignored when matching, so only real spelling changes go here.
+HEADER_ALIASES = {
+    'sales_id': ['Sales ID'],
+    'realisable_amount': ['Realizable amount'],
+    'receive_amt': ['ReceiveAMT', 'Receive amount'],
+    'difference': ['Difference'],
+    'item_code': ['Item code'],
+    'tax_perc': ['Tax %', 'Tax percent'],
+    'free_qty': ['Free qty'],
+    'new_category': ['New category'],
+    'zone_mt': ['Zone MT'],
+}
+
+# Repetitive text fields read as categoricals: each chunk stores a small table of
+# distinct values plus integer codes instead of one Python string per cell
+CATEGORY_FIELDS = {
+    'voucher_type', 'state_name', 'zone', 'branch_name', 'route', 'category_name',
+    'payment_type', 'bill_type', 'salesman', 'rmode', 'group_name', 'item_code',
+    'kl_mt_outlets', 'tn_mt_outlets', 'new_category', 'new_sku', 'division',
+    'district_milk', 'district_dashboard', 'zone_mt',
+}
+
+
+def normalize_header(name):
+    """Matching key of a header: trimmed and case-folded, with runs of spaces and underscores as one space"""
+    return re.sub(r'[\s_]+', ' ', str(name)).strip().casefold()
+
+
+@dataclass(frozen=True)
+class Column:
+    header: str  # Canonical Excel header, the field's verbose_name
+    field: str
+    kind: str  # One of KINDS
+    max_digits: int = None
+    decimal_places: int = None
+    max_length: int = None
+    category: bool = False
+    aliases: tuple = ()
+
+
+class ImportSchema:
+    """The import columns in insert order, grouped by kind, with tolerant header matching"""
+
+    def __init__(self, columns):
+        self.columns = tuple(columns)
+        self.headers = [column.header for column in self.columns]
+        self.field_map = [(column.header, column.field) for column in self.columns]
+        self._by_kind = {kind: [column for column in self.columns if column.kind == kind] for kind in KINDS}
+        self._by_field = {column.field: column for column in self.columns}
+        self._lookup = {}
+        for column in self.columns:
+            for name in (column.header, *column.aliases):
+                matched = self._lookup.setdefault(normalize_header(name), column.header)
+                if matched != column.header:
+                    raise ValueError(f"Header {name!r} would match both {matched!r} and {column.header!r}")
+
+    def of_kind(self, kind):
+        return self._by_kind[kind]
+
+    def header(self, field):
+        return self._by_field[field].header
+
+    def resolve(self, names):
+        """Map a file's header names to the canonical headers they match.
+
+        Unknown names are left out; when several names match one column the first wins.
+        """
+        resolved = {}
+        for name in names:
+            header = self._lookup.get(normalize_header(name))
+            if header is not None and header not in resolved.values():
+                resolved[name] = header
+        return resolved
+
+    def canonical_names(self, names):
+        """Rename a file's columns to canonical headers, keeping columns the schema doesn't know"""
+        resolved = self.resolve(names)
+        return [resolved.get(name, name) for name in names]
+
+    def missing(self, names):
+        found = set(self.resolve(names).values())
+        return [header for header in self.headers if header not in found]
+
+    def positions(self, names):
+        """Index of each column in a file's header row, in insert order, or None where it is absent"""
+        index = {header: position for position, header in enumerate(self.canonical_names(names))}
+        return [index.get(header) for header in self.headers]
+
+
+@lru_cache(maxsize=None)
+def import_schema():
+    """Compile the import schema from the ExcelData model, once per process"""
+    from django.db import models
+    from .models import ExcelData
+
+    columns = []
+    for field in ExcelData._meta.concrete_fields:
+        if field.primary_key:
+            continue
+        if isinstance(field, models.DecimalField):
+            kind = 'decimal'
+        elif isinstance(field, models.IntegerField):
+            kind = 'integer'
+        elif isinstance(field, models.DateField):
+            kind = 'date'
+        else:
+            kind = 'text'
+        columns.append(Column(
+            header=str(field.verbose_name), field=field.name, kind=kind,
+            max_digits=getattr(field, 'max_digits', None), decimal_places=getattr(field, 'decimal_places', None),
+            max_length=field.max_length if kind == 'text' else None,
+            category=field.name in CATEGORY_FIELDS, aliases=tuple(HEADER_ALIASES.get(field.name, ())),
+        ))
+    return ImportSchema(columns)
@@ -0,0 +1,150 @@
+from django.db import connections, transaction
+from .models import SalesFact
+from .querycache import bump_generation
+from .writers import UPSERT_VENDORS, chunk_rows, insert_rows_columnar, quoted_columns, on_conflict_clause, merge_statement
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Extra stage column holding each row's offset in the file, so repeated keys resolve
+# to the same row the per-chunk upsert would keep
+STAGE_ROW = 'file_row'
+
+
+def stage_table_name(key):
+    return f"{SalesFact._meta.db_table}_stage_{key}"
+
+
+def stage_exists(table, using='default'):
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        return table in connection.introspection.table_names(cursor)
+
+
+def create_stage(table, using='default'):
+    """Create an empty, unindexed copy of SalesFact's import columns plus STAGE_ROW"""
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    columns = ', '.join(quoted_columns(connection))
+    source = quote(SalesFact._meta.db_table)
+    int_type = {'microsoft': 'int', 'mysql': 'SIGNED'}.get(connection.vendor, 'integer')
+    stage_row = f"CAST(0 AS {int_type}) AS {quote(STAGE_ROW)}"
+    with connection.cursor() as cursor:
+        if connection.vendor == 'microsoft':
+            cursor.execute(f"SELECT TOP 0 {columns}, {stage_row} INTO {quote(table)} FROM {source}")
+        else:
+            cursor.execute(f"CREATE TABLE {quote(table)} AS SELECT {columns}, {stage_row} FROM {source} WHERE 1 = 0")
+
+
+def drop_stage(table, using='default'):
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE {connection.ops.quote_name(table)}")
+
+
+def discard_stage(table, using='default'):
+    """Drop the stage table of a failed import, if it is still there"""
+    if stage_exists(table, using):
+        drop_stage(table, using)
+        logger.info(f"Dropped stage table {table} of a failed import")
+
+
+def stage_chunk(df, table, using='default'):
+    """Append a preprocessed chunk to the stage table and return timing stats like write_chunk"""
+    start_time = time.time()
+    connection = connections[using]
+    rows = [row + (offset,) for row, offset in zip(chunk_rows(df), df.index.tolist())]
+    build_seconds = time.time() - start_time
+    columns = quoted_columns(connection) + [connection.ops.quote_name(STAGE_ROW)]
+    insert_rows_columnar(rows, using, table=connection.ops.quote_name(table), columns=columns)
+    elapsed = time.time() - start_time
+    rows_per_sec = len(rows) / elapsed if elapsed > 0 else 0.0
+    logger.info(f"Staged {len(rows)} rows in {elapsed:.2f}s ({rows_per_sec:.0f} rows/sec)")
+    return {
+        'rows': len(rows), 'written': len(rows), 'method': 'staged', 'seconds': elapsed, 'rows_per_sec': rows_per_sec,
+        'timings': {'build': build_seconds, 'write': elapsed - build_seconds},
+    }
+
+
+def validate_stage(table, expected_rows, mode='update', using='default'):
+    """Check a loaded stage table with set-based queries and return its counts.
+
+    Raises ValueError when the table does not hold every row that was checkpointed, or
+    when an 'insert' would break SalesFact's natural key: rows already stored, or a key
+    repeated within the file.
+    """
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    stage = quote(table)
+    target = quote(SalesFact._meta.db_table)
+    keys = quoted_columns(connection, SalesFact.NATURAL_KEY)
+    blank_key = ' OR '.join(f"{key} IS NULL" for key in keys)
+    keyed = ' AND '.join(f"{key} IS NOT NULL" for key in keys)
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT COUNT(*), SUM(CASE WHEN {blank_key} THEN 1 ELSE 0 END) FROM {stage}")
+        rows, blank_keys = cursor.fetchone()
+        cursor.execute(
+            f"SELECT COUNT(*) FROM (SELECT {', '.join(keys)} FROM {stage} WHERE {keyed} "
+            f"GROUP BY {', '.join(keys)} HAVING COUNT(*) > 1) repeated"
+        )
+        repeated_keys = cursor.fetchone()[0]
+        cursor.execute(
+            f"SELECT COUNT(*) FROM {stage} s WHERE EXISTS (SELECT 1 FROM {target} t WHERE "
+            + ' AND '.join(f"t.{key} = s.{key}" for key in keys) + ")"
+        )
+        existing = cursor.fetchone()[0]
+    counts = {'rows': rows, 'blank_keys': blank_keys or 0, 'repeated_keys': repeated_keys, 'existing': existing}
+    logger.info(f"Stage table {table}: {counts}")
+    if rows != expected_rows:
+        raise ValueError(f"Stage table {table} holds {rows} rows, expected {expected_rows}")
+    if mode == 'insert' and (existing or repeated_keys):
+        raise ValueError(
+            f"Dedup mode 'insert' can't load this file: {existing} rows are already stored and "
+            f"{repeated_keys} natural keys repeat within it. Import it with 'update' or 'skip'."
+        )
+    return counts
+
+
+def swap_stage(table, mode='update', using='default'):
+    """Move a validated stage table into SalesFact in one statement and drop it.
+
+    The move and the drop commit together, so a resumed job finds either the full stage
+    table or none. Returns (rows written, seconds the move held SalesFact's locks).
+    """
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    stage = quote(table)
+    target = quote(SalesFact._meta.db_table)
+    columns = ', '.join(quoted_columns(connection))
+    keys = quoted_columns(connection, SalesFact.NATURAL_KEY)
+    if mode != 'insert' and connection.vendor not in UPSERT_VENDORS:
+        logger.warning(f"Dedup mode '{mode}' is not supported on {connection.vendor}, inserting rows as-is")
+        mode = 'insert'
+
+    if mode == 'insert':
+        source = f"SELECT {columns} FROM {stage}"
+    else:
+        # One row per natural key (the last one in the file for 'update', the first for
+        # 'skip'); rows with a blank key part are all kept
+        order = 'DESC' if mode == 'update' else 'ASC'
+        source = (
+            f"SELECT {columns} FROM (SELECT {columns}, ROW_NUMBER() OVER (PARTITION BY {', '.join(keys)} "
+            f"ORDER BY {quote(STAGE_ROW)} {order}) AS stage_rank FROM {stage}) ranked "
+            f"WHERE stage_rank = 1 OR " + ' OR '.join(f"{key} IS NULL" for key in keys)
+        )
+
+    start_time = time.time()
+    with transaction.atomic(using=using):
+        with connection.cursor() as cursor:
+            if mode != 'insert' and connection.vendor == 'microsoft':
+                cursor.execute(merge_statement(connection, f"({source})", mode))
+            else:
+                on_conflict = on_conflict_clause(connection, mode) if mode != 'insert' else ''
+                cursor.execute(f"INSERT INTO {target} ({columns}) {source}{on_conflict}")
+            written = cursor.rowcount
+        drop_stage(table, using)
+        bump_generation(using)
+    elapsed = time.time() - start_time
+    logger.info(f"Moved {written} rows from {table} into {SalesFact._meta.db_table} in {elapsed:.2f}s")
+    return written, elapsed
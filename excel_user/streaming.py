@@ -0,0 +1,273 @@
+"""Streamed uploads under ASGI.
+
+Django's ASGI handler reads a whole request body into a temporary file before any
+view runs. StreamingUploadApp takes POSTs to the upload_api URL before that happens:
+the body is handed chunk by chunk over a bounded queue to Django's multipart parser
+on a worker thread, which writes each file to the upload directory while hashing it
+and rejects a CSV whose header lacks import columns as soon as its first line arrives.
+The stored files are then queued exactly as upload_api does under WSGI.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.files.uploadhandler import FileUploadHandler
+from django.core.handlers.asgi import ASGIRequest
+from django.db import close_old_connections
+from django.http import JsonResponse, QueryDict
+from django.http.multipartparser import MultiPartParser, MultiPartParserError
+from django.middleware.csrf import CsrfViewMiddleware
+from django.urls import reverse
+from django.utils.datastructures import MultiValueDict
+from .jobs import MAX_UPLOAD_BYTES, UPLOAD_TYPES, upload_dir
+from .readers import is_csv
+from .schema import import_schema
+from .views import queue_stored_uploads, upload_api
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import asyncio
+import csv
+import hashlib
+import io
+import logging
+import queue
+import threading
+import uuid
+
+logger = logging.getLogger(__name__)
+
+BODY_QUEUE_CHUNKS = 16  # Body messages (typically 64KB each) buffered per upload
+HEADER_BYTES = 64 * 1024  # A CSV header row must end within this many bytes
+
+_parsers = None
+
+
+def parser_pool():
+    """Threads running the multipart parsers, shared by every streamed upload of the process"""
+    global _parsers
+    if _parsers is None:
+        _parsers = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'EXCEL_UPLOAD_STREAM_THREADS', 8), thread_name_prefix='upload-parser',
+        )
+    return _parsers
+
+
+class UploadRejected(Exception):
+    """An upload refused while it streams; answered with status and the message as JSON"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class BodyStream:
+    """File-like reader over request body chunks handed over by the event loop.
+
+    At most maxsize chunks wait in memory. While the parser is behind, put() stops
+    receiving from the client, so TCP flow control slows the upload instead of it
+    piling up in this process.
+    """
+
+    def __init__(self, loop, maxsize=BODY_QUEUE_CHUNKS):
+        self.loop = loop
+        self.chunks = queue.Queue(maxsize)
+        self.space = asyncio.Event()
+        self.stopped = threading.Event()  # Set once the parser stops reading
+        self.buffer = bytearray()
+        self.eof = False
+
+    async def put(self, chunk):
+        """Queue a chunk (None for the end of the body, an exception to abort); False if the parser has stopped"""
+        while not self.stopped.is_set():
+            try:
+                self.chunks.put_nowait(chunk)
+                return True
+            except queue.Full:
+                self.space.clear()
+            # The reader's wake-up is scheduled on this loop, so it can't fire between the clear and the wait
+            if not self.chunks.full():
+                continue
+            await self.space.wait()
+        return False
+
+    def _wake(self):
+        self.loop.call_soon_threadsafe(self.space.set)
+
+    def stop(self):
+        self.stopped.set()
+        self._wake()
+
+    def read(self, size=-1):
+        while not self.eof and (size < 0 or len(self.buffer) < size):
+            chunk = self.chunks.get()
+            self._wake()
+            if isinstance(chunk, Exception):
+                raise chunk
+            if chunk is None:
+                self.eof = True
+            else:
+                self.buffer += chunk
+        if size < 0:
+            size = len(self.buffer)
+        data = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        return data
+
+
+class StoredUploadHandler(FileUploadHandler):
+    """Writes each excel_file part straight to the upload directory, hashing it on the way.
+
+    A CSV's header row is checked against the import schema from its first bytes, so a
+    file without the import columns is refused before the rest of it is sent.
+    """
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.stored = []  # (file_name, path, sha256) of each completed file
+        self.file = None
+
+    def new_file(self, field_name, file_name, *args, **kwargs):
+        super().new_file(field_name, file_name, *args, **kwargs)
+        if field_name != 'excel_file':
+            return
+        if not file_name.endswith(UPLOAD_TYPES):
+            raise UploadRejected(400, 'Invalid file format. Please upload .xls, .xlsx, .csv or .zip files.')
+        self.path = upload_dir() / f"{uuid.uuid4().hex}_{Path(file_name).name}"
+        self.file = open(self.path, 'wb')
+        self.digest = hashlib.sha256()
+        self.size = 0
+        self.header = bytearray() if is_csv(file_name) else None
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.file is None or self.field_name != 'excel_file':
+            return None
+        self.size += len(raw_data)
+        if self.size > MAX_UPLOAD_BYTES:
+            raise UploadRejected(413, f'File is too large. Maximum size is {MAX_UPLOAD_BYTES // (1024 * 1024)}MB.')
+        self.digest.update(raw_data)
+        self.file.write(raw_data)
+        if self.header is not None:
+            self.check_header(raw_data)
+        return None
+
+    def check_header(self, raw_data):
+        self.header += raw_data
+        end = self.header.find(b'\n')
+        if end < 0 and len(self.header) < HEADER_BYTES:
+            return
+        line = bytes(self.header[:end] if end >= 0 else self.header).decode('utf-8-sig', errors='replace')
+        self.header = None
+        missing = import_schema().missing(next(csv.reader([line]), []))
+        if missing:
+            logger.info(f"Refused streamed upload {self.file_name}: missing columns {missing}")
+            raise UploadRejected(400, f'Missing required columns: {", ".join(missing)}')
+
+    def file_complete(self, file_size):
+        if self.file is None or self.field_name != 'excel_file':
+            return None
+        self.file.close()
+        self.file = None
+        self.stored.append((self.file_name, self.path, self.digest.hexdigest()))
+        logger.info(f"Streamed {self.file_name} ({file_size} bytes) to {self.path}")
+        return None
+
+    def discard(self):
+        """Delete everything this upload stored, including a partly written file"""
+        if self.file is not None:
+            self.file.close()
+            Path(self.path).unlink(missing_ok=True)
+        for _, path, _ in self.stored:
+            Path(path).unlink(missing_ok=True)
+        self.stored = []
+
+
+def parse_body(meta, stream, handler):
+    """Run Django's multipart parser over the streamed body and return the form fields"""
+    try:
+        post, _ = MultiPartParser(meta, stream, [handler], settings.DEFAULT_CHARSET).parse()
+        return post
+    finally:
+        stream.stop()
+
+
+def csrf_failure(request):
+    """Django's CSRF check for the streamed request; the token must come in the X-CSRFToken header.
+
+    The body isn't parsed yet, so a csrfmiddlewaretoken form field can't be read.
+    """
+    request._post, request._files = QueryDict(), MultiValueDict()
+    return CsrfViewMiddleware(lambda request: None).process_view(request, upload_api, (), {})
+
+
+def queue_stored(stored, options):
+    # Runs like a request on Django's sync thread, with the same connection cleanup
+    close_old_connections()
+    try:
+        return queue_stored_uploads(stored, options)
+    finally:
+        close_old_connections()
+
+
+async def send_response(send, response):
+    await send({
+        'type': 'http.response.start', 'status': response.status_code,
+        'headers': [(name.encode('latin-1'), value.encode('latin-1')) for name, value in response.items()],
+    })
+    await send({'type': 'http.response.body', 'body': response.content})
+
+
+async def stream_upload(scope, receive, send):
+    request = ASGIRequest(scope, io.BytesIO())
+    denied = await sync_to_async(csrf_failure)(request)
+    if denied is not None:
+        return await send_response(send, denied)
+    try:
+        content_length = int(request.META.get('CONTENT_LENGTH') or 0)
+    except ValueError:
+        content_length = 0
+    if content_length <= 0:
+        return await send_response(send, JsonResponse({'error': 'A Content-Length header is required'}, status=411))
+
+    loop = asyncio.get_running_loop()
+    stream = BodyStream(loop)
+    handler = StoredUploadHandler()
+    parsing = loop.run_in_executor(parser_pool(), parse_body, request.META, stream, handler)
+    try:
+        while not parsing.done():
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                await stream.put(UploadRejected(400, 'The upload was interrupted'))
+                break
+            if not await stream.put(message.get('body', b'')):
+                break
+            if not message.get('more_body', False):
+                await stream.put(None)
+                break
+        options = await parsing
+    except UploadRejected as e:
+        await asyncio.wait([parsing])
+        handler.discard()
+        return await send_response(send, JsonResponse({'error': str(e)}, status=e.status))
+    except MultiPartParserError as e:
+        handler.discard()
+        return await send_response(send, JsonResponse({'error': f'Malformed upload: {str(e)}'}, status=400))
+    except BaseException:
+        stream.stop()
+        handler.discard()
+        raise
+    response = await sync_to_async(queue_stored)(handler.stored, options)
+    await send_response(send, response)
+
+
+class StreamingUploadApp:
+    """ASGI application that streams POSTs to the upload_api URL and passes everything else to Django"""
+
+    def __init__(self, application):
+        self.application = application
+        self.path = None
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http' and scope['method'] == 'POST':
+            if self.path is None:
+                self.path = reverse('upload_api')
+            if scope['path'] == self.path:
+                return await stream_upload(scope, receive, send)
+        return await self.application(scope, receive, send)
@@ -0,0 +1,136 @@
+# Synthetic sales files laid out like THE_data_to_SQL.csv, for the import benchmarks
+from .schema import import_schema
+from datetime import date
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import logging
+
+logger = logging.getLogger(__name__)
+
+BLOCK_ROWS = 100000  # Rows generated and written at a time
+XLSX_MAX_ROWS = 1048575  # Excel's sheet limit, less the header row
+LINES_PER_VOUCHER = 4  # Average item lines per invoice
+
+# 'serial' writes Excel serial day numbers, 'mixed' cycles through several text formats
+DATE_FORMAT_CHOICES = ['%d-%m-%Y', '%d/%m/%Y', '%Y-%m-%d', '%d-%b-%Y', '%d-%m-%Y %H:%M:%S', 'serial', 'mixed']
+MIXED_DATE_FORMATS = ['%d-%m-%Y', '%d/%m/%Y', '%d-%b-%y']
+EXCEL_EPOCH = pd.Timestamp('1899-12-30')
+
+# Values written into dirty cells of numeric and date columns
+DIRTY_VALUES = ['N/A', '#VALUE!', '12,50', '-', 'abc', '1.2.3']
+
+MONEY_COLUMNS = [
+    'Taxable', 'CGST', 'SGST', 'IGST', 'VoucherAMT', 'Discount', 'Realisable amount',
+    'RecieveAMT', 'Differance', 'TotalAmt', 'FreeAmount', 'Rate', 'DiscAmount',
+]
+DATE_COLUMNS = ['CreatedDate', 'VoucherDate']
+
+# Distinct values per text column, roughly the cardinality seen in real exports
+TEXT_CARDINALITY = {
+    'Voucher Type': 2, 'state_name': 3, 'Zone': 8, 'Branch_name': 40, 'Route': 300,
+    'PartyName': 5000, 'CategoryName': 12, 'PaymentType': 5, 'Bill Type': 2, 'Salesman': 150,
+    'RMODE': 4, 'GroupName': 25, 'ItemCOde': 400, 'Helper 1': 5000, 'KL MT OUTLETS': 60,
+    'TN MT OUTLETS': 60, 'Category': 30, 'NEW SKU': 2, 'Division': 6, 'Customer name': 5000,
+    'District for milk': 40, 'District for Dashboard': 20, 'ZONE FOR MT': 6,
+}
+
+
+def _text_pool(column, size):
+    prefix = column.upper().replace(' ', '_')
+    return np.array([f'{prefix} {n:04d}' for n in range(size)], dtype=object)
+
+
+def _format_dates(days, date_format, offset):
+    """Render datetime64 values in the requested layout; offset is the block's first row"""
+    series = pd.Series(days)
+    if date_format == 'serial':
+        return ((series - EXCEL_EPOCH).dt.days).astype(object)
+    if date_format == 'mixed':
+        rendered = pd.Series(index=series.index, dtype=object)
+        which = (np.arange(len(series)) + offset) % len(MIXED_DATE_FORMATS)
+        for n, fmt in enumerate(MIXED_DATE_FORMATS):
+            rendered[which == n] = series[which == n].dt.strftime(fmt)
+        return rendered
+    return series.dt.strftime(date_format)
+
+
+def generate_block(rng, start, rows, pools, start_date, date_format, dirty_ratio):
+    """Build rows [start, start + rows) of the synthetic file as a DataFrame under the import headers"""
+    line = np.arange(start, start + rows)
+    voucher = line // LINES_PER_VOUCHER
+    data = {}
+    for column, pool in pools.items():
+        data[column] = pool[rng.integers(0, len(pool), rows)]
+    # Lines of one invoice share its header columns and get distinct items
+    data['ID'] = voucher + 1000000
+    data['VoucherNo'] = np.char.add('INV', voucher.astype(str)).astype(object)
+    item_pool = pools['ItemCOde']
+    data['ItemCOde'] = item_pool[(voucher * 7 + line % LINES_PER_VOUCHER) % len(item_pool)]
+
+    voucher_days = np.datetime64(start_date) + (voucher // 500).astype('timedelta64[D]')
+    data['VoucherDate'] = _format_dates(voucher_days, date_format, start).to_numpy()
+    data['CreatedDate'] = _format_dates(voucher_days - rng.integers(0, 30, rows).astype('timedelta64[D]'), date_format, start).to_numpy()
+
+    qty = rng.integers(1, 50, rows)
+    rate = rng.integers(500, 50000, rows) / 100
+    taxable = np.round(qty * rate, 2)
+    tax_perc = rng.choice([0, 5, 12, 18], rows)
+    half_tax = np.round(taxable * tax_perc / 200, 2)
+    money = {
+        'Rate': rate, 'Taxable': taxable, 'CGST': half_tax, 'SGST': half_tax, 'IGST': np.zeros(rows),
+        'TotalAmt': taxable, 'VoucherAMT': np.round(taxable + 2 * half_tax, 0), 'Discount': np.zeros(rows),
+        'FreeAmount': np.zeros(rows), 'DiscAmount': np.zeros(rows),
+    }
+    money['Realisable amount'] = money['VoucherAMT']
+    money['RecieveAMT'] = np.where(rng.random(rows) < 0.5, money['VoucherAMT'], 0.0)
+    money['Differance'] = money['VoucherAMT'] - money['RecieveAMT']
+    data.update(money)
+    data['TaxPerc'] = tax_perc
+    data['qty'] = qty
+    data['Freeqty'] = np.where(rng.random(rows) < 0.1, rng.integers(1, 5, rows), 0)
+
+    df = pd.DataFrame(data)[import_schema().headers]
+    if dirty_ratio > 0:
+        for column in MONEY_COLUMNS + ['TaxPerc', 'qty', 'Freeqty'] + DATE_COLUMNS:
+            dirty = rng.random(rows) < dirty_ratio
+            if dirty.any():
+                df[column] = df[column].astype(object)
+                df.loc[dirty, column] = rng.choice(DIRTY_VALUES, int(dirty.sum()))
+    return df
+
+
+def generate_sales_file(path, rows, dirty_ratio=0.0, date_format='%d-%m-%Y', seed=0, start_date=date(2024, 1, 1)):
+    """Write a reproducible synthetic sales file (.csv or .xlsx, from the suffix) and return its path.
+
+    The same rows, dirty_ratio, date_format and seed always produce the same file.
+    dirty_ratio is the share of numeric and date cells replaced with unparsable text.
+    """
+    path = Path(path)
+    is_xlsx = path.suffix.lower() == '.xlsx'
+    if is_xlsx and rows > XLSX_MAX_ROWS:
+        raise ValueError(f"An xlsx sheet holds at most {XLSX_MAX_ROWS} rows, got {rows}")
+    if date_format not in DATE_FORMAT_CHOICES and '%' not in date_format:
+        raise ValueError(f"Unknown date format: {date_format}")
+
+    rng = np.random.default_rng(seed)
+    pools = {column: _text_pool(column, size) for column, size in TEXT_CARDINALITY.items()}
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    if is_xlsx:
+        from openpyxl import Workbook
+
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet()
+        sheet.append(import_schema().headers)
+    for start in range(0, rows, BLOCK_ROWS):
+        block = generate_block(rng, start, min(BLOCK_ROWS, rows - start), pools, start_date, date_format, dirty_ratio)
+        if is_xlsx:
+            for row in block.itertuples(index=False):
+                sheet.append(list(row))
+        else:
+            block.to_csv(path, mode='w' if start == 0 else 'a', header=start == 0, index=False)
+        logger.info(f"Generated {start + len(block)} of {rows} rows for {path.name}")
+    if is_xlsx:
+        workbook.save(path)
+    return path
@@ -0,0 +1,9 @@
+from celery import shared_task
+from .jobs import run_import_job
+
+
+# acks_late + reject_on_worker_lost re-deliver the task if the worker dies mid-file;
+# run_import_job then resumes after the job's last committed chunk.
+@shared_task(acks_late=True, reject_on_worker_lost=True)
+def import_job_task(job_id):
+    run_import_job(job_id)
@@ -1,3 +1,751 @@
-from django.test import TestCase
+"""Import pipeline tests: python manage.py test excel_user --settings=excel_to_sql.test_settings"""
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.db import IntegrityError, connection
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
+from django.urls import reverse
+from .browse import filtered_rows, keyset_page
+from .delta import start_delta
+from .dimensions import DimensionCache
+from .export import export_batches, parquet_schema, parquet_stream
+from .ingest import missing_columns, run_import
+from .jobs import fail_job, upload_dir
+from .models import ArchivedDaily, ArchivedMonth, DimensionValue, ExcelData, ExcelDataArchive, ImportJob, ImportWatermark, SalesDaily, SalesFact, SalesMonthly
+from .partitions import add_months, create_partitions, is_partitioned, month_range
+from .querycache import bump_generation, cached_query, data_generation, query_cache
+from .rollups import rebuild_rollups
+from .schema import import_schema, normalize_header
+from .staging import create_stage, stage_table_name
+from .streaming import StreamingUploadApp
+from .synthetic import generate_sales_file
+from .validation import validate_file
+from .writers import FIELD_MAP
+from datetime import date
+from decimal import Decimal
+from io import BytesIO, StringIO
+from pathlib import Path
+import pandas as pd
+import pyarrow.parquet as pq
+import gzip
+import json
+import shutil
+import tempfile
+import zipfile
 
-# Create your tests here.
+SAMPLES = {
+    'THE_data_to_SQL.csv': 33,
+    'Sample data to sql server22.csv': 199,
+}
+FIELDS = [field for _, field in FIELD_MAP]
+
+
+def sample_path(name):
+    return Path(settings.BASE_DIR) / name
+
+
+def upload(path, name=None):
+    return SimpleUploadedFile(name or Path(path).name, Path(path).read_bytes())
+
+
+def stage_tables():
+    return [table for table in connection.introspection.table_names() if table.startswith(stage_table_name(''))]
+
+
+def stored_rows():
+    """Every sales line with its text values, as the ExcelData view shows it, in a stable order"""
+    return list(ExcelData.objects.order_by(*FIELDS, 'id').values_list(*FIELDS))
+
+
+class ImportTestCase(TestCase):
+    """Generated files and stored uploads shared by the tests of a class, in a temporary directory"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(cls.directory.cleanup)
+        # Stored uploads go away with the class's files
+        cls.enterClassContext(override_settings(EXCEL_IMPORT_UPLOAD_DIR=Path(cls.directory.name) / 'uploads'))
+
+    @classmethod
+    def generated(cls, name, rows, **options):
+        path = Path(cls.directory.name) / name
+        if not path.exists():
+            generate_sales_file(path, rows, **options)
+        return path
+
+    @classmethod
+    def edited_sample(cls, name, edit):
+        """Write a copy of the first bundled sample with edit(df) applied"""
+        df = pd.read_csv(sample_path('THE_data_to_SQL.csv'), dtype=str, keep_default_na=False)
+        edit(df)
+        path = Path(cls.directory.name) / name
+        df.to_csv(path, index=False)
+        return path
+
+    def setUp(self):
+        query_cache().clear()
+
+    def assertRollupsMatchSalesLines(self):
+        """The daily and monthly rollups hold the totals of the stored sales lines"""
+        def totals(queryset, period, rows):
+            return {
+                row[period]: (row['rows'], round(Decimal(row['taxable'] or 0), 2), row['qty'])
+                for row in queryset.values(period).annotate(rows=rows, taxable=Sum('taxable'), qty=Sum('qty'))
+            }
+
+        lines = SalesFact.objects.filter(voucher_date__isnull=False)
+        daily = totals(lines, 'voucher_date', Count('id'))
+        self.assertTrue(daily)
+        self.assertEqual(totals(SalesDaily.objects.all(), 'day', Sum('row_count')), daily)
+        monthly = totals(lines.annotate(month=TruncMonth('voucher_date')), 'month', Count('id'))
+        self.assertEqual(totals(SalesMonthly.objects.all(), 'month', Sum('row_count')), monthly)
+
+
+class SampleImportTests(ImportTestCase):
+    def test_bundled_samples_import_every_row(self):
+        for name, rows in SAMPLES.items():
+            with self.subTest(name):
+                SalesFact.objects.all().delete()
+                result = run_import(sample_path(name), dedup_mode='insert')
+                self.assertEqual(result['rows'], rows)
+                self.assertEqual(result['rows_written'], rows)
+                self.assertEqual(SalesFact.objects.count(), rows)
+                # Each sample has blank CGST, SGST, IGST and Discount cells, stored as 0
+                self.assertEqual(set(result['invalid_report'].counts()), {'CGST', 'SGST', 'IGST', 'Discount'})
+
+    def test_amounts_are_stored_exactly(self):
+        def set_taxable(df):
+            df.loc[:2, 'Taxable'] = ['0.015', '1234.565', '-0.125']
+
+        path = self.edited_sample('amounts.csv', set_taxable)
+        run_import(path, dedup_mode='insert', fast_lane=False)
+        first = ExcelData.objects.order_by('id').values_list('taxable', flat=True)[:3]
+        # Half to even on the first digit cut off, as the fast lane's Decimal.quantize rounds
+        self.assertEqual(list(first), [Decimal('0.02'), Decimal('1234.56'), Decimal('-0.12')])
+
+    def test_reimport_by_dedup_mode(self):
+        run_import(sample_path('THE_data_to_SQL.csv'), dedup_mode='insert')
+        before = stored_rows()
+
+        def raise_taxable(df):
+            df.loc[0, 'Taxable'] = '99999.99'
+
+        changed = self.edited_sample('changed.csv', raise_taxable)
+        first = ExcelData.objects.order_by('id').first()
+
+        skipped = run_import(changed, dedup_mode='skip')
+        self.assertEqual(skipped['rows_written'], 0)
+        self.assertEqual(stored_rows(), before)
+        self.assertRollupsMatchSalesLines()
+
+        updated = run_import(changed, dedup_mode='update')
+        self.assertEqual(SalesFact.objects.count(), len(before))
+        self.assertGreater(updated['rows_written'], 0)
+        self.assertEqual(ExcelData.objects.get(pk=first.pk).taxable, Decimal('99999.99'))
+        self.assertRollupsMatchSalesLines()
+
+        with self.assertRaises(IntegrityError):
+            run_import(changed, dedup_mode='insert')
+        self.assertEqual(SalesFact.objects.count(), len(before))
+
+    def test_repeated_lines_within_a_file_keep_one_row(self):
+        def repeat_first_line(df):
+            df.loc[len(df)] = df.loc[0].copy()
+            df.loc[len(df) - 1, 'Taxable'] = '1.00'
+
+        path = self.edited_sample('repeated.csv', repeat_first_line)
+        line = pd.read_csv(path, dtype=str).iloc[0]
+        # 'update' keeps the last of the repeated lines, 'skip' the first
+        for mode, taxable in (('update', Decimal('1.00')), ('skip', Decimal(line['Taxable']))):
+            with self.subTest(mode):
+                for model in (SalesFact, SalesDaily, SalesMonthly):
+                    model.objects.all().delete()
+                result = run_import(path, dedup_mode=mode)
+                self.assertEqual(result['rows'], 34)
+                self.assertEqual(SalesFact.objects.count(), 33)
+                stored = ExcelData.objects.get(sales_id=int(line['ID']), voucher_no=line['VoucherNo'], item_code=line['ItemCOde'])
+                self.assertEqual(stored.taxable, taxable)
+                self.assertRollupsMatchSalesLines()
+
+
+class GeneratedImportTests(ImportTestCase):
+    def test_generated_files_import_every_row(self):
+        for name, options in (('clean.csv', {}), ('dirty.csv', {'dirty_ratio': 0.02, 'seed': 1})):
+            with self.subTest(name):
+                SalesFact.objects.all().delete()
+                result = run_import(self.generated(name, 6000, **options), chunk_size=2500)
+                self.assertEqual(result['rows'], 6000)
+                self.assertEqual(SalesFact.objects.count(), 6000)
+                self.assertEqual(bool(result['invalid_report']), 'dirty_ratio' in options)
+
+    def test_fast_lane_and_pandas_store_the_same_rows(self):
+        path = self.generated('clean.csv', 6000)
+        rows = {}
+        for fast_lane in (True, False):
+            SalesFact.objects.all().delete()
+            result = run_import(path, chunk_size=2500, dedup_mode='insert', staged=True, fast_lane=fast_lane)
+            self.assertEqual('fastlane.convert' in result['timings']['stages'], fast_lane)
+            rows[fast_lane] = stored_rows()
+        self.assertEqual(len(rows[True]), 6000)
+        self.assertEqual(rows[True], rows[False])
+
+    def test_fast_lane_writes_directly_unless_staged(self):
+        path = self.generated('clean.csv', 6000)
+        job = ImportJob.objects.create(file_name='clean.csv', file_path=str(path), dedup_mode='insert', chunk_size=2500)
+        result = run_import(path, job=job)
+        self.assertIn('fastlane.convert', result['timings']['stages'])
+        self.assertNotIn('swap', result['timings']['stages'])
+        self.assertEqual(result['rows_written'], 6000)
+        job.refresh_from_db()
+        self.assertFalse(job.staged)
+        expected = stored_rows()
+
+        # Upserts keep one row per natural key, as on the pandas path
+        result = run_import(path, chunk_size=2500, dedup_mode='update')
+        self.assertIn('fastlane.convert', result['timings']['stages'])
+        self.assertEqual(stored_rows(), expected)
+        self.assertRollupsMatchSalesLines()
+
+    def test_fast_lane_hands_a_dirty_chunk_to_pandas(self):
+        # The first rows pass the fast lane's probe; a value past them must still be reported
+        mixed = Path(self.directory.name) / 'mixed.csv'
+        df = pd.read_csv(self.generated('clean.csv', 6000), dtype=str, keep_default_na=False)
+        df.loc[4000, 'Taxable'] = 'n/a'
+        df.to_csv(mixed, index=False)
+
+        result = run_import(mixed, chunk_size=2500, dedup_mode='insert')
+        self.assertIn('fastlane.convert', result['timings']['stages'])
+        self.assertEqual(result['invalid_report'].counts(), {'Taxable': 1})
+        self.assertEqual(SalesFact.objects.count(), 6000)
+        fast_rows = stored_rows()
+        SalesFact.objects.all().delete()
+        run_import(mixed, chunk_size=2500, dedup_mode='insert', fast_lane=False)
+        self.assertEqual(stored_rows(), fast_rows)
+
+    def test_staged_import_swaps_the_stage_into_the_live_table(self):
+        path = self.generated('dirty.csv', 6000, dirty_ratio=0.02, seed=1)
+        direct = run_import(path, chunk_size=2500, dedup_mode='update', staged=False, fast_lane=False)
+        expected = stored_rows()
+        SalesFact.objects.all().delete()
+
+        staged = run_import(path, chunk_size=2500, dedup_mode='update', staged=True, fast_lane=False)
+        self.assertIn('swap', staged['timings']['stages'])
+        self.assertEqual(staged['rows_written'], direct['rows_written'])
+        self.assertEqual(stored_rows(), expected)
+        self.assertFalse(stage_tables())
+
+    def test_staged_insert_of_stored_rows_is_refused_and_the_stage_dropped(self):
+        path = self.generated('clean.csv', 6000)
+        run_import(path, chunk_size=2500, dedup_mode='insert', staged=True, fast_lane=False)
+        with self.assertRaisesMessage(ValueError, '6000 rows are already stored'):
+            run_import(path, chunk_size=2500, dedup_mode='insert', staged=True, fast_lane=False)
+        self.assertFalse(stage_tables())
+        self.assertEqual(SalesFact.objects.count(), 6000)
+
+    def test_failed_job_drops_its_stage(self):
+        job = ImportJob.objects.create(file_name='clean.csv', file_path=str(self.generated('clean.csv', 6000)), staged=True)
+        create_stage(stage_table_name(job.pk))
+        fail_job(job, ValueError('Stopped'))
+        self.assertFalse(stage_tables())
+
+    def test_rollups_match_the_sales_lines(self):
+        # Each chunk's totals are added as it is written, less the stored lines an upsert overwrites
+        clean = self.generated('clean.csv', 6000)
+        run_import(clean, chunk_size=2500, dedup_mode='insert', fast_lane=False)
+        self.assertRollupsMatchSalesLines()
+        dirty = self.generated('dirty.csv', 6000, dirty_ratio=0.02, seed=1)
+        for dedup_mode, path in (('update', dirty), ('skip', clean), ('update', clean)):
+            with self.subTest(dedup_mode=dedup_mode, file=path.name):
+                job = ImportJob.objects.create(file_name=path.name, file_path=str(path), dedup_mode=dedup_mode, chunk_size=2500)
+                run_import(path, job=job)
+                self.assertIsNone(job.rollup_days)
+                self.assertRollupsMatchSalesLines()
+
+
+class QueryCacheTests(ImportTestCase):
+    def test_cached_query_until_the_generation_changes(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return len(calls)
+
+        self.assertEqual(cached_query('test', {'page': 1}, compute), 1)
+        self.assertEqual(cached_query('test', {'page': 1}, compute), 1)
+        self.assertEqual(cached_query('test', {'page': 2}, compute), 2)
+        bump_generation()
+        self.assertEqual(cached_query('test', {'page': 1}, compute), 3)
+
+    def test_import_invalidates_cached_queries(self):
+        generation = data_generation()
+        cached = cached_query('count', {}, SalesFact.objects.count)
+        run_import(sample_path('THE_data_to_SQL.csv'), dedup_mode='insert')
+        self.assertGreater(data_generation(), generation)
+        self.assertEqual(cached, 0)
+        self.assertEqual(cached_query('count', {}, SalesFact.objects.count), 33)
+
+
+class BrowseTests(ImportTestCase):
+    def setUp(self):
+        super().setUp()
+        run_import(self.generated('clean.csv', 6000), chunk_size=2500, dedup_mode='insert')
+
+    def test_keyset_pages_walk_every_row_once(self):
+        queryset = filtered_rows({})
+        ids, after = [], None
+        while True:
+            rows, has_previous, has_next = keyset_page(queryset, after=after, size=1000)
+            self.assertEqual(has_previous, after is not None)
+            ids += [row['id'] for row in rows]
+            if not has_next:
+                break
+            after = rows[-1]['id']
+        self.assertEqual(ids, sorted(SalesFact.objects.values_list('id', flat=True), reverse=True))
+
+        # Paging back from the last page gives the page before it
+        rows, has_previous, has_next = keyset_page(queryset, before=ids[5000], size=1000)
+        self.assertEqual([row['id'] for row in rows], ids[4000:5000])
+        self.assertTrue(has_previous)
+        self.assertTrue(has_next)
+
+    def test_filtered_page_and_count(self):
+        zone = ExcelData.objects.order_by('id').values_list('zone', flat=True).first()
+        params = {'zone': zone, 'date_from': '2024-01-02', 'date_to': '2024-01-02', 'after': 'x'}
+        response = self.client.get(reverse('view_excel_data'), params)
+        self.assertEqual(response.status_code, 200)
+
+        expected = ExcelData.objects.filter(zone=zone, voucher_date=date(2024, 1, 2))
+        self.assertEqual(response.context['total_count'], expected.count())
+        self.assertEqual(response.context['filters'], {'zone': zone, 'date_from': '2024-01-02', 'date_to': '2024-01-02'})
+        rows = response.context['rows']
+        self.assertEqual([row['id'] for row in rows], list(expected.order_by('-id').values_list('id', flat=True)[:len(rows)]))
+        self.assertEqual(response.context['has_previous'], False)
+
+
+class RollupApiTests(ImportTestCase):
+    def setUp(self):
+        super().setUp()
+        run_import(self.generated('clean.csv', 6000), chunk_size=2500, dedup_mode='insert')
+
+    def get(self, **params):
+        return self.client.get(reverse('sales_rollup'), params)
+
+    def test_monthly_totals(self):
+        body = self.get(grain='monthly').json()
+        self.assertEqual(body['group_by'], ['period'])
+        self.assertEqual(len(body['rows']), 1)
+        row = body['rows'][0]
+        self.assertEqual((row['period'], row['row_count']), ('2024-01-01', 6000))
+        self.assertEqual(row['qty'], SalesFact.objects.aggregate(qty=Sum('qty'))['qty'])
+
+    def test_daily_totals_by_zone_over_a_date_range(self):
+        body = self.get(grain='daily', group_by='period,zone', date_from='2024-01-02').json()
+        lines = ExcelData.objects.filter(voucher_date__gte=date(2024, 1, 2))
+        expected = [
+            {'period': row['voucher_date'].isoformat(), 'zone': row['zone'], 'row_count': row['rows'], 'qty': row['qty']}
+            for row in lines.values('voucher_date', 'zone').annotate(rows=Count('id'), qty=Sum('qty')).order_by('voucher_date', 'zone')
+        ]
+        self.assertEqual([{key: row[key] for key in ('period', 'zone', 'row_count', 'qty')} for row in body['rows']], expected)
+
+    def test_unknown_grain_or_group_is_refused(self):
+        self.assertEqual(self.get(grain='weekly').status_code, 400)
+        self.assertEqual(self.get(group_by='party_name').status_code, 400)
+
+
+class ExportTests(ImportTestCase):
+    def setUp(self):
+        super().setUp()
+        run_import(self.generated('clean.csv', 6000), chunk_size=2500, dedup_mode='insert')
+
+    def export(self, **params):
+        response = self.client.get(reverse('export_excel_data'), params)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content)
+
+    def test_csv_and_gzip_csv(self):
+        content = self.export(format='csv', date_from='2024-01-02', date_to='2024-01-02')
+        df = pd.read_csv(BytesIO(content), dtype=str, keep_default_na=False)
+        self.assertEqual(list(df.columns), [header for header, _ in FIELD_MAP])
+        self.assertEqual(len(df), 2000)
+        expected = ExcelData.objects.filter(voucher_date=date(2024, 1, 2)).aggregate(taxable=Sum('taxable'))['taxable']
+        self.assertEqual(sum(map(Decimal, df['Taxable'])), expected)
+
+        compressed = self.export(format='csv.gz', date_from='2024-01-02', date_to='2024-01-02')
+        self.assertEqual(gzip.decompress(compressed), content)
+
+    def test_parquet_keeps_the_column_types(self):
+        table = pq.read_table(BytesIO(self.export(format='parquet')))
+        self.assertEqual(table.schema, parquet_schema())
+        self.assertEqual(table.num_rows, 6000)
+        totals = SalesFact.objects.aggregate(taxable=Sum('taxable'), qty=Sum('qty'))
+        self.assertEqual(sum(table.column('Taxable').to_pylist()), totals['taxable'])
+        self.assertEqual(sum(table.column('qty').to_pylist()), totals['qty'])
+
+    def test_parquet_row_groups(self):
+        parts = parquet_stream(export_batches(filtered_rows({}), fetch_size=500), row_group_size=2500)
+        metadata = pq.ParquetFile(BytesIO(b''.join(parts))).metadata
+        self.assertEqual([metadata.row_group(index).num_rows for index in range(metadata.num_row_groups)], [2500, 2500, 1000])
+
+    def test_unknown_format_is_refused(self):
+        self.assertEqual(self.client.get(reverse('export_excel_data'), {'format': 'xlsx'}).status_code, 400)
+
+
+class SchemaTests(ImportTestCase):
+    def test_headers_match_despite_case_spacing_and_aliases(self):
+        schema = import_schema()
+        self.assertEqual(normalize_header('  ZONE_FOR   mt '), normalize_header('ZONE FOR MT'))
+        self.assertEqual(schema.resolve([' Freeqty ', 'item code', 'Tax %', 'Unknown']), {' Freeqty ': 'Freeqty', 'item code': 'ItemCOde', 'Tax %': 'TaxPerc'})
+        # The bundled samples pad ' Freeqty ' and 'ZONE FOR MT ' with spaces
+        for name in SAMPLES:
+            self.assertEqual(missing_columns(sample_path(name)), [])
+        self.assertEqual(schema.missing(schema.headers[1:]), schema.headers[:1])
+
+    def test_respelled_and_reordered_headers_import_the_same_rows(self):
+        path = self.generated('clean.csv', 3000)
+        run_import(path, dedup_mode='insert', fast_lane=False)
+        expected = stored_rows()
+        SalesFact.objects.all().delete()
+
+        respelled = Path(self.directory.name) / 'respelled.csv'
+        df = pd.read_csv(path, dtype=str, keep_default_na=False)
+        df = df.rename(columns={'ItemCOde': 'Item Code', 'Branch_name': 'BRANCH NAME', 'Freeqty': 'Free qty'})
+        df[list(reversed(df.columns))].to_csv(respelled, index=False)
+        for fast_lane in (True, False):
+            with self.subTest(fast_lane=fast_lane):
+                SalesFact.objects.all().delete()
+                run_import(respelled, dedup_mode='insert', fast_lane=fast_lane)
+                self.assertEqual(stored_rows(), expected)
+
+
+class ArchiveTests(ImportTestCase):
+    def setUp(self):
+        super().setUp()
+        # Two days at the end of January and one in February
+        run_import(self.generated('january.csv', 4000, start_date=date(2024, 1, 30)), dedup_mode='insert')
+        run_import(self.generated('february.csv', 2000, start_date=date(2024, 2, 1), seed=1), dedup_mode='insert')
+        self.january = list(ExcelData.objects.filter(voucher_date__lt='2024-02-01').order_by('id').values_list('id', *FIELDS))
+        self.daily = self.daily_rollups()
+
+    def daily_rollups(self, model=SalesDaily):
+        return sorted(model.objects.values_list('day', *model.DIMENSIONS, 'row_count', *model.MEASURES))
+
+    def test_month_helpers(self):
+        self.assertEqual(add_months(date(2024, 11, 1), 3), date(2025, 2, 1))
+        self.assertEqual(month_range(date(2023, 12, 1), date(2024, 2, 1)), [date(2023, 12, 1), date(2024, 1, 1), date(2024, 2, 1)])
+        # Only SQL Server tables are partitioned
+        self.assertFalse(is_partitioned())
+        self.assertEqual(create_partitions(), [])
+
+    def test_archive_to_table_keeps_ids_values_and_rollups(self):
+        call_command('archive_partitions', before='2024-02', stdout=StringIO())
+        self.assertEqual(SalesFact.objects.count(), 2000)
+        self.assertFalse(ExcelData.objects.filter(voucher_date__lt='2024-02-01').exists())
+        self.assertEqual(list(ExcelDataArchive.objects.order_by('id').values_list('id', *FIELDS)), self.january)
+        archived = ArchivedMonth.objects.get()
+        self.assertEqual((archived.month, archived.destination, archived.rows), (date(2024, 1, 1), 'table', 4000))
+
+        # The archived month's rollups survive a rebuild over its days
+        rebuild_rollups(['2024-01-30', '2024-01-31', '2024-02-01'])
+        self.assertEqual(self.daily_rollups(), self.daily)
+        self.assertEqual(SalesMonthly.objects.filter(month='2024-01-01').aggregate(rows=Sum('row_count'))['rows'], 4000)
+
+    def test_rebuild_adds_lines_imported_into_an_archived_month(self):
+        call_command('archive_partitions', before='2024-02', stdout=StringIO())
+        self.assertEqual(self.daily_rollups(ArchivedDaily), [rollup for rollup in self.daily if rollup[0] < date(2024, 2, 1)])
+        archived_taxable = SalesDaily.objects.filter(day__lt='2024-02-01').aggregate(total=Sum('taxable'))['total']
+
+        run_import(self.generated('late.csv', 500, start_date=date(2024, 1, 31), seed=2), dedup_mode='insert')
+        late_taxable = SalesFact.objects.filter(voucher_date__lt='2024-02-01').aggregate(total=Sum('taxable'))['total']
+        call_command('rebuild_rollups', stdout=StringIO())
+        january = SalesMonthly.objects.filter(month='2024-01-01').aggregate(rows=Sum('row_count'), taxable=Sum('taxable'))
+        self.assertEqual(january, {'rows': 4500, 'taxable': archived_taxable + late_taxable})
+        self.assertEqual(
+            [rollup for rollup in self.daily_rollups() if rollup[0] == date(2024, 1, 30)],
+            [rollup for rollup in self.daily if rollup[0] == date(2024, 1, 30)],
+        )
+
+    def test_archive_to_parquet_and_dry_run(self):
+        directory = Path(self.directory.name) / 'archive'
+        output = StringIO()
+        call_command('archive_partitions', before='2024-02', dry_run=True, stdout=output)
+        self.assertIn('2024-01: 4000 rows', output.getvalue())
+        self.assertEqual(SalesFact.objects.count(), 6000)
+
+        call_command('archive_partitions', before='2024-03', to='parquet', dir=str(directory), stdout=StringIO())
+        self.assertEqual(SalesFact.objects.count(), 0)
+        january = pq.read_table(directory / 'exceldata-2024-01.parquet')
+        self.assertEqual(january.num_rows, 4000)
+        self.assertEqual(pq.read_table(directory / 'exceldata-2024-02.parquet').num_rows, 2000)
+        self.assertEqual(sorted(path.name for path in directory.iterdir()), ['exceldata-2024-01.parquet', 'exceldata-2024-02.parquet'])
+        self.assertEqual(ArchivedMonth.objects.filter(destination='parquet').count(), 2)
+
+
+@override_settings(EXCEL_IMPORT_RUNNER='sync')
+class BatchImportTests(ImportTestCase):
+    def post(self, files, **fields):
+        self.client.post(reverse('index'), {'excel_file': files, 'dedup_mode': 'insert', **fields})
+        return ImportJob.objects.filter(is_batch=True).latest('pk')
+
+    def zipped(self, name, members):
+        buffer = BytesIO()
+        with zipfile.ZipFile(buffer, 'w') as archive:
+            for member, path in members.items():
+                archive.write(path, member)
+        return SimpleUploadedFile(name, buffer.getvalue())
+
+    def test_files_and_zip_members_import_as_parts_of_one_job(self):
+        no_zone = Path(self.directory.name) / 'no_zone.csv'
+        pd.read_csv(self.generated('january.csv', 1000), dtype=str).drop(columns='Zone').to_csv(no_zone, index=False)
+        members = {
+            'sales/february.csv': self.generated('february.csv', 3000, start_date=date(2024, 2, 1)),
+            'sales/no_zone.csv': no_zone,
+            '__MACOSX/._february.csv': self.generated('february.csv', 3000, start_date=date(2024, 2, 1)),
+        }
+        batch = self.post([upload(self.generated('january.csv', 1000)), self.zipped('sales.zip', members)])
+
+        parts = {part.file_name: part for part in batch.parts.all()}
+        self.assertEqual(sorted(parts), ['january.csv', 'sales.zip/sales/february.csv', 'sales.zip/sales/no_zone.csv'])
+        self.assertEqual(parts['sales.zip/sales/no_zone.csv'].status, ImportJob.STATUS_FAILED)
+        self.assertIn('Zone', parts['sales.zip/sales/no_zone.csv'].error)
+        self.assertEqual(batch.status, ImportJob.STATUS_DONE)
+        self.assertEqual(batch.rows_done, 4000)
+        self.assertEqual(SalesFact.objects.count(), 4000)
+        status = self.client.get(reverse('import_status', args=[batch.pk])).json()
+        self.assertEqual(len(status['parts']), 3)
+
+        # Parts already imported are skipped, so a repeated upload saves nothing
+        again = self.post([upload(self.generated('january.csv', 1000), 'again.csv'), upload(self.generated('january.csv', 1000))])
+        self.assertEqual({part.status for part in again.parts.all()}, {ImportJob.STATUS_SKIPPED})
+        self.assertEqual(again.status, ImportJob.STATUS_FAILED)
+        self.assertEqual(SalesFact.objects.count(), 4000)
+
+    def test_every_sheet_of_a_workbook(self):
+        path = Path(self.directory.name) / 'sheets.xlsx'
+        with pd.ExcelWriter(path) as writer:
+            for month, rows in ((1, 300), (2, 500)):
+                sheet = pd.read_csv(self.generated(f'sheet{month}.csv', rows, start_date=date(2024, month, 1)), dtype=str)
+                sheet.to_excel(writer, sheet_name=f'Month{month}', index=False)
+        batch = self.post([upload(path)], all_sheets='1')
+
+        parts = batch.parts.order_by('pk')
+        self.assertEqual([part.sheet_name for part in parts], ['Month1', 'Month2'])
+        self.assertEqual([part.rows_done for part in parts], [300, 500])
+        self.assertEqual(SalesFact.objects.count(), 800)
+
+
+@override_settings(EXCEL_IMPORT_RUNNER='sync')
+class UploadApiTests(ImportTestCase):
+    CSRF_TOKEN = 'a' * 32
+    BODY_CHUNK = 64 * 1024
+
+    def stream(self, files, token=CSRF_TOKEN):
+        """POST files to upload_api through StreamingUploadApp; returns (status, body, body chunks read, body chunks)"""
+        body = encode_multipart(BOUNDARY, {'excel_file': files, 'dedup_mode': 'insert'})
+        scope = {
+            'type': 'http', 'method': 'POST', 'path': reverse('upload_api'), 'query_string': b'',
+            'headers': [
+                (b'host', b'testserver'), (b'content-type', MULTIPART_CONTENT.encode()),
+                (b'content-length', str(len(body)).encode()),
+                (b'cookie', f'csrftoken={self.CSRF_TOKEN}'.encode()), (b'x-csrftoken', token.encode()),
+            ],
+        }
+        chunks = [body[start:start + self.BODY_CHUNK] for start in range(0, len(body), self.BODY_CHUNK)]
+        read, sent = [], []
+
+        async def receive():
+            read.append(chunks[len(read)])
+            return {'type': 'http.request', 'body': read[-1], 'more_body': len(read) < len(chunks)}
+
+        async def send(message):
+            sent.append(message)
+
+        async def django(scope, receive, send):
+            raise AssertionError('upload_api POSTs must not reach Django')
+
+        async_to_sync(StreamingUploadApp(django))(scope, receive, send)
+        return sent[0]['status'], sent[1]['body'], len(read), len(chunks)
+
+    def stored_uploads(self):
+        return set(upload_dir().iterdir())
+
+    def test_streamed_upload_is_stored_and_imported(self):
+        path = self.generated('clean.csv', 6000)
+        status, response, read, chunks = self.stream([upload(path)])
+        self.assertEqual(status, 202)
+        self.assertEqual(read, chunks)
+        job = ImportJob.objects.get(pk=json.loads(response)['id'])
+        self.assertEqual(job.status, ImportJob.STATUS_DONE)
+        self.assertEqual(Path(job.file_path).read_bytes(), path.read_bytes())
+        self.assertEqual(SalesFact.objects.count(), 6000)
+
+    def test_csv_without_import_columns_is_refused_from_its_header(self):
+        refused = Path(self.directory.name) / 'no_zone.csv'
+        pd.read_csv(self.generated('clean.csv', 6000), dtype=str).drop(columns='Zone').to_csv(refused, index=False)
+        before = self.stored_uploads()
+        status, response, read, chunks = self.stream([upload(refused)])
+        self.assertEqual(status, 400)
+        self.assertIn('Zone', json.loads(response)['error'])
+        # The rest of the body was never read, and the partly written file is gone
+        self.assertLess(read, chunks // 2)
+        self.assertEqual(self.stored_uploads(), before)
+        self.assertFalse(ImportJob.objects.exists())
+
+    def test_streamed_upload_needs_the_csrf_header(self):
+        status, _, read, _ = self.stream([upload(self.generated('clean.csv', 6000))], token='b' * 32)
+        self.assertEqual(status, 403)
+        self.assertEqual(read, 0)
+
+    def test_upload_api_under_wsgi(self):
+        response = self.client.post(reverse('upload_api'), {'excel_file': upload(self.generated('clean.csv', 6000)), 'dedup_mode': 'insert'})
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(ImportJob.objects.get(pk=response.json()['id']).status, ImportJob.STATUS_DONE)
+        self.assertEqual(SalesFact.objects.count(), 6000)
+        invalid = self.client.post(reverse('upload_api'), {'excel_file': SimpleUploadedFile('sales.txt', b'x')})
+        self.assertEqual(invalid.status_code, 400)
+
+
+class DimensionTests(ImportTestCase):
+    def test_values_differing_by_case_or_trailing_spaces_keep_their_own_keys(self):
+        cache = DimensionCache()
+        cache.add('zone', ['North', 'north', 'North ', 'North'])
+        keys = cache.keys['zone']
+        self.assertEqual(len({keys['North'], keys['north'], keys['North ']}), 3)
+        self.assertEqual(DimensionValue.objects.filter(field='zone').count(), 3)
+        # A new cache loads the same keys from the table
+        self.assertEqual(DimensionCache().keys['zone'], keys)
+
+    def test_import_stores_each_distinct_text_once(self):
+        def respell_zones(df):
+            df.loc[0, 'Zone'] = df.loc[0, 'Zone'].lower()
+            df.loc[1, 'Zone'] = df.loc[1, 'Zone'] + ' '
+
+        path = self.edited_sample('zones.csv', respell_zones)
+        source = pd.read_csv(path, dtype=str, keep_default_na=False)
+        run_import(path, dedup_mode='insert', fast_lane=False)
+
+        zones = list(ExcelData.objects.order_by('id').values_list('zone', flat=True))
+        self.assertEqual(zones, source['Zone'].replace('', None).tolist())
+        stored = DimensionValue.objects.filter(field='zone').values_list('value', flat=True)
+        self.assertEqual(sorted(stored), sorted(set(source['Zone']) - {''}))
+        # Sales lines carry integer keys, not the text
+        self.assertEqual(SalesFact.objects.values('zone').distinct().count(), len(stored))
+
+
+class ValidationTests(ImportTestCase):
+    def test_dry_run_reports_what_the_import_replaces(self):
+        path = self.generated('dirty.csv', 6000, dirty_ratio=0.02, seed=1)
+        report = validate_file(path, chunk_size=2500)
+        self.assertEqual(report['rows'], 6000)
+        self.assertFalse(report['ok'])
+        self.assertFalse(SalesFact.objects.exists())
+
+        result = run_import(path, chunk_size=2500, dedup_mode='insert', fast_lane=False)
+        counts = {column: entry['count'] for column, entry in report['invalid_report'].items()}
+        self.assertEqual(counts, result['invalid_report'].counts())
+
+    def test_values_too_large_to_store_are_reported_apart(self):
+        path = Path(self.directory.name) / 'oversized.csv'
+        source = pd.read_csv(self.generated('small.csv', 100), dtype=str)
+        source.loc[3, 'qty'] = str(2 ** 31)
+        source.loc[5, 'Zone'] = 'Z' * 201
+        source.to_csv(path, index=False)
+        report = validate_file(path)
+        self.assertFalse(report['ok'])
+        self.assertEqual(report['invalid_report'], {})
+        self.assertEqual({column: entry['count'] for column, entry in report['load_failures'].items()}, {'qty': 1, 'Zone': 1})
+        self.assertEqual((report['columns']['qty']['overflow'], report['columns']['Zone']['overflow']), (1, 1))
+
+        output = StringIO()
+        with self.assertRaises(CommandError):
+            call_command('import_sales', str(path), dry_run=True, stdout=output)
+        self.assertIn("values too large to store {'Zone': 1, 'qty': 1}", output.getvalue())
+        self.assertNotIn('values replaced', output.getvalue())
+
+    def test_clean_file_validates_ok(self):
+        report = validate_file(self.generated('clean.csv', 6000), chunk_size=2500)
+        self.assertTrue(report['ok'])
+        self.assertEqual(report['missing_columns'], [])
+        self.assertEqual(report['columns']['Taxable']['invalid'], 0)
+
+    def test_validate_upload_deletes_the_posted_file(self):
+        response = self.client.post(reverse('validate_upload'), {'excel_file': upload(self.generated('clean.csv', 6000))})
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertTrue(body['ok'])
+        self.assertEqual(body['files'][0]['rows'], 6000)
+        self.assertEqual(list(upload_dir().iterdir()), [])
+
+
+class ImportCommandTests(ImportTestCase):
+    def inbox(self):
+        inbox = Path(tempfile.mkdtemp(dir=self.directory.name))
+        shutil.copy(self.generated('january.csv', 1000), inbox / 'january.csv')
+        pd.read_csv(inbox / 'january.csv', dtype=str).drop(columns='Zone').to_csv(inbox / 'no_zone.csv', index=False)
+        return inbox
+
+    def test_watch_moves_files_by_outcome_and_fails_the_command(self):
+        inbox = self.inbox()
+        output = StringIO()
+        with self.assertRaisesMessage(CommandError, '1 file(s) failed to import'):
+            call_command('import_sales', watch=str(inbox), once=True, settle=0, dedup='insert', stdout=output)
+
+        self.assertEqual([path.name for path in (inbox / 'done').iterdir()], ['january.csv'])
+        self.assertEqual([path.name for path in (inbox / 'failed').iterdir()], ['no_zone.csv'])
+        self.assertEqual(list((inbox / 'processing').iterdir()), [])
+        self.assertEqual(SalesFact.objects.count(), 1000)
+        self.assertIn('1 done, 0 skipped, 1 failed', output.getvalue())
+
+    def test_watch_leaves_unsettled_files_in_the_inbox(self):
+        inbox = self.inbox()
+        call_command('import_sales', watch=str(inbox), once=True, settle=3600, stdout=StringIO())
+        self.assertEqual(sorted(path.name for path in inbox.iterdir() if path.is_file()), ['january.csv', 'no_zone.csv'])
+        self.assertFalse(SalesFact.objects.exists())
+
+    def test_files_import_in_place(self):
+        path = self.generated('january.csv', 1000)
+        call_command('import_sales', str(path), dedup='insert', stdout=StringIO())
+        self.assertTrue(path.exists())
+        self.assertEqual(SalesFact.objects.count(), 1000)
+        # A dry run of a dirty file writes nothing and fails
+        with self.assertRaises(CommandError):
+            call_command('import_sales', str(self.generated('dirty.csv', 1000, dirty_ratio=0.02, seed=1)), dry_run=True, stdout=StringIO())
+        self.assertEqual(SalesFact.objects.count(), 1000)
+
+
+class DeltaImportTests(ImportTestCase):
+    def test_import_loads_only_rows_above_the_watermark(self):
+        call_command('import_sales', str(self.generated('first.csv', 6000)), delta='feed', dedup='insert', stdout=StringIO())
+        watermark = ImportWatermark.objects.get(source='feed')
+        self.assertEqual((watermark.field, watermark.value), ('voucher_date', '2024-01-03'))
+
+        # The feed's next export repeats the first three days
+        call_command('import_sales', str(self.generated('cumulative.csv', 10000)), delta='feed', dedup='insert', stdout=StringIO())
+        part = ImportJob.objects.filter(is_batch=False).latest('pk')
+        self.assertEqual(part.delta['skipped'], 6000)
+        self.assertEqual(part.rows_done, 10000)
+        self.assertEqual(SalesFact.objects.count(), 10000)
+        watermark.refresh_from_db()
+        self.assertEqual(watermark.value, '2024-01-05')
+
+    def test_both_lanes_drop_the_same_rows(self):
+        path = self.generated('cumulative.csv', 10000)
+        rows = {}
+        for fast_lane in (True, False):
+            SalesFact.objects.all().delete()
+            delta = {**start_delta('feed'), 'after': '2024-01-03'}
+            result = run_import(path, chunk_size=2500, dedup_mode='insert', fast_lane=fast_lane, delta=delta)
+            self.assertEqual((result['delta']['skipped'], result['delta']['max']), (6000, '2024-01-05'))
+            rows[fast_lane] = stored_rows()
+        self.assertEqual(len(rows[True]), 4000)
+        self.assertEqual(rows[True], rows[False])
+
+    def test_source_keeps_its_field(self):
+        ImportWatermark.objects.create(source='feed', field='voucher_date', value='2024-01-03')
+        with self.assertRaises(ValueError):
+            start_delta('feed', 'created_date')
@@ -3,5 +3,14 @@ from . import views
 
 urlpatterns = [
     path('', views.index, name='index'),  # example view
-    path('view_excel_data',views.view_excel_data,name='view_excel_data')
+    path('view_excel_data',views.view_excel_data,name='view_excel_data'),
+    path('export_excel_data', views.export_excel_data, name='export_excel_data'),
+    path('upload/stream', views.upload_api, name='upload_api'),
+    path('upload/validate', views.validate_upload, name='validate_upload'),
+    path('import_status/<int:job_id>', views.import_status, name='import_status'),
+    path('import_report/<int:job_id>', views.import_report, name='import_report'),
+    path('import_timings/<int:job_id>', views.import_timings, name='import_timings'),
+    path('import_profile/<int:job_id>', views.import_profile, name='import_profile'),
+    path('metrics', views.metrics, name='metrics'),
+    path('api/sales_rollup', views.sales_rollup, name='sales_rollup'),
 ]
\ No newline at end of file
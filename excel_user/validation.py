@@ -0,0 +1,234 @@
+"""Dry-run validation of an upload: the import's reading and conversion checks without a database write"""
+from .ingest import CHUNK_SIZE
+from .models import ImportJob
+from .preprocess import BLANK_TEXT, InvalidValueReport, decimal_units, detect_date_formats, merge_stats, parse_dates
+from .readers import read_chunks, read_header
+from .schema import import_schema
+import logging
+import numpy as np
+import pandas as pd
+import time
+
+logger = logging.getLogger(__name__)
+
+DISTINCT_LIMIT = 10000  # Distinct values counted per column before the count is reported as a lower bound
+INTEGER_MAX = 2 ** 31 - 1  # IntegerField range
+RECENT_JOBS = 20  # Finished imports the insert rate is estimated from
+
+
+def blank_mask(series):
+    """Cells with no value: missing, or only whitespace in a text-typed column"""
+    mask = series.isna().to_numpy(dtype=bool, na_value=True)
+    if series.dtype == object or pd.api.types.is_string_dtype(series):
+        mask = mask | series.astype('string').str.strip().eq('').to_numpy(dtype=bool, na_value=False)
+    return mask
+
+
+class FileProfile:
+    """Per-column counts gathered over the chunks of one file.
+
+    nulls are blank cells (imported as 0 in number columns and NULL elsewhere), invalid
+    are values that don't convert to the column's kind, and overflow are values that
+    convert but don't fit the field (max_digits, the integer range or max_length).
+    Rows and samples of every value the import would replace are kept in an
+    InvalidValueReport: invalid values, decimals over max_digits and blank number
+    cells. Integers out of range and text over max_length are loaded as they are and
+    fail the write on a database that enforces the column, so they are kept apart
+    in load_failures.
+    """
+
+    def __init__(self, schema, distinct_limit=DISTINCT_LIMIT):
+        self.distinct_limit = distinct_limit
+        self.columns = {
+            column.header: {'kind': column.kind, 'nulls': 0, 'invalid': 0, 'overflow': 0, 'min': None, 'max': None}
+            for column in schema.columns
+        }
+        self.distinct = {column.header: set() for column in schema.columns}
+        self.report = InvalidValueReport()
+        self.load_failures = InvalidValueReport()
+
+    def count(self, column, nulls, invalid, overflow):
+        entry = self.columns[column]
+        entry['nulls'] += int(nulls.sum())
+        entry['invalid'] += int(invalid.sum())
+        entry['overflow'] += int(overflow.sum())
+
+    def record(self, df, column, mask, report=None):
+        """Keep the rows and sample values of a column's invalid or overflowing cells"""
+        if mask.any():
+            report = self.report if report is None else report
+            report.add(column, df.index.to_numpy()[mask] + 2, df[column][mask])  # +2 for 1-based indexing and header
+
+    def extend(self, column, low, high, values):
+        """Widen a column's value range and add to its distinct values"""
+        entry = self.columns[column]
+        if low is not None:
+            entry['min'] = low if entry['min'] is None else min(entry['min'], low)
+            entry['max'] = high if entry['max'] is None else max(entry['max'], high)
+        distinct = self.distinct[column]
+        if len(distinct) <= self.distinct_limit:
+            distinct.update(values)
+
+    def to_dict(self):
+        columns = {}
+        for column, entry in self.columns.items():
+            distinct = len(self.distinct[column])
+            columns[column] = {
+                **entry,
+                'min': entry['min'].isoformat() if hasattr(entry['min'], 'isoformat') else entry['min'],
+                'max': entry['max'].isoformat() if hasattr(entry['max'], 'isoformat') else entry['max'],
+                'distinct': min(distinct, self.distinct_limit),
+                'distinct_truncated': distinct > self.distinct_limit,
+            }
+        return columns
+
+
+def check_decimal(df, column, profile):
+    source = df[column.header]
+    nulls = blank_mask(source)
+    units, parsed, invalid_mask = decimal_units(source, column.max_digits, column.decimal_places)
+    overflow = invalid_mask & parsed
+    invalid = invalid_mask & ~parsed & ~nulls
+    profile.count(column.header, nulls, invalid, overflow)
+    # convert_decimal replaces blanks with 0 and reports them like invalid values
+    profile.record(df, column.header, invalid | overflow | nulls)
+    valid = units[~invalid_mask]
+    if len(valid):
+        scale = 10 ** column.decimal_places
+        profile.extend(column.header, int(valid.min()) / scale, int(valid.max()) / scale, np.unique(valid).tolist())
+
+
+def check_integer(df, column, profile):
+    source = df[column.header]
+    nulls = blank_mask(source)
+    numbers = pd.to_numeric(source, errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+    parsed = ~np.isnan(numbers)
+    with np.errstate(invalid='ignore'):
+        overflow = parsed & (np.abs(numbers) > INTEGER_MAX)
+    invalid = ~parsed & ~nulls
+    profile.count(column.header, nulls, invalid, overflow)
+    # convert_numeric replaces blanks with 0 and reports them like invalid values
+    profile.record(df, column.header, invalid | nulls)
+    profile.record(df, column.header, overflow, profile.load_failures)
+    valid = numbers[parsed & ~overflow]
+    if len(valid):
+        profile.extend(column.header, int(valid.min()), int(valid.max()), np.unique(valid).astype(np.int64).tolist())
+
+
+def check_text(df, column, profile):
+    source = df[column.header]
+    if isinstance(source.dtype, pd.CategoricalDtype):
+        # Check the distinct values once and spread the result over the codes
+        categories = source.cat.categories.astype(str)
+        codes = source.cat.codes.to_numpy()
+        present = codes >= 0
+        blank_values = categories.isin(BLANK_TEXT)
+        long_values = np.asarray(categories.str.len() > column.max_length) if column.max_length else np.zeros(len(categories), dtype=bool)
+        nulls = ~present
+        nulls[present] = blank_values[codes[present]]
+        overflow = np.zeros(len(codes), dtype=bool)
+        overflow[present] = long_values[codes[present]]
+        used = np.unique(codes[present])
+        values = categories[used][~blank_values[used]].tolist()
+    else:
+        text = source.astype('string')
+        nulls = text.isna().to_numpy(dtype=bool, na_value=True) | text.isin(BLANK_TEXT).to_numpy(dtype=bool, na_value=False)
+        overflow = ~nulls
+        if column.max_length:
+            overflow &= (text.str.len() > column.max_length).to_numpy(dtype=bool, na_value=False)
+        else:
+            overflow[:] = False
+        values = text[~nulls].unique().tolist()
+    profile.count(column.header, nulls, np.zeros(len(nulls), dtype=bool), overflow)
+    profile.record(df, column.header, overflow, profile.load_failures)
+    profile.extend(column.header, None, None, values)
+
+
+def check_date(df, column, profile, stats, date_format):
+    source = df[column.header]
+    nulls = blank_mask(source)
+    # parse_dates records unparsed values in the report itself
+    parsed = parse_dates(df, column.header, profile.report, stats, date_format)
+    invalid = parsed.isna().to_numpy() & ~nulls
+    profile.count(column.header, nulls, invalid, np.zeros(len(nulls), dtype=bool))
+    days = parsed.dropna()
+    if len(days):
+        profile.extend(column.header, days.min().date(), days.max().date(), days.dt.normalize().unique().tolist())
+
+
+def check_chunk(df, profile, stats, date_formats, schema):
+    """Run each column of a chunk through its conversion's checks, leaving the chunk as read"""
+    for column in schema.columns:
+        if column.header not in df.columns:
+            continue
+        if column.kind == 'decimal':
+            check_decimal(df, column, profile)
+        elif column.kind == 'integer':
+            check_integer(df, column, profile)
+        elif column.kind == 'date':
+            check_date(df, column, profile, stats, date_formats.get(column.header))
+        else:
+            check_text(df, column, profile)
+
+
+def estimate_import_seconds(rows, recent=RECENT_JOBS):
+    """(seconds, rows per second) the rows would take at the rate of recent finished imports, or (None, None)"""
+    jobs = ImportJob.objects.filter(
+        status=ImportJob.STATUS_DONE, is_batch=False, rows_done__gt=0, elapsed_seconds__gt=0, delta__isnull=True,
+    ).order_by('-pk').values_list('rows_done', 'elapsed_seconds')[:recent]
+    done_rows = sum(job_rows for job_rows, _ in jobs)
+    done_seconds = sum(seconds for _, seconds in jobs)
+    if not done_seconds:
+        return None, None
+    rate = done_rows / done_seconds
+    return rows / rate, rate
+
+
+def validate_file(path, chunk_size=CHUNK_SIZE, sheet_name=None, file_name=None):
+    """Read a file the way an import would and report what its conversions would find.
+
+    Chunks go through the readers and the vectorized parsing steps of preprocess_chunk,
+    but no values are converted to Python objects and nothing is written. Returns a
+    JSON-ready dict: header problems, per-column counts and value ranges, the report of
+    values the import would replace, the values that would fail its write and an
+    estimate of the import time. ok is true when every import column is present and no
+    value would be replaced or fail, blank number cells included.
+    """
+    start_time = time.time()
+    schema = import_schema()
+    names = read_header(path, sheet_name)
+    matched = schema.resolve(names)
+    missing = schema.missing(names)
+    profile = FileProfile(schema)
+    stats = {}
+    rows = 0
+    date_formats = None
+    for _, chunk in read_chunks(path, chunk_size, sheet_name=sheet_name):
+        if date_formats is None:
+            date_formats = detect_date_formats(chunk, [column.header for column in schema.of_kind('date')])
+        chunk_stats = {}
+        check_chunk(chunk, profile, chunk_stats, date_formats, schema)
+        merge_stats(stats, chunk_stats)
+        rows += len(chunk)
+    columns = profile.to_dict()
+    for header in missing:
+        del columns[header]
+    estimate, rate = estimate_import_seconds(rows)
+    seconds = time.time() - start_time
+    logger.info(f"Validated {rows} rows of {file_name or path} in {seconds:.2f} seconds")
+    return {
+        'file_name': file_name or str(path),
+        'sheet_name': sheet_name,
+        'rows': rows,
+        'ok': not missing and not profile.report and not profile.load_failures,
+        'missing_columns': missing,
+        'unknown_columns': [name for name in names if name not in matched],
+        'date_formats': date_formats or {},
+        'date_paths': stats.get('date_paths', {}),
+        'columns': columns,
+        'invalid_report': profile.report.to_dict(),
+        'load_failures': profile.load_failures.to_dict(),
+        'seconds': round(seconds, 3),
+        'estimated_import_seconds': round(estimate, 1) if estimate is not None else None,
+        'import_rows_per_sec': round(rate) if rate is not None else None,
+    }
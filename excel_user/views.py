@@ -1,336 +1,368 @@
-from django.shortcuts import render
-from django.db import transaction, IntegrityError
-from django.core.paginator import Paginator
-import pandas as pd
-from datetime import datetime, timedelta
-import numpy as np
-from .models import ExcelData
-import logging
-import os
+from django.shortcuts import render, get_object_or_404
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse, FileResponse, Http404
+from django.db.models import Sum
+from django.urls import reverse
+from django.conf import settings
+from django.utils.dateparse import parse_date
+from urllib.parse import urlencode
+from .models import ImportJob, SalesFact, SalesRollup
+from .ingest import missing_columns
+from .preprocess import InvalidValueReport
+from .browse import clean_filters, filtered_rows, keyset_page, approximate_count
+from .rollups import GRAINS, query_rollups
+from .querycache import cached_query
+from .export import EXPORT_FORMATS, export_stream
+from pathlib import Path
+import importlib.util
 import time
-import psutil
+from .delta import start_delta
+from .jobs import UPLOAD_TYPES, MAX_UPLOAD_BYTES, store_upload, create_job, enqueue_import, create_batch, create_stored_batch, extract_archive
+from .validation import validate_file
+import logging
 
 logger = logging.getLogger(__name__)
 
 def index(request):
     if request.method == 'POST':
         if 'excel_file' in request.FILES:
-            excel_file = request.FILES['excel_file']
-            logger.info(f"Received file: {excel_file.name}, size: {excel_file.size} bytes")
+            excel_files = request.FILES.getlist('excel_file')
+            all_sheets = bool(request.POST.get('all_sheets'))
+            # Several files, a zip or every sheet of a workbook are imported as one batch job
+            is_batch = len(excel_files) > 1 or all_sheets or excel_files[0].name.lower().endswith('.zip')
             try:
-                # Validate file extension
-                if not excel_file.name.endswith(('.xls', '.xlsx', '.csv')):
-                    logger.error("Invalid file format: File must be .xls, .xlsx, or .csv")
-                    return render(request, 'user_excel/excel.html', {
-                        'error': 'Invalid file format. Please upload an .xls, .xlsx, or .csv file.'
-                    })
+                for excel_file in excel_files:
+                    logger.info(f"Received file: {excel_file.name}, size: {excel_file.size} bytes")
+                    # Validate file extension
+                    if not excel_file.name.endswith(UPLOAD_TYPES):
+                        logger.error("Invalid file format: File must be .xls, .xlsx, .csv or .zip")
+                        return render(request, 'user_excel/excel.html', {
+                            'error': 'Invalid file format. Please upload .xls, .xlsx, .csv or .zip files.'
+                        })
 
-                # Validate file size (max 600MB)
-                max_size = 600 * 1024 * 1024  # 600MB
-                if excel_file.size > max_size:
-                    logger.error(f"File too large: {excel_file.size} bytes")
-                    return render(request, 'user_excel/excel.html', {
-                        'error': f'File is too large. Maximum size is {max_size // (1024 * 1024)}MB.'
-                    })
+                    # Validate file size (max 600MB)
+                    if excel_file.size > MAX_UPLOAD_BYTES:
+                        logger.error(f"File too large: {excel_file.size} bytes")
+                        return render(request, 'user_excel/excel.html', {
+                            'error': f'File is too large. Maximum size is {MAX_UPLOAD_BYTES // (1024 * 1024)}MB.'
+                        })
 
-                # Expected columns
-                expected_columns = [
-                    # Old columns
-                    'Voucher Type', 'ID', 'state_name', 'Zone', 'Branch_name', 'Route',
-                    'PartyName', 'CategoryName', 'PaymentType', 'CreatedDate', 'VoucherDate',
-                    'VoucherNo', 'Bill Type', 'Salesman', 'Taxable', 'CGST', 'SGST', 'IGST',
-                    'VoucherAMT', 'Discount', 'Realisable amount', 'RecieveAMT', 'Differance',
-                    'RMODE', 'GroupName', 'ItemCOde', 'TaxPerc', 'qty', 'Freeqty',
-                    'TotalAmt', 'FreeAmount', 'Rate', 'DiscAmount','Helper 1', 'KL MT OUTLETS', 
-                    'TN MT OUTLETS', 'Category', 'NEW SKU','Division', 'Customer name', 
-                    'District for milk', 'District for Dashboard','ZONE FOR MT'
-                ]
+                dedup_mode = request.POST.get('dedup_mode') or getattr(settings, 'EXCEL_IMPORT_DEDUP', ImportJob.DEDUP_UPDATE)
+                if dedup_mode not in dict(ImportJob.DEDUP_CHOICES):
+                    dedup_mode = ImportJob.DEDUP_UPDATE
+                delta = delta_fields(request.POST)
 
+                if is_batch:
+                    # Headers and earlier imports are checked per file and sheet by the batch
+                    job = create_batch(
+                        excel_files, all_sheets, profile=bool(request.POST.get('profile')), dedup_mode=dedup_mode,
+                        staged=getattr(settings, 'EXCEL_IMPORT_STAGED', False), **delta,
+                    )
+                    return import_started(request, job)
 
                 # Read first row to validate columns
-                excel_file.seek(0)
-                if excel_file.name.endswith('.csv'):
-                    first_df = pd.read_csv(excel_file, nrows=1, dtype_backend='numpy_nullable')
-                else:
-                    first_df = pd.read_excel(excel_file, nrows=1, dtype_backend='numpy_nullable')
-                excel_file.seek(0)
-                if not all(col in first_df.columns for col in expected_columns):
-                    missing_cols = [col for col in expected_columns if col not in first_df.columns]
+                missing_cols = missing_columns(excel_file)
+                if missing_cols:
                     logger.error(f"Missing columns in file: {missing_cols}")
                     return render(request, 'user_excel/excel.html', {
                         'error': f'Missing required columns: {", ".join(missing_cols)}'
                     })
 
-                # Initialize processing parameters
-                chunk_size = 50000  # Increased for faster processing
-                total_rows_processed = 0
-                invalid_values = []  # Track rows with replaced values
-                start_time = time.time()
+                # Store the upload; a byte-identical file that was already imported is skipped
+                path, content_hash = store_upload(excel_file)
+                job, previous = create_job(
+                    excel_file.name, path, content_hash, dedup_mode=dedup_mode,
+                    staged=getattr(settings, 'EXCEL_IMPORT_STAGED', False),
+                    profile=bool(request.POST.get('profile')), **delta,
+                )
+                if previous:
+                    return render(request, 'user_excel/excel.html', {
+                        'message': f'This file was already imported as {previous.file_name} (job {previous.pk}) on {previous.created_at:%Y-%m-%d %H:%M}. Nothing was saved.'
+                    })
 
-                # Memory usage tracking
-                process = psutil.Process()
-                logger.info(f"Initial memory usage: {process.memory_info().rss / 1024 / 1024:.2f} MB")
+                # Hand the upload to the import worker
+                return import_started(request, job)
+            except Exception as e:
+                logger.error(f"Error processing file: {str(e)}", exc_info=True)
+                return render(request, 'user_excel/excel.html', {
+                    'error': f'Error processing file: {str(e)}'
+                })
+        else:
+            logger.error("No file uploaded in request")
+            return render(request, 'user_excel/excel.html', {
+                'error': 'No file uploaded. Please select an Excel or CSV file.'
+            })
+    
+    return render(request, 'user_excel/excel.html')
 
-                def preprocess_chunk(df):
-                    """Preprocess data types in bulk using pandas"""
-                    # Convert numeric columns and replace invalid values with 0.0
-                    numeric_cols = ['Taxable', 'CGST', 'SGST', 'IGST', 'VoucherAMT', 'Discount',
-                                  'Realisable amount', 'RecieveAMT', 'Differance', 'TaxPerc',
-                                  'TotalAmt', 'FreeAmount', 'Rate', 'DiscAmount']
-                    for col in numeric_cols:
-                        if col in df.columns:
-                            # Log rows with invalid values
-                            invalid_mask = df[col].isna() | df[col].isnull() | (df[col] == '') | (df[col].astype(str).str.strip() == '')
-                            if invalid_mask.any():
-                                invalid_rows = df[invalid_mask].index.tolist()
-                                invalid_values.append({
-                                    'column': col,
-                                    'rows': [i + 2 for i in invalid_rows],  # +2 for 1-based indexing and header
-                                    'values': df.loc[invalid_mask, col].to_list()
-                                })
-                                logger.warning(f"Invalid values in {col} for rows {invalid_rows}: {df.loc[invalid_mask, col].to_list()}")
+def delta_fields(options):
+    """Job fields of a delta import when the form names a source (delta_source, delta_field), else none"""
+    source = (options.get('delta_source') or '').strip()
+    if not source:
+        return {}
+    return {'delta': start_delta(source[:100], options.get('delta_field') or None)}
 
-                            # Convert to float and replace invalid values with 0.0
-                            df[col] = pd.to_numeric(df[col], errors='coerce', downcast='float').fillna(0.0)
-                            df[col] = df[col].where(df[col].notna(), 0.0)
+def import_started(request, job):
+    """Hand a new job to the runner and render its result, or its progress when it runs in the background"""
+    enqueue_import(job)
+    job.refresh_from_db()
 
-                    # Convert integer columns and replace invalid values with 0
-                    int_cols = ['ID', 'qty', 'Freeqty']
-                    for col in int_cols:
-                        if col in df.columns:
-                            invalid_mask = df[col].isna() | df[col].isnull() | (df[col] == '') | (df[col].astype(str).str.strip() == '')
-                            if invalid_mask.any():
-                                invalid_rows = df[invalid_mask].index.tolist()
-                                invalid_values.append({
-                                    'column': col,
-                                    'rows': [i + 2 for i in invalid_rows],
-                                    'values': df.loc[invalid_mask, col].to_list()
-                                })
-                                logger.warning(f"Invalid values in {col} for rows {invalid_rows}: {df.loc[invalid_mask, col].to_list()}")
+    if job.status == ImportJob.STATUS_FAILED:
+        return render(request, 'user_excel/excel.html', {'error': job.error, 'parts': part_rows(job)})
+    if job.status == ImportJob.STATUS_DONE:
+        saved_count = SalesFact.objects.count()
+        return render(request, 'user_excel/excel.html', {
+            'message': f'{job.message} Total in database: {saved_count}.',
+            'invalid_counts': job.invalid_counts,
+            'report_url': reverse('import_report', args=[job.pk]) if job.invalid_report else None,
+            'timings_url': reverse('import_timings', args=[job.pk]),
+            'parts': part_rows(job),
+        })
+    return render(request, 'user_excel/excel.html', {'job': job})
 
-                            df[col] = pd.to_numeric(df[col], errors='coerce', downcast='integer').fillna(0)
-                            df[col] = df[col].where(df[col].notna(), 0)
+def part_rows(job):
+    # Per file/sheet totals of a batch job
+    if not job.is_batch:
+        return []
+    return [{
+        'id': part.pk,
+        'name': part.source_name,
+        'status': part.status,
+        'rows_done': part.rows_done,
+        'total_rows': part.total_rows,
+        'invalid_count': sum(part.invalid_counts.values()),
+        'message': part.message,
+        'error': part.error,
+        'report_url': reverse('import_report', args=[part.pk]) if part.invalid_report else None,
+        'timings_url': reverse('import_timings', args=[part.pk]),
+    } for part in job.parts.order_by('pk')]
 
-                    # Convert string columns
-                    str_cols = ['Voucher Type', 'state_name', 'Zone', 'Branch_name', 'Route',
-                               'PartyName', 'CategoryName', 'PaymentType', 'VoucherNo',
-                               'Bill Type', 'Salesman', 'RMODE', 'GroupName', 'ItemCOde''Helper 1', 'KL MT OUTLETS', 
-                               'TN MT OUTLETS', 'Category', 'NEW SKU','Division', 'Customer name', 
-                               'District for milk', 'District for Dashboard','ZONE FOR MT'
-                               ]
-                    for col in str_cols:
-                        if col in df.columns:
-                            df[col] = df[col].astype(str).replace(['nan', 'NaN', '', ' '], None)
+def upload_api(request):
+    """JSON upload endpoint: queue the posted excel_file(s) as an import job and return its status URL.
 
-                    # Convert date columns
-                    for col in ['CreatedDate', 'VoucherDate']:
-                        if col in df.columns:
-                            df[col] = pd.to_datetime(df[col], dayfirst=True, errors='coerce').dt.date
-                            # Handle Excel serial dates
-                            mask = df[col].isna() & df[col].notna()
-                            if mask.any():
-                                try:
-                                    df.loc[mask, col] = pd.to_numeric(df.loc[mask, col], errors='coerce').apply(
-                                        lambda x: (datetime(1899, 12, 30) + timedelta(days=int(x))).date() if pd.notna(x) else None
-                                    )
-                                except (ValueError, TypeError) as e:
-                                    logger.warning(f"Error converting serial dates in {col}: {str(e)}")
+    Under ASGI, POSTs to this URL are streamed to disk by streaming.StreamingUploadApp
+    before Django would buffer them; this view answers the same requests under WSGI.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST the file as excel_file'}, status=405)
+    excel_files = request.FILES.getlist('excel_file')
+    rejected = upload_error(excel_files)
+    if rejected:
+        return rejected
+    stored = [(excel_file.name, *store_upload(excel_file)) for excel_file in excel_files]
+    return queue_stored_uploads(stored, request.POST)
 
-                    return df
+def upload_error(excel_files):
+    """JSON error response for uploads of the wrong type or size, or None"""
+    for excel_file in excel_files:
+        if not excel_file.name.endswith(UPLOAD_TYPES):
+            return JsonResponse({'error': 'Invalid file format. Please upload .xls, .xlsx, .csv or .zip files.'}, status=400)
+        if excel_file.size > MAX_UPLOAD_BYTES:
+            return JsonResponse({'error': f'File is too large. Maximum size is {MAX_UPLOAD_BYTES // (1024 * 1024)}MB.'}, status=413)
+    return None
 
-                # Process file based on type
-                if excel_file.name.endswith('.csv'):
-                    for chunk in pd.read_csv(excel_file, chunksize=chunk_size, dtype_backend='numpy_nullable'):
-                        chunk = preprocess_chunk(chunk)
-                        excel_data_objects = []
+def queue_stored_uploads(stored, options):
+    """Queue uploads stored as (file_name, path, sha256) and answer with the job as JSON.
 
-                        for index, row in chunk.iterrows():
-                            try:
-                                excel_data = ExcelData(
-                                    voucher_type=row.get('Voucher Type'),
-                                    sales_id=row.get('ID'),
-                                    state_name=row.get('state_name'),
-                                    
-                                    zone=row.get('Zone'),
-                                    branch_name=row.get('Branch_name'),
-                                    route=row.get('Route'),
-                                    party_name=row.get('PartyName'),
-                                    category_name=row.get('CategoryName'),
-                                    payment_type=row.get('PaymentType'),
-                                    created_date=row.get('CreatedDate'),
-                                    voucher_date=row.get('VoucherDate'),
-                                    voucher_no=row.get('VoucherNo'),
-                                    bill_type=row.get('Bill Type'),
-                                    salesman=row.get('Salesman'),
-                                    taxable=row.get('Taxable'),
-                                    cgst=row.get('CGST'),
-                                    sgst=row.get('SGST'),
-                                    igst=row.get('IGST'),
-                                    voucher_amt=row.get('VoucherAMT'),
-                                    discount=row.get('Discount'),
-                                    realisable_amount=row.get('Realisable amount'),
-                                    receive_amt=row.get('RecieveAMT'),
-                                    difference=row.get('Differance'),
-                                    rmode=row.get('RMODE'),
-                                    group_name=row.get('GroupName'),
-                                    item_code=row.get('ItemCOde'),
-                                    tax_perc=row.get('TaxPerc'),
-                                    qty=row.get('qty'),
-                                    free_qty=row.get('Freeqty'),
-                                    total_amt=row.get('TotalAmt'),
-                                    free_amount=row.get('FreeAmount'),
-                                    rate=row.get('Rate'),
-                                    disc_amount=row.get('DiscAmount'),
-                                    helper_1=row.get('Helper 1'),
-                                    kl_mt_outlets=row.get('KL MT OUTLETS'),
-                                    tn_mt_outlets=row.get('TN MT OUTLETS'),
-                                    new_category=row.get('Category'),
-                                    new_sku=row.get('NEW SKU'),
-                                    division=row.get('Division'),
-                                    customer_name=row.get('Customer name'),
-                                    district_milk=row.get('District for milk'),
-                                    district_dashboard=row.get('District for Dashboard'),
-                                    zone_mt=row.get('ZONE FOR MT')
-                                )
-                                excel_data_objects.append(excel_data)
-                            except Exception as e:
-                                logger.error(f"Error creating ExcelData for row {total_rows_processed + index + 2}: {str(e)}")
-                                return render(request, 'user_excel/excel.html', {
-                                    'error': f'Error in row {total_rows_processed + index + 2}: {str(e)}'
-                                })
+    options is the form's QueryDict (dedup_mode, all_sheets, profile, delta_source,
+    delta_field). Several files, a zip or all_sheets make a batch job, as in index.
+    """
+    if not stored:
+        return JsonResponse({'error': 'No file uploaded. Please select an Excel or CSV file.'}, status=400)
+    dedup_mode = options.get('dedup_mode') or getattr(settings, 'EXCEL_IMPORT_DEDUP', ImportJob.DEDUP_UPDATE)
+    if dedup_mode not in dict(ImportJob.DEDUP_CHOICES):
+        dedup_mode = ImportJob.DEDUP_UPDATE
+    all_sheets = bool(options.get('all_sheets'))
+    job_fields = {'dedup_mode': dedup_mode, 'staged': getattr(settings, 'EXCEL_IMPORT_STAGED', False), 'profile': bool(options.get('profile'))}
+    try:
+        job_fields.update(delta_fields(options))
+    except ValueError as e:
+        for _, path, _ in stored:
+            Path(path).unlink(missing_ok=True)
+        return JsonResponse({'error': str(e)}, status=400)
+    if len(stored) > 1 or all_sheets or stored[0][0].lower().endswith('.zip'):
+        job = create_stored_batch(stored, all_sheets, **job_fields)
+    else:
+        file_name, path, content_hash = stored[0]
+        missing_cols = missing_columns(path)
+        if missing_cols:
+            Path(path).unlink(missing_ok=True)
+            return JsonResponse({'error': f'Missing required columns: {", ".join(missing_cols)}'}, status=400)
+        job, previous = create_job(file_name, path, content_hash, **job_fields)
+        if previous:
+            return JsonResponse({
+                'message': f'This file was already imported as {previous.file_name} (job {previous.pk}). Nothing was saved.',
+                'id': previous.pk, 'status_url': reverse('import_status', args=[previous.pk]),
+            })
+    enqueue_import(job)
+    return JsonResponse({'id': job.pk, 'status_url': reverse('import_status', args=[job.pk])}, status=202)
 
-                        if excel_data_objects:
-                            try:
-                                with transaction.atomic():
-                                    ExcelData.objects.bulk_create(excel_data_objects, batch_size=5000)
-                                    total_rows_processed += len(excel_data_objects)
-                                    logger.info(f"Successfully inserted {len(excel_data_objects)} rows in chunk, total inserted: {total_rows_processed}")
-                                    logger.info(f"Memory usage: {process.memory_info().rss / 1024 / 1024:.2f} MB")
-                            except IntegrityError as e:
-                                logger.error(f"Database error during bulk_create: {str(e)}")
-                                return render(request, 'user_excel/excel.html', {
-                                    'error': f'Database error during insertion: {str(e)}'
-                                })
+def validate_upload(request):
+    """Dry run: read the posted excel_file(s) as an import would and return what it would find.
 
-                else:
-                    with pd.ExcelFile(excel_file) as xls:
-                        total_rows = pd.read_excel(xls, sheet_name=0, usecols=[0]).shape[0]
-                        logger.info(f"Total rows in Excel file: {total_rows}")
+    Nothing is written to the database, and the files are deleted once read. Zips are
+    validated member by member; sheet_name picks a workbook sheet (default the first).
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST the file as excel_file'}, status=405)
+    excel_files = request.FILES.getlist('excel_file')
+    if not excel_files:
+        return JsonResponse({'error': 'No file uploaded. Please select an Excel or CSV file.'}, status=400)
+    rejected = upload_error(excel_files)
+    if rejected:
+        return rejected
+    sheet_name = request.POST.get('sheet_name') or None
+    reports = []
+    for excel_file in excel_files:
+        path, _ = store_upload(excel_file)
+        sources = []
+        try:
+            if excel_file.name.lower().endswith('.zip'):
+                sources = extract_archive(path, excel_file.name)
+            else:
+                sources = [(excel_file.name, path, None)]
+            for file_name, source_path, _ in sources:
+                reports.append(validate_file(source_path, sheet_name=sheet_name, file_name=file_name))
+        except Exception as e:
+            logger.error(f"Error validating {excel_file.name}: {str(e)}", exc_info=True)
+            reports.append({'file_name': excel_file.name, 'ok': False, 'error': str(e)})
+        finally:
+            for source_path in [path] + [source_path for _, source_path, _ in sources]:
+                Path(source_path).unlink(missing_ok=True)
+    return JsonResponse({'ok': all(report['ok'] for report in reports), 'files': reports})
 
-                        for start_row in range(0, total_rows, chunk_size):
-                            df = pd.read_excel(
-                                xls,
-                                sheet_name=0,
-                                skiprows=start_row,
-                                nrows=chunk_size,
-                                dtype_backend='numpy_nullable'
-                            )
-                            df = preprocess_chunk(df)
-                            excel_data_objects = []
+def import_status(request, job_id):
+    job = get_object_or_404(ImportJob, pk=job_id)
+    return JsonResponse({
+        'id': job.pk,
+        'file_name': job.file_name,
+        'status': job.status,
+        'rows_done': job.rows_done,
+        'total_rows': job.total_rows,
+        'chunks_done': job.chunks_done,
+        'rows_per_sec': round(job.rows_per_sec, 1),
+        'eta_seconds': round(job.eta_seconds, 1) if job.eta_seconds is not None else None,
+        'message': job.message,
+        'error': job.error,
+        'invalid_counts': job.invalid_counts,
+        'delta': job.delta,
+        'report_url': reverse('import_report', args=[job.pk]) if job.invalid_report else None,
+        'timings_url': reverse('import_timings', args=[job.pk]),
+        'parts': part_rows(job),
+    })
 
-                            for index, row in df.iterrows():
-                                try:
-                                    excel_data = ExcelData(
-                                        voucher_type=row.get('Voucher Type'),
-                                        sales_id=row.get('ID'),
-                                        state_name=row.get('state_name'),
-                                        zone=row.get('Zone'),
-                                        branch_name=row.get('Branch_name'),
-                                        route=row.get('Route'),
-                                        party_name=row.get('PartyName'),
-                                        category_name=row.get('CategoryName'),
-                                        payment_type=row.get('PaymentType'),
-                                        created_date=row.get('CreatedDate'),
-                                        voucher_date=row.get('VoucherDate'),
-                                        voucher_no=row.get('VoucherNo'),
-                                        bill_type=row.get('Bill Type'),
-                                        salesman=row.get('Salesman'),
-                                        taxable=row.get('Taxable'),
-                                        cgst=row.get('CGST'),
-                                        sgst=row.get('SGST'),
-                                        igst=row.get('IGST'),
-                                        voucher_amt=row.get('VoucherAMT'),
-                                        discount=row.get('Discount'),
-                                        realisable_amount=row.get('Realisable amount'),
-                                        receive_amt=row.get('RecieveAMT'),
-                                        difference=row.get('Differance'),
-                                        rmode=row.get('RMODE'),
-                                        group_name=row.get('GroupName'),
-                                        item_code=row.get('ItemCOde'),
-                                        tax_perc=row.get('TaxPerc'),
-                                        qty=row.get('qty'),
-                                        free_qty=row.get('Freeqty'),
-                                        total_amt=row.get('TotalAmt'),
-                                        free_amount=row.get('FreeAmount'),
-                                        rate=row.get('Rate'),
-                                        disc_amount=row.get('DiscAmount'),
-                                        helper_1=row.get('Helper 1'),
-                                        kl_mt_outlets=row.get('KL MT OUTLETS'),
-                                        tn_mt_outlets=row.get('TN MT OUTLETS'),
-                                        new_category=row.get('Category'),
-                                        new_sku=row.get('NEW SKU'),
-                                        division=row.get('Division'),
-                                        customer_name=row.get('Customer name'),
-                                        district_milk=row.get('District for milk'),
-                                        district_dashboard=row.get('District for Dashboard'),
-                                        zone_mt=row.get('ZONE FOR MT')
-                                    )
-                                    excel_data_objects.append(excel_data)
-                                except Exception as e:
-                                    logger.error(f"Error creating ExcelData for row {start_row + index + 2}: {str(e)}")
-                                    return render(request, 'user_excel/excel.html', {
-                                        'error': f'Error in row {start_row + index + 2}: {str(e)}'
-                                    })
+def import_report(request, job_id):
+    job = get_object_or_404(ImportJob, pk=job_id)
+    report = InvalidValueReport.from_dict(job.invalid_report or {})
+    response = HttpResponse(report.to_csv(), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="invalid_values_{job.pk}.csv"'
+    return response
 
-                            if excel_data_objects:
-                                try:
-                                    with transaction.atomic():
-                                        ExcelData.objects.bulk_create(excel_data_objects, batch_size=5000)
-                                        total_rows_processed += len(excel_data_objects)
-                                        logger.info(f"Successfully inserted {len(excel_data_objects)} rows in chunk, total inserted: {total_rows_processed}")
-                                        logger.info(f"Memory usage: {process.memory_info().rss / 1024 / 1024:.2f} MB")
-                                except IntegrityError as e:
-                                    logger.error(f"Database error during bulk_create: {str(e)}")
-                                    return render(request, 'user_excel/excel.html', {
-                                        'error': f'Database error during insertion: {str(e)}'
-                                    })
+def import_timings(request, job_id):
+    job = get_object_or_404(ImportJob, pk=job_id)
+    timings = job.timings or {'stages': {}, 'chunks': []}
+    return JsonResponse({
+        'id': job.pk,
+        'status': job.status,
+        'rows_done': job.rows_done,
+        'elapsed_seconds': round(job.elapsed_seconds, 3),
+        'stages': timings['stages'],
+        'chunks': timings['chunks'],
+        'profile_url': reverse('import_profile', args=[job.pk]) if job.profile_path else None,
+    })
 
-                # Log invalid values and performance
-                if invalid_values:
-                    logger.warning(f"Replaced invalid values in {len(invalid_values)} columns: {invalid_values}")
-                logger.info(f"Total processing time: {time.time() - start_time:.2f} seconds")
+def import_profile(request, job_id):
+    job = get_object_or_404(ImportJob, pk=job_id)
+    if not job.profile_path:
+        raise Http404('This import was not profiled')
+    try:
+        return FileResponse(open(job.profile_path, 'rb'), as_attachment=True, filename=f'import_{job.pk}_{Path(job.profile_path).name}')
+    except FileNotFoundError:
+        raise Http404('Profile file is missing')
 
-                # Check if any data was saved
-                saved_count = ExcelData.objects.count()
-                if total_rows_processed == 0:
-                    logger.error("No rows were processed successfully")
-                    return render(request, 'user_excel/excel.html', {
-                        'error': 'No data was saved. Please check the file format or data validity.'
-                    })
+def metrics(request):
+    # Prometheus text exposition of import totals, summed over every job
+    if not getattr(settings, 'EXCEL_IMPORT_METRICS', False):
+        raise Http404('Metrics are disabled')
+    stages = {}
+    # Batch jobs only add up their parts, which are counted themselves
+    jobs = ImportJob.objects.filter(is_batch=False)
+    for timings in jobs.exclude(timings=None).values_list('timings', flat=True).iterator():
+        for stage, seconds in timings.get('stages', {}).items():
+            stages[stage] = stages.get(stage, 0.0) + seconds
+    lines = [
+        '# HELP excel_import_stage_seconds_total Seconds spent in each import stage',
+        '# TYPE excel_import_stage_seconds_total counter',
+    ]
+    lines += [f'excel_import_stage_seconds_total{{stage="{stage}"}} {seconds:.4f}' for stage, seconds in sorted(stages.items())]
+    lines += [
+        '# HELP excel_import_rows_total Rows processed by import jobs',
+        '# TYPE excel_import_rows_total counter',
+        f'excel_import_rows_total {jobs.aggregate(rows=Sum("rows_done"))["rows"] or 0}',
+        '# HELP excel_import_jobs Import jobs by status',
+        '# TYPE excel_import_jobs gauge',
+    ]
+    for status, _ in ImportJob.STATUS_CHOICES:
+        lines.append(f'excel_import_jobs{{status="{status}"}} {ImportJob.objects.filter(status=status).count()}')
+    return HttpResponse('\n'.join(lines) + '\n', content_type='text/plain; version=0.0.4')
 
-                return render(request, 'user_excel/excel.html', {
-                    'message': f'Successfully saved {total_rows_processed} records in {time.time() - start_time:.2f} seconds. Total in database: {saved_count}.'
-                })
-            except Exception as e:
-                logger.error(f"Error processing file: {str(e)}", exc_info=True)
-                return render(request, 'user_excel/excel.html', {
-                    'error': f'Error processing file: {str(e)}'
-                })
-        else:
-            logger.error("No file uploaded in request")
-            return render(request, 'user_excel/excel.html', {
-                'error': 'No file uploaded. Please select an Excel or CSV file.'
-            })
-    
-    return render(request, 'user_excel/excel.html')
+def sales_rollup(request):
+    grain = request.GET.get('grain', 'daily')
+    if grain not in GRAINS:
+        return JsonResponse({'error': f'grain must be one of: {", ".join(GRAINS)}'}, status=400)
+    group_by = [field for field in request.GET.get('group_by', 'period').split(',') if field]
+    unknown = [field for field in group_by if field != 'period' and field not in SalesRollup.DIMENSIONS]
+    if unknown:
+        return JsonResponse({'error': f'Cannot group by: {", ".join(unknown)}'}, status=400)
+
+    filters = {field: request.GET[field] for field in SalesRollup.DIMENSIONS if request.GET.get(field)}
+    for param in ('date_from', 'date_to'):
+        try:
+            value = parse_date(request.GET.get(param, ''))
+        except ValueError:
+            value = None
+        if value:
+            filters[param] = value
+    rows = cached_query(
+        'rollup', {**filters, 'grain': grain, 'group_by': group_by},
+        lambda: query_rollups(grain, filters, group_by),
+    )
+    return JsonResponse({'grain': grain, 'group_by': group_by, 'rows': rows})
 
 def view_excel_data(request):
-    data_list = ExcelData.objects.all().order_by('-id')
-    paginator = Paginator(data_list, 100)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    
-    return render(request, 'user_excel/view_data.html', {
-        'page_obj': page_obj,
+    filters = clean_filters(request.GET)
+    queryset = filtered_rows(filters)
+    try:
+        after = int(request.GET['after']) if request.GET.get('after') else None
+        before = int(request.GET['before']) if request.GET.get('before') else None
+    except ValueError:
+        after = before = None
+    rows, has_previous, has_next = cached_query(
+        'page', {**filters, 'after': after, 'before': before},
+        lambda: keyset_page(queryset, after=after, before=before),
+    )
 
+    return render(request, 'user_excel/view_data.html', {
+        'rows': rows,
+        'has_previous': has_previous,
+        'has_next': has_next,
+        'first_id': rows[0]['id'] if rows else None,
+        'last_id': rows[-1]['id'] if rows else None,
+        'total_count': approximate_count(filters),
+        'filters': filters,
+        'filter_query': urlencode(filters),
     })
+
+def export_excel_data(request):
+    started = time.time()
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return HttpResponse(f'Unknown export format. Use one of: {", ".join(EXPORT_FORMATS)}', status=400)
+    if export_format == 'parquet' and importlib.util.find_spec('pyarrow') is None:
+        return HttpResponse('Parquet export needs the pyarrow package.', status=400)
+
+    filters = clean_filters(request.GET)
+    logger.info(f"Exporting ExcelData as {export_format} with filters {filters}")
+    content_type, extension = EXPORT_FORMATS[export_format]
+    response = StreamingHttpResponse(export_stream(filtered_rows(filters), export_format, started), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="excel_data.{extension}"'
+    return response
@@ -0,0 +1,194 @@
+from django.conf import settings
+from django.db import connections
+from .models import SalesFact
+from .preprocess import units_text
+from .schema import import_schema
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Excel header -> sales line field, in insert order
+FIELD_MAP = import_schema().field_map
+
+# Amount header -> decimal places of the int64 units preprocessing leaves in it
+DECIMAL_PLACES = {column.header: column.decimal_places for column in import_schema().of_kind('decimal')}
+
+# Backends whose cursors accept multi-row VALUES lists or a fast executemany
+COLUMNAR_VENDORS = ('sqlite', 'postgresql', 'mysql', 'microsoft')
+
+# Backends with a set-based upsert against SalesFact's partial unique natural key
+UPSERT_VENDORS = ('sqlite', 'postgresql', 'microsoft')
+
+
+def column_values(df, column):
+    """Return a column as a list of Python values with missing entries as None"""
+    if column not in df.columns:
+        return [None] * len(df)
+    series = df[column]
+    if column in DECIMAL_PLACES:
+        # Exact fixed-point text, which every driver binds to a DECIMAL column without a float
+        return units_text(series.to_numpy(), DECIMAL_PLACES[column])
+    # tolist() on numpy-backed series yields native ints/floats the DB drivers can bind
+    return series.astype(object).where(series.notna(), None).tolist()
+
+
+def chunk_rows(df):
+    """Transpose a preprocessed, interned chunk into insert-ordered row tuples without model objects"""
+    columns = [column_values(df, header) for header, _ in FIELD_MAP]
+    return list(zip(*columns))
+
+
+def writer_method(using='default'):
+    """Pick 'columnar' or 'orm' for the given database alias"""
+    method = getattr(settings, 'EXCEL_IMPORT_WRITER', 'auto')
+    if method != 'auto':
+        return method
+    if connections[using].vendor in COLUMNAR_VENDORS:
+        return 'columnar'
+    return 'orm'
+
+
+def insert_rows_orm(rows, using='default', batch_size=5000):
+    """Insert row tuples through SalesFact model instances and bulk_create"""
+    # attnames take the interned keys as they are, e.g. zone_id
+    fields = [SalesFact._meta.get_field(field).attname for _, field in FIELD_MAP]
+    objects = [SalesFact(**dict(zip(fields, row))) for row in rows]
+    SalesFact.objects.using(using).bulk_create(objects, batch_size=batch_size)
+    return len(objects)
+
+
+def quoted_columns(connection, fields=None, model=SalesFact):
+    fields = fields or [field for _, field in FIELD_MAP]
+    return [connection.ops.quote_name(model._meta.get_field(field).column) for field in fields]
+
+
+def insert_rows_columnar(rows, using='default', table=None, on_conflict='', columns=None):
+    """Insert row tuples with parameterized multi-row INSERTs (fast_executemany on mssql).
+
+    on_conflict is appended to each statement (e.g. an ON CONFLICT clause); returns the
+    number of rows the database reports as written.
+    """
+    connection = connections[using]
+    columns = columns or quoted_columns(connection)
+    table = table or connection.ops.quote_name(SalesFact._meta.db_table)
+    prefix = f"INSERT INTO {table} ({', '.join(columns)}) VALUES "
+    row_placeholder = '(' + ', '.join(['%s'] * len(columns)) + ')'
+
+    with connection.cursor() as cursor:
+        if connection.vendor == 'microsoft':
+            # Unwrap Django's and mssql-django's cursor wrappers down to pyodbc
+            raw_cursor = cursor.cursor
+            raw_cursor = getattr(raw_cursor, 'cursor', raw_cursor)
+            raw_cursor.fast_executemany = True
+            sql = prefix + '(' + ', '.join(['?'] * len(columns)) + ')'
+            raw_cursor.executemany(sql, rows)
+            return len(rows)
+
+        written = 0
+        max_params = connection.features.max_query_params or 65535
+        batch_size = max(1, min(1000, max_params // len(columns)))
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            sql = prefix + ', '.join([row_placeholder] * len(batch)) + on_conflict
+            cursor.execute(sql, [value for row in batch for value in row])
+            written += cursor.rowcount if cursor.rowcount >= 0 else len(batch)
+    return written
+
+
+def on_conflict_clause(connection, mode):
+    """Build the ON CONFLICT clause for SalesFact's natural key ('update' or 'skip')"""
+    columns = quoted_columns(connection)
+    keys = quoted_columns(connection, SalesFact.NATURAL_KEY)
+    # Spelled exactly like the index predicate Django generates (Q sorts its fields):
+    # SQLite only matches a partial index whose WHERE clause is textually equivalent
+    condition = '(' + ' AND '.join(f"{key} IS NOT NULL" for key in quoted_columns(connection, sorted(SalesFact.NATURAL_KEY))) + ')'
+    if mode == 'update':
+        action = 'DO UPDATE SET ' + ', '.join(f"{column} = excluded.{column}" for column in columns if column not in keys)
+    else:
+        action = 'DO NOTHING'
+    return f" ON CONFLICT ({', '.join(keys)}) WHERE {condition} {action}"
+
+
+def merge_statement(connection, source, mode):
+    """Build a SQL Server MERGE of source (a table or parenthesized query) into SalesFact"""
+    table = connection.ops.quote_name(SalesFact._meta.db_table)
+    columns = quoted_columns(connection)
+    keys = quoted_columns(connection, SalesFact.NATURAL_KEY)
+    matched = ''
+    if mode == 'update':
+        matched = 'WHEN MATCHED THEN UPDATE SET ' + ', '.join(f"target.{column} = source.{column}" for column in columns if column not in keys) + ' '
+    return (
+        f"MERGE {table} WITH (HOLDLOCK) AS target USING {source} AS source "
+        f"ON {' AND '.join(f'target.{key} = source.{key}' for key in keys)} "
+        f"{matched}WHEN NOT MATCHED BY TARGET THEN "
+        f"INSERT ({', '.join(columns)}) VALUES ({', '.join(f'source.{column}' for column in columns)});"
+    )
+
+
+def upsert_rows(rows, using='default', mode='update'):
+    """Write row tuples keyed on SalesFact.NATURAL_KEY with one set-based statement per batch.
+
+    'update' overwrites an existing voucher line with the new values, 'skip' keeps the
+    existing line. Rows with a blank key part are always inserted, matching the partial
+    unique index.
+    """
+    connection = connections[using]
+    if connection.vendor == 'microsoft':
+        return merge_rows_mssql(rows, using, mode)
+    return insert_rows_columnar(rows, using, on_conflict=on_conflict_clause(connection, mode))
+
+
+def merge_rows_mssql(rows, using, mode):
+    # SQL Server has no ON CONFLICT: bulk-load a session temp table, then MERGE it in once
+    connection = connections[using]
+    table = connection.ops.quote_name(SalesFact._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT TOP 0 {', '.join(quoted_columns(connection))} INTO #excel_stage FROM {table}")
+        try:
+            insert_rows_columnar(rows, using, table='#excel_stage')
+            cursor.execute(merge_statement(connection, '#excel_stage', mode))
+            return cursor.rowcount
+        finally:
+            cursor.execute("DROP TABLE #excel_stage")
+
+
+def drop_duplicate_keys(df, mode):
+    """Keep one row per natural key within a chunk so a single upsert never hits a key twice"""
+    key_headers = [header for header, field in FIELD_MAP if field in SalesFact.NATURAL_KEY]
+    if not all(header in df.columns for header in key_headers):
+        return df
+    keyed = df[key_headers].notna().all(axis=1)
+    duplicated = df.duplicated(subset=key_headers, keep='last' if mode == 'update' else 'first') & keyed
+    if duplicated.any():
+        logger.info(f"Dropped {int(duplicated.sum())} repeated voucher lines within the chunk")
+        return df[~duplicated]
+    return df
+
+
+def write_chunk(df, using='default', method=None, dedup_mode='insert'):
+    """Write a preprocessed, interned chunk to SalesFact and return timing stats for the chosen path"""
+    method = method or writer_method(using)
+    start_time = time.time()
+    rows_read = len(df)
+    if dedup_mode != 'insert' and connections[using].vendor not in UPSERT_VENDORS:
+        logger.warning(f"Dedup mode '{dedup_mode}' is not supported on {connections[using].vendor}, inserting rows as-is")
+        dedup_mode = 'insert'
+    if dedup_mode != 'insert':
+        df = drop_duplicate_keys(df, dedup_mode)
+    rows = chunk_rows(df)
+    build_seconds = time.time() - start_time
+    if dedup_mode != 'insert':
+        method = 'upsert'
+        written = upsert_rows(rows, using=using, mode=dedup_mode)
+    elif method == 'columnar':
+        written = insert_rows_columnar(rows, using=using)
+    else:
+        written = insert_rows_orm(rows, using=using)
+    elapsed = time.time() - start_time
+    rows_per_sec = rows_read / elapsed if elapsed > 0 else 0.0
+    logger.info(f"Wrote {written} of {rows_read} rows via {method} path in {elapsed:.2f}s ({rows_per_sec:.0f} rows/sec)")
+    return {
+        'rows': rows_read, 'written': written, 'method': method, 'seconds': elapsed, 'rows_per_sec': rows_per_sec,
+        'timings': {'build': build_seconds, 'write': elapsed - build_seconds},
+    }